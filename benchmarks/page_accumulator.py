@@ -0,0 +1,52 @@
+""" Benchmark of the accumulation of response data pages during pagination.
+
+Compares successively merging pages with :func:`merge` (quadratic in the number
+of entities) with :class:`PageAccumulator` (linear in the number of entities).
+
+Usage:
+
+  python benchmarks/page_accumulator.py
+"""
+
+from copy import deepcopy
+from time import perf_counter
+
+from subgrounds.pagination.utils import PAGE_SIZE, PageAccumulator, merge
+
+
+def mk_pages(num_entities: int) -> list[dict]:
+  """ Returns pages of ``PAGE_SIZE`` swaps (with a nested token object) as
+  returned by a flat paginated query of ``num_entities`` swaps. """
+  return [
+    {'swaps': [
+      {'id': f'{i:08}', 'timestamp': i, 'token': {'id': '0xabc', 'symbol': 'ABC'}}
+      for i in range(start, min(start + PAGE_SIZE, num_entities))
+    ]}
+    for start in range(0, num_entities, PAGE_SIZE)
+  ]
+
+
+def bench_merge(pages: list[dict]) -> float:
+  start = perf_counter()
+  data = {}
+  for page in pages:
+    data = merge(data, page)
+  return perf_counter() - start
+
+
+def bench_accumulator(pages: list[dict]) -> float:
+  start = perf_counter()
+  acc = PageAccumulator()
+  for page in pages:
+    acc.add(page)
+  acc.data
+  return perf_counter() - start
+
+
+if __name__ == '__main__':
+  print(f'{"entities":>10} {"pages":>6} {"merge (s)":>10} {"accumulator (s)":>16}')
+  for num_entities in [4_500, 9_000, 18_000, 36_000]:
+    pages = mk_pages(num_entities)
+    t_merge = bench_merge(deepcopy(pages))
+    t_acc = bench_accumulator(deepcopy(pages))
+    print(f'{num_entities:>10} {len(pages):>6} {t_merge:>10.3f} {t_acc:>16.3f}')
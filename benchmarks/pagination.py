@@ -0,0 +1,336 @@
+""" Benchmark of the pagination strategies against a simulated graph-node.
+
+Queries are executed by an in-process :class:`SimulatedGraphNode` serving
+deterministically generated Uniswap V3 entity tables (using the schema of
+``tests/schemas/uniswap_uniswap-v3.json``). Like graph-node, the simulator
+rejects ``first`` values greater than 1000 and ``skip`` values greater than
+5000, filters entities with the ``where`` argument (e.g.: ``timestamp_gt``),
+sorts them by their ordering field (ties being sorted by ``id``) and waits a
+configurable latency before each response.
+
+For each query shape and pagination strategy, the number of requests, the number
+of entities, the wall time, the CPU time (excluding the simulator's) and the peak
+memory (as traced by ``tracemalloc``) are reported.
+
+Usage:
+
+  python benchmarks/pagination.py [--latency SECONDS] [--seed SEED]
+"""
+
+from __future__ import annotations
+
+import argparse
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial
+import json
+from random import Random
+from threading import Lock
+from time import perf_counter, process_time, sleep, thread_time
+import tracemalloc
+from typing import Any, Callable, Iterator, Optional
+from unittest import mock
+
+import subgrounds.pagination.pagination as pagination
+from subgrounds.pagination import LegacyStrategy, ShallowStrategy
+from subgrounds.query import Document, InputValue, Selection
+from subgrounds.subgraph import FieldPath, Subgraph
+from subgrounds.subgrounds import Subgrounds
+
+SCHEMA_PATH = 'tests/schemas/uniswap_uniswap-v3.json'
+URL = 'https://api.thegraph.com/subgraphs/name/uniswap/uniswap-v3'
+
+# Limits enforced by graph-node
+MAX_FIRST = 1000
+MAX_SKIP = 5000
+DEFAULT_FIRST = 100
+
+# Nested list fields of the simulated entities: field name -> (table, field of
+# the child entities referencing their parent entity)
+LINKS = {
+  'swaps': ('swaps', 'pool'),
+  'mints': ('mints', 'pool'),
+  'burns': ('burns', 'pool'),
+}
+
+
+def mk_tables(seed: int, num_pools: int = 50, num_events: int = 20_000) -> dict[str, list[dict[str, Any]]]:
+  """ Returns the simulated entity tables. Events are spread unevenly across
+  pools and several events share each timestamp. """
+  rng = Random(seed)
+  pools = [
+    {'id': f'0x{i:040x}', 'createdAtTimestamp': str(1_600_000_000 + i * 3600), 'volumeUSD': str(rng.random() * 1e6)}
+    for i in range(num_pools)
+  ]
+
+  def mk_events(prefix: str) -> list[dict[str, Any]]:
+    return [
+      {
+        'id': f'{prefix}{i:08}',
+        'timestamp': str(1_600_000_000 + i // 3),
+        'amountUSD': str(rng.random() * 1e4),
+        'pool': pools[min(int(rng.expovariate(0.2)), num_pools - 1)]['id'],
+      }
+      for i in range(num_events)
+    ]
+
+  return {'pools': pools, 'swaps': mk_events('0xs'), 'mints': mk_events('0xm'), 'burns': mk_events('0xb')}
+
+
+def sort_key(value: Any) -> tuple[int, Any]:
+  """ Sort key of entity field values: numeric values (which graph-node returns
+  as strings for ``BigInt`` and ``BigDecimal`` fields) are compared as numbers. """
+  try:
+    return (0, float(value))
+  except (TypeError, ValueError):
+    return (1, str(value))
+
+
+def value_of(value: InputValue.T, variables: dict[str, Any]) -> Any:
+  match value:
+    case InputValue.Variable(name=name):
+      return variables[name]
+    case InputValue.Object(value=fields):
+      return {name: value_of(val, variables) for name, val in fields.items()}
+    case InputValue.List(value=values):
+      return [value_of(val, variables) for val in values]
+    case InputValue.Null():
+      return None
+    case _:
+      return value.value
+
+
+def matches(entity: dict[str, Any], where: dict[str, Any]) -> bool:
+  for name, value in where.items():
+    field_name, _, op = name.rpartition('_')
+    match op:
+      case 'gt':
+        ok = sort_key(entity[field_name]) > sort_key(value)
+      case 'gte':
+        ok = sort_key(entity[field_name]) >= sort_key(value)
+      case 'lt':
+        ok = sort_key(entity[field_name]) < sort_key(value)
+      case 'lte':
+        ok = sort_key(entity[field_name]) <= sort_key(value)
+      case 'in':
+        ok = entity[field_name] in value
+      case _:
+        ok = entity[name] == value
+
+    if not ok:
+      return False
+
+  return True
+
+
+@dataclass
+class SimulatedGraphNode:
+  """ In-process graph-node serving the entity tables ``tables``.
+
+  Since ``client.query`` only receives the rendered GraphQL query, the documents
+  executed by the pagination algorithms are registered (see :func:`patch`) and
+  looked up by their GraphQL string instead of being parsed.
+  """
+  tables: dict[str, list[dict[str, Any]]]
+  latency: float = 0.0
+  requests: int = 0
+  cpu_time: float = 0.0
+  documents: dict[str, Document] = field(default_factory=dict)
+  lock: Lock = field(default_factory=Lock)
+
+  def register(self, doc: Document) -> None:
+    self.documents[doc.graphql] = doc
+
+  def query(self, url: str, query_str: str, variables: dict[str, Any] = {}) -> dict[str, Any]:
+    sleep(self.latency)
+
+    start = thread_time()
+    doc = self.documents[query_str]
+    data = {
+      select.key: self.resolve_toplevel(select, variables)
+      for select in doc.query.selection
+    }
+
+    with self.lock:
+      self.requests += 1
+      self.cpu_time += thread_time() - start
+
+    return data
+
+  def resolve_toplevel(self, select: Selection, variables: dict[str, Any]) -> Any:
+    if select.fmeta.name == '_meta':
+      return {'block': {'number': 1}}
+
+    return self.resolve_list(select, self.tables[select.fmeta.name], variables)
+
+  def resolve_list(
+    self,
+    select: Selection,
+    entities: list[dict[str, Any]],
+    variables: dict[str, Any]
+  ) -> list[dict[str, Any]]:
+    args = {arg.name: value_of(arg.value, variables) for arg in select.arguments}
+
+    first = args.get('first', DEFAULT_FIRST)
+    skip = args.get('skip', 0)
+    if not 0 <= first <= MAX_FIRST:
+      raise Exception(f'The `first` argument must be between 0 and {MAX_FIRST}, but is {first}')
+    if not 0 <= skip <= MAX_SKIP:
+      raise Exception(f'The `skip` argument must be between 0 and {MAX_SKIP}, but is {skip}')
+
+    order_by = args.get('orderBy', 'id')
+    entities = sorted(
+      (entity for entity in entities if matches(entity, args.get('where', {}))),
+      key=lambda entity: (sort_key(entity[order_by]), entity['id']),
+      reverse=args.get('orderDirection', 'asc') == 'desc'
+    )
+
+    return [self.project(select, entity, variables) for entity in entities[skip:skip + first]]
+
+  def project(self, select: Selection, entity: dict[str, Any], variables: dict[str, Any]) -> dict[str, Any]:
+    def resolve(inner: Selection) -> Any:
+      if inner.fmeta.name in LINKS:
+        table, link = LINKS[inner.fmeta.name]
+        children = [child for child in self.tables[table] if child[link] == entity['id']]
+        return self.resolve_list(inner, children, variables)
+
+      value = entity.get(inner.fmeta.name)
+      if inner.selection != []:
+        # References to other entities only resolve their id
+        return {sub.key: value if sub.fmeta.name == 'id' else None for sub in inner.selection}
+
+      return value
+
+    return {inner.key: resolve(inner) for inner in select.selection}
+
+  @contextmanager
+  def patch(self) -> Iterator[None]:
+    """ Patches the pagination algorithms' queries to be executed by the simulator. """
+    query_page = pagination.query_page
+
+    def register_and_query(strategy, doc, args):
+      self.register(doc)
+      return query_page(strategy, doc, args)
+
+    with (
+      mock.patch('subgrounds.client.query', side_effect=self.query),
+      mock.patch('subgrounds.pagination.pagination.query_page', side_effect=register_and_query)
+    ):
+      yield
+
+
+def load_subgraph(sg: Subgrounds) -> Subgraph:
+  with open(SCHEMA_PATH) as f:
+    schema = json.load(f)
+
+  with mock.patch('subgrounds.client.get_schema', return_value=schema):
+    return sg.load_subgraph(URL)
+
+
+def mk_shapes(uniswap: Subgraph) -> dict[str, Callable[[], list[FieldPath]]]:
+  """ Returns the benchmarked query shapes (as functions building their field paths). """
+  def flat() -> list[FieldPath]:
+    swaps = uniswap.Query.swaps(first=8000, orderBy='timestamp')
+    return [swaps.id, swaps.timestamp, swaps.amountUSD]
+
+  def nested() -> list[FieldPath]:
+    pools = uniswap.Query.pools(first=20, orderBy='createdAtTimestamp')
+    return [pools.id, pools.swaps.id, pools.swaps.timestamp]
+
+  def multiple_toplevel() -> list[FieldPath]:
+    fields = [
+      uniswap.Query.mints(first=3000, orderBy='timestamp'),
+      uniswap.Query.burns(first=3000, orderBy='timestamp'),
+      uniswap.Query.swaps(first=3000, orderBy='timestamp'),
+    ]
+    return [fpath for list_field in fields for fpath in [list_field.id, list_field.timestamp]]
+
+  def skip_and_first() -> list[FieldPath]:
+    swaps = uniswap.Query.swaps(first=2500, skip=1200, orderBy='timestamp')
+    return [swaps.id, swaps.timestamp]
+
+  return {
+    'flat': flat,
+    'nested': nested,
+    'multiple toplevel': multiple_toplevel,
+    'skip and first': skip_and_first,
+  }
+
+
+STRATEGIES = {
+  'legacy': LegacyStrategy,
+  'legacy (concurrent fields)': partial(LegacyStrategy, concurrent_fields=True),
+  'shallow': ShallowStrategy,
+}
+
+
+@dataclass
+class Result:
+  requests: int
+  entities: int
+  wall_time: float
+  cpu_time: float
+  peak_memory: int
+  error: Optional[str] = None
+
+
+def count_entities(data: Any) -> int:
+  match data:
+    case list():
+      return sum(1 + count_entities(item) for item in data)
+    case dict():
+      return sum(count_entities(value) for value in data.values())
+    case _:
+      return 0
+
+
+def reset(node: SimulatedGraphNode) -> None:
+  node.requests = 0
+  node.cpu_time = 0.0
+  node.documents.clear()
+
+
+def bench(node: SimulatedGraphNode, sg: Subgrounds, fpaths: list[FieldPath], strategy: Any) -> Result:
+  reset(node)
+  tracemalloc.reset_peak()
+  wall_start, cpu_start = perf_counter(), process_time()
+
+  error = None
+  data = []
+  try:
+    data = sg.query_json(fpaths, pagination_strategy=strategy)
+  except Exception as exn:
+    error = type(exn).__name__
+
+  return Result(
+    requests=node.requests,
+    entities=sum(count_entities(doc_data) for doc_data in data),
+    wall_time=perf_counter() - wall_start,
+    cpu_time=process_time() - cpu_start - node.cpu_time,
+    peak_memory=tracemalloc.get_traced_memory()[1],
+    error=error
+  )
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--latency', type=float, default=0.01, help='Latency of each request (in seconds)')
+  parser.add_argument('--seed', type=int, default=0, help='Seed of the generated entity tables')
+  cli_args = parser.parse_args()
+
+  node = SimulatedGraphNode(mk_tables(cli_args.seed), latency=cli_args.latency)
+  sg = Subgrounds()
+  shapes = mk_shapes(load_subgraph(sg))
+
+  tracemalloc.start()
+  print(f'{"shape":<18} {"strategy":<26} {"requests":>8} {"entities":>9} {"wall (s)":>9} {"cpu (s)":>8} {"peak (MB)":>10}')
+  with node.patch():
+    for shape, mk_fpaths in shapes.items():
+      for name, strategy in STRATEGIES.items():
+        result = bench(node, sg, mk_fpaths(), strategy)
+        print(
+          f'{shape:<18} {name:<26} {result.requests:>8} {result.entities:>9} '
+          f'{result.wall_time:>9.3f} {result.cpu_time:>8.3f} {result.peak_memory / 1e6:>10.2f}'
+          + (f'  ({result.error})' if result.error is not None else '')
+        )
+  tracemalloc.stop()
@@ -100,6 +100,17 @@ INTROSPECTION_QUERY: str = """
 """
 
 
+BLOCK_NUMBER_QUERY: str = """
+  query BlockNumber {
+    _meta {
+      block {
+        number
+      }
+    }
+  }
+"""
+
+
 def get_schema(url: str) -> dict[str, Any]:
   """ Runs the introspection query on the GraphQL API served localed at
   :attr:`url` and returns the result. In case of errors, an exception containing
@@ -126,6 +137,23 @@ def get_schema(url: str) -> dict[str, Any]:
     raise Exception(resp["errors"]) from exn
 
 
+def get_block_number(url: str) -> int:
+  """ Returns the number of the latest block indexed by the subgraph served at
+  :attr:`url`. In case of errors, an exception containing the error message is
+  thrown.
+
+  Args:
+    url (str): The url of the subgraph's GraphQL API
+
+  Raises:
+    Exception: In case of GraphQL server error
+
+  Returns:
+    int: The latest indexed block number
+  """
+  return query(url, BLOCK_NUMBER_QUERY)['_meta']['block']['number']
+
+
 def query(
   url: str,
   query_str: str,
@@ -3,7 +3,7 @@ formatting of GraphQL JSON data into DataFrames.
 """
 
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Optional
 from functools import partial
 
@@ -12,6 +12,7 @@ import pandas as pd
 
 from subgrounds.query import Selection
 from subgrounds.subgraph import FieldPath
+from subgrounds.transform import LocalSyntheticField
 from subgrounds.utils import loop_generator, union
 
 
@@ -58,7 +59,8 @@ class DataFrameColumns:
   def mk_df(
     self,
     data: list[dict[str, Any]],
-    path_map: dict[str, FieldPath]
+    path_map: dict[str, FieldPath],
+    synthetic: dict[str, SyntheticColumn] = {}
   ) -> pd.DataFrame:
     """ Formats the JSON data :attr:`data` into a DataFrame containing the columns
     defined in :attr:`self`.
@@ -66,11 +68,24 @@ class DataFrameColumns:
     Args:
       data (list[dict[str, Any]]): The JSON data to be formatted into a dataframe
       path_map (dict[str, FieldPath]): A dictionary of :attr:`(key-FieldPath)` pairs
+      synthetic (dict[str, SyntheticColumn], optional): The columns of synthetic
+        fields computed from the columns of their dependencies (instead of being
+        extracted from :attr:`data`). Defaults to {}.
 
     Returns:
       pd.DataFrame: The JSON data formatted into a DataFrame
     """
-    cols_data = {col: path_map[col]._extract_data(data) for col in self.fpaths if col in path_map}
+    cols = [col for col in self.fpaths if col in path_map]
+
+    def extracted(col: str) -> list[str]:
+      if col in synthetic:
+        return [dep for dep_col in synthetic[col].deps for dep in extracted(dep_col)]
+      else:
+        return [col]
+
+    extracted_cols = list(dict.fromkeys(dep for col in cols for dep in extracted(col)))
+    cols_values = FieldPath._extractor([path_map[col] for col in extracted_cols])(data)
+    cols_data = dict(zip(extracted_cols, cols_values))
 
     rows_data = []
 
@@ -85,7 +100,20 @@ class DataFrameColumns:
           mk_rows(data={key: value[i] for key, value in list_items.items()}, row=row | non_list_items)
 
     mk_rows(cols_data, row={})
-    return pd.DataFrame(data=rows_data)
+    df = pd.DataFrame(data=rows_data)
+    if df.empty or synthetic == {}:
+      return df
+
+    def compute(col: str) -> None:
+      if col not in df.columns:
+        for dep_col in synthetic[col].deps:
+          compute(dep_col)
+        df[col] = synthetic_column(synthetic[col].transform, [df[dep_col] for dep_col in synthetic[col].deps])
+
+    for col in cols:
+      compute(col)
+
+    return df.drop(columns=[col for col in df.columns if col not in cols])
 
 
 # def columns_of_json(data: dict) -> list[str]:
@@ -145,6 +173,115 @@ class DataFrameColumns:
 #   return list(columns_of_json(data) | traverse)
 
 
+@dataclass(frozen=True)
+class SyntheticColumn:
+  """ Column of a synthetic field computed from the columns of its dependencies.
+
+  Attributes:
+    transform (LocalSyntheticField): The transform of the synthetic field
+    deps (list[str]): The columns of the synthetic field's dependencies
+  """
+  transform: LocalSyntheticField
+  deps: list[str]
+
+
+def synthetic_field_of(fpath: FieldPath) -> Optional[tuple[LocalSyntheticField, list[FieldPath]]]:
+  """ If the leaf of the fieldpath ``fpath`` is a synthetic field whose expression
+  can be evaluated on whole columns (see :attr:`Expr.T.is_vectorizable`), returns
+  its transform along with the fieldpaths of its dependencies. Otherwise, returns
+  ``None``.
+
+  Args:
+    fpath (FieldPath): The fieldpath
+
+  Returns:
+    Optional[tuple[LocalSyntheticField, list[FieldPath]]]: The synthetic field's
+    transform and dependencies
+  """
+  parent = fpath._parent()
+  if parent is None:
+    return None
+
+  for transform in fpath._subgraph._transforms:
+    match transform:
+      case LocalSyntheticField(sfield=sfield) if (
+        sfield is not None
+        and sfield._expr.is_vectorizable
+        and transform.fmeta.name == fpath._leaf.name
+        and transform.type_.name == parent._type.name
+      ):
+        return (transform, list(sfield._deps | map(partial(FieldPath._extend, parent))))
+
+  return None
+
+
+def vectorized_fpaths(fpaths: list[FieldPath]) -> list[FieldPath]:
+  """ Returns the fieldpaths to query in order to compute the columns of the
+  fieldpaths ``fpaths``, i.e.: the fieldpaths of synthetic fields which can be
+  computed on whole columns are replaced by the fieldpaths of their dependencies
+  (see :func:`synthetic_field_of`), so that the synthetic fields are not computed
+  row by row by their transform.
+
+  Args:
+    fpaths (list[FieldPath]): The requested fieldpaths
+
+  Returns:
+    list[FieldPath]: The fieldpaths to query
+  """
+  def expand(fpath: FieldPath) -> list[FieldPath]:
+    match synthetic_field_of(fpath):
+      case (_, deps):
+        return [dep for dep_fpath in deps for dep in expand(dep_fpath)]
+      case None:
+        return [fpath]
+
+    assert False  # Suppress mypy missing return statement warning
+
+  expanded = {
+    dep._name(use_aliases=True): dep
+    for fpath in fpaths
+    for dep in expand(fpath)
+  }
+  return list(expanded.values())
+
+
+def synthetic_column(transform: LocalSyntheticField, cols: list[pd.Series]) -> pd.Series:
+  """ Computes the values of the synthetic field of ``transform`` given the
+  columns ``cols`` of its dependencies.
+
+  If the dependencies are numeric, the synthetic field's expression is evaluated
+  on whole columns, and the rows where a dependency is missing or where the
+  result is not a finite number (e.g.: division by zero) are set to the default
+  value of the synthetic field. Otherwise, the synthetic field is computed row
+  by row (as done by :class:`LocalSyntheticField`).
+
+  Args:
+    transform (LocalSyntheticField): The transform of the synthetic field
+    cols (list[pd.Series]): The columns of the synthetic field's dependencies
+
+  Returns:
+    pd.Series: The column of the synthetic field
+  """
+  if cols != [] and all(pd.api.types.is_numeric_dtype(col) for col in cols):
+    try:
+      values = transform.sfield._f(*cols)
+      invalid = values.isna() | (values.abs() == float('inf'))
+      for col in cols:
+        invalid = invalid | col.isna()
+      return values.mask(invalid, transform.default)
+    except Exception:
+      pass
+
+  def value(row: tuple) -> Any:
+    try:
+      return transform.f(*row)
+    except Exception:
+      return transform.default
+
+  index = cols[0].index if cols != [] else None
+  return pd.Series([value(row) for row in zip(*cols)], index=index, dtype=object).infer_objects()
+
+
 def columns_of_selections(selections: list[Selection]) -> list[DataFrameColumns]:
   """ Generates a list of DataFrame columns specifications based on a list of
   :class:`Selection` trees.
@@ -184,6 +321,7 @@ def df_of_json(
   fpaths: list[FieldPath],
   columns: Optional[list[str]] = None,
   concat: bool = False,
+  vectorize: bool = False
 ) -> pd.DataFrame | list[pd.DataFrame]:
   """ Formats the JSON data :attr:`json_data` into Pandas DataFrames,
   flattening the data in the process.
@@ -203,42 +341,124 @@ def df_of_json(
   as well as the same column names (which can be set using the :attr:`columns`
   argument).
 
+  :attr:`vectorize` indicates whether or not the columns of synthetic fields
+  are computed from the columns of their dependencies (see :func:`synthetic_column`),
+  in which case :attr:`json_data` only needs to contain the data of the
+  fieldpaths returned by :func:`vectorized_fpaths`.
+
   Args:
     json_data (list[dict[str, Any]]): Response data
     fpaths (list[FieldPath]): Fieldpaths that yielded the response data
     columns (Optional[list[str]], optional): Column names. Defaults to None.
     concat (bool, optional): Flag indicating whether or not to concatenate the
       resulting dataframes, if there are more than one. Defaults to False.
+    vectorize (bool, optional): Flag indicating whether or not to compute the
+      columns of synthetic fields from their dependencies. Defaults to False.
 
   Returns:
     pd.DataFrame | list[pd.DataFrame]: The resulting dataframe(s)
   """
-  if columns is None:
-    columns = list(fpaths | map(lambda fpath: fpath._name()))
-
-  col_fpaths = zip(fpaths, loop_generator(columns))
-  col_map = {fpath._name(use_aliases=True): colname for fpath, colname in col_fpaths}
-
-  path_map = {fpath._name(use_aliases=True): fpath for fpath in fpaths}
-
-  dfs = list(
-    fpaths
-    | groupby(lambda fpath: fpath._subgraph._url)
-    | map(lambda group: FieldPath._merge(group[1]))
-    | map(columns_of_selections)
-    | traverse
-    | map(partial(DataFrameColumns.mk_df, data=json_data, path_map=path_map))
-  )
-
-  match (len(dfs), concat):
-    case (0, _):
-      return pd.DataFrame(columns=columns, data=[])
-    case (1, _):
-      return fmt_cols(dfs[0], col_map)
-    case (_, False):
-      return list(dfs | map(lambda df: fmt_cols(df, col_map)))
-    case (_, True):
-      dfs = list(dfs | map(lambda df: fmt_cols(df, col_map)))
-      return pd.concat(dfs, ignore_index=True)
-
-  assert False  # Suppress mypy missing return statement warning
+  return DataFramePlan.of_fpaths(fpaths, columns, vectorize).mk_dfs(json_data, concat)
+
+
+@dataclass(frozen=True)
+class DataFramePlan:
+  """ Class holding everything needed to format response data into DataFrames
+  that only depends on the requested fieldpaths (and not on the data itself).
+  Computing the plan once allows formatting multiple responses to the same
+  request without recomputing the columns of the dataframe(s).
+
+  Attributes:
+    columns (list[str]): The column labels
+    dfs_columns (list[DataFrameColumns]): The columns of each resulting dataframe
+    col_map (dict[str, str]): Mapping of fieldpath names (with aliases) to column labels
+    path_map (dict[str, FieldPath]): Mapping of fieldpath names (with aliases) to fieldpaths
+    synthetic (dict[str, SyntheticColumn]): Columns of synthetic fields computed
+      from the columns of their dependencies (by fieldpath name, with aliases)
+  """
+  columns: list[str]
+  dfs_columns: list[DataFrameColumns]
+  col_map: dict[str, str]
+  path_map: dict[str, FieldPath]
+  synthetic: dict[str, SyntheticColumn] = field(default_factory=dict)
+
+  @staticmethod
+  def of_fpaths(
+    fpaths: list[FieldPath],
+    columns: Optional[list[str]] = None,
+    vectorize: bool = False
+  ) -> DataFramePlan:
+    """ Computes the DataFrame plan of the fieldpaths :attr:`fpaths`.
+
+    Args:
+      fpaths (list[FieldPath]): Fieldpaths of the request
+      columns (Optional[list[str]], optional): Column names. Defaults to None.
+      vectorize (bool, optional): Flag indicating whether or not to compute the
+        columns of synthetic fields from their dependencies. Defaults to False.
+
+    Returns:
+      DataFramePlan: The DataFrame plan
+    """
+    if columns is None:
+      columns = list(fpaths | map(lambda fpath: fpath._name()))
+
+    col_fpaths = zip(fpaths, loop_generator(columns))
+    col_map = {fpath._name(use_aliases=True): colname for fpath, colname in col_fpaths}
+
+    path_map = {fpath._name(use_aliases=True): fpath for fpath in fpaths}
+
+    dfs_columns = list(
+      fpaths
+      | groupby(lambda fpath: fpath._subgraph._url)
+      | map(lambda group: FieldPath._merge(group[1]))
+      | map(columns_of_selections)
+      | traverse
+    )
+
+    synthetic: dict[str, SyntheticColumn] = {}
+    todo = list(fpaths) if vectorize else []
+    while todo != []:
+      fpath = todo.pop()
+      name = fpath._name(use_aliases=True)
+      match synthetic_field_of(fpath):
+        case (transform, deps) if name not in synthetic:
+          synthetic[name] = SyntheticColumn(transform, [dep._name(use_aliases=True) for dep in deps])
+          for dep in deps:
+            path_map.setdefault(dep._name(use_aliases=True), dep)
+          todo.extend(deps)
+
+    return DataFramePlan(columns, dfs_columns, col_map, path_map, synthetic)
+
+  def mk_dfs(
+    self,
+    json_data: list[dict[str, Any]],
+    concat: bool = False
+  ) -> pd.DataFrame | list[pd.DataFrame]:
+    """ Formats the JSON data :attr:`json_data` into DataFrames according to
+    the current plan. See :func:`df_of_json`.
+
+    Args:
+      json_data (list[dict[str, Any]]): Response data
+      concat (bool, optional): Flag indicating whether or not to concatenate the
+        resulting dataframes, if there are more than one. Defaults to False.
+
+    Returns:
+      pd.DataFrame | list[pd.DataFrame]: The resulting dataframe(s)
+    """
+    dfs = list(
+      self.dfs_columns
+      | map(partial(DataFrameColumns.mk_df, data=json_data, path_map=self.path_map, synthetic=self.synthetic))
+    )
+
+    match (len(dfs), concat):
+      case (0, _):
+        return pd.DataFrame(columns=self.columns, data=[])
+      case (1, _):
+        return fmt_cols(dfs[0], self.col_map)
+      case (_, False):
+        return list(dfs | map(lambda df: fmt_cols(df, self.col_map)))
+      case (_, True):
+        dfs = list(dfs | map(lambda df: fmt_cols(df, self.col_map)))
+        return pd.concat(dfs, ignore_index=True)
+
+    assert False  # Suppress mypy missing return statement warning
@@ -4,7 +4,13 @@ The ``pagination`` module contains the pagination algorithms (both regular and i
 that make use of ``PaginationStrategies``.
 
 The ``preprocess`` and ``strategties`` modules implement the currently supported ``PaginationStrategies``:
-``LegacyStrategy`` and ``ShallowStrategy``.
+``LegacyStrategy``, ``ShallowStrategy``, ``RangePartitionStrategy`` and ``FanOutStrategy``.
+
+The ``checkpoint`` module implements checkpoints from which paginations can be resumed.
+
+The ``progress`` module implements progress reports and entity count estimates of paginations.
+
+The ``explain`` module implements cost estimation of query documents for these strategies.
 
 The ``utils`` module contains some generic functions that are useful in the context of pagination.
 """
@@ -16,6 +22,21 @@ from subgrounds.pagination.pagination import (
   PaginationStrategy
 )
 
-from subgrounds.pagination.strategies import LegacyStrategy, ShallowStrategy
+from subgrounds.pagination.strategies import (
+  FanOutPagination,
+  FanOutStrategy,
+  LegacyStrategy,
+  RangePartitionStrategy,
+  ShallowStrategy,
+  SplitPagination
+)
+
+from subgrounds.pagination.preprocess import PaginationNode, PaginationPlan, PrunedDocCache, generate_pagination_nodes, normalize, prune_doc
+
+from subgrounds.pagination.explain import Explanation, ExplainWarning, NodeEstimate, explain
+
+from subgrounds.pagination.utils import AdaptivePageSize
+
+from subgrounds.pagination.checkpoint import Checkpoint, ResumeWarning
 
-from subgrounds.pagination.preprocess import PaginationNode, generate_pagination_nodes, normalize, prune_doc
+from subgrounds.pagination.progress import Estimate, FieldEstimate, Progress, estimate
@@ -0,0 +1,95 @@
+""" Pagination checkpoints
+
+This module implements :class:`Checkpoint`, a serializable snapshot of the state
+of a pagination strategy which allows a long pagination (e.g.: a large export
+with :func:`paginate_iter`) to be resumed where it stopped instead of from the
+first page.
+
+Strategies support checkpoints by implementing a ``checkpoint()`` method, which
+returns their state as a JSON serializable dictionary, and a ``restore(state)``
+method, which restores it.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import json
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+from subgrounds.query import Document
+
+# Default number of pages between two checkpoints saved to disk
+DEFAULT_CHECKPOINT_EVERY = 10
+
+
+class ResumeWarning(UserWarning):
+  pass
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+  """ Snapshot of the state of a pagination strategy after a given number of pages.
+
+  Attributes:
+    fingerprint (str): Fingerprint of the paginated document (see :attr:`Document.fingerprint`)
+    strategy (str): Name of the pagination strategy
+    pages (int): Number of pages queried before the checkpoint
+    state (dict[str, Any]): State of the strategy, as returned by its ``checkpoint`` method
+  """
+  fingerprint: str
+  strategy: str
+  pages: int
+  state: dict[str, Any] = field(default_factory=dict)
+
+  def check(self, doc: Document, strategy: Any) -> None:
+    """ Raises a ``ValueError`` if the checkpoint was not created while paginating
+    the document ``doc`` with the pagination strategy ``strategy``.
+    """
+    if self.fingerprint != doc.fingerprint:
+      raise ValueError(f'Checkpoint: checkpoint does not match document {doc.url}')
+
+    if self.strategy != type(strategy).__name__:
+      raise ValueError(
+        f'Checkpoint: checkpoint was created with {self.strategy}, not {type(strategy).__name__}'
+      )
+
+  def to_json(self) -> dict[str, Any]:
+    return {
+      'fingerprint': self.fingerprint,
+      'strategy': self.strategy,
+      'pages': self.pages,
+      'state': self.state
+    }
+
+  @staticmethod
+  def from_json(data: dict[str, Any]) -> Checkpoint:
+    return Checkpoint(
+      fingerprint=data['fingerprint'],
+      strategy=data['strategy'],
+      pages=data['pages'],
+      state=data['state']
+    )
+
+  def save(self, path: str | Path) -> None:
+    """ Saves the checkpoint to the file ``path``. The file is replaced atomically
+    so that an interrupted save does not corrupt the previous checkpoint.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    with open(tmp_path, mode='w') as f:
+      json.dump(self.to_json(), f)
+    os.replace(tmp_path, path)
+
+  @staticmethod
+  def load(path: str | Path) -> Optional[Checkpoint]:
+    """ Loads the checkpoint saved in the file ``path``, or returns ``None`` if
+    the file does not exist.
+    """
+    path = Path(path)
+    if not path.exists():
+      return None
+
+    with open(path) as f:
+      return Checkpoint.from_json(json.load(f))
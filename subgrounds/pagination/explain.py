@@ -0,0 +1,330 @@
+""" Query cost estimation module
+
+This module implements :func:`explain`, which estimates how many requests,
+entities and bytes executing a query document with a given pagination strategy
+will take, without executing it.
+
+Estimates are upper bounds: they assume that every list field contains at
+least as many entities as requested (i.e.: the value of its ``first`` argument).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field, replace
+from functools import partial
+from math import ceil
+from typing import Any, Optional, Tuple, Type
+import warnings
+
+from pipe import map
+
+from subgrounds.pagination.pagination import PaginationStrategy
+from subgrounds.pagination.preprocess import PaginationNode, PaginationPlan
+from subgrounds.pagination.strategies import (
+  DEFAULT_NUM_PARTITIONS,
+  FanOutStrategy,
+  LegacyStrategy,
+  RangePartitionStrategy,
+  ShallowStrategy
+)
+from subgrounds.pagination.utils import PAGE_SIZE, SERVER_MAX_FIRST
+from subgrounds.query import Document, Selection
+from subgrounds.schema import SchemaMeta
+
+# Rough size (in bytes) of a single field of an entity in the JSON response data
+DEFAULT_BYTES_PER_FIELD = 40
+
+# Number of requests above which a nested list field is reported as pathological
+DEFAULT_WARN_THRESHOLD = 100
+
+
+class ExplainWarning(UserWarning):
+  pass
+
+
+@dataclass(frozen=True)
+class NodeEstimate:
+  """ Estimated cost of paginating through a single list field.
+
+  For nested list fields, the estimates are given per entity of the parent list
+  field, i.e.: for one complete pass of the pagination through the nested field.
+
+  Attributes:
+    key_path (list[str]): Location of the list field in the query
+    first_value (int): Number of entities requested (value of ``first``)
+    requests (int): Estimated number of requests
+    entities (int): Estimated number of entities (including nested entities)
+    bytes (int): Estimated size of the response data (including nested entities)
+    inner (list[NodeEstimate]): Estimates of the nested list fields
+  """
+  key_path: list[str]
+  first_value: int
+  requests: int
+  entities: int
+  bytes: int
+  inner: list[NodeEstimate] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class Explanation:
+  """ Estimated cost of executing a query document.
+
+  Attributes:
+    url (str): Url of the API against which the document is executed
+    strategy (Optional[str]): Name of the pagination strategy (``None`` if
+      pagination is disabled)
+    requests (int): Estimated total number of requests
+    entities (int): Estimated total number of entities
+    bytes (int): Estimated total size of the response data
+    nodes (list[NodeEstimate]): Estimates of the toplevel list fields
+    warnings (list[str]): Issues detected with the query and pagination strategy
+    documents (int): Number of documents into which the pagination is split
+      (and which are paginated concurrently), or 1 if it is not split
+  """
+  url: str
+  strategy: Optional[str]
+  requests: int
+  entities: int
+  bytes: int
+  nodes: list[NodeEstimate] = field(default_factory=list)
+  warnings: list[str] = field(default_factory=list)
+  documents: int = 1
+
+
+def num_fields(document: Document, key_path: list[str]) -> int:
+  """ Returns the number of fields selected on each entity of the list field
+  located at ``key_path`` in ``document``, excluding nested list fields.
+  """
+  def find(selections: list[Selection], key_path: list[str]) -> Optional[Selection]:
+    match key_path:
+      case [key]:
+        return next(filter(lambda select: select.key == key, selections), None)
+      case [key, *rest]:
+        select = next(filter(lambda select: select.key == key, selections), None)
+        return find(select.selection, rest) if select is not None else None
+
+  def count(select: Selection) -> int:
+    if select.selection == []:
+      return 1
+    elif select.fmeta.type_.is_list:
+      return 0
+    else:
+      return sum(select.selection | map(count))
+
+  select = find(document.query.selection, key_path)
+  if select is None:
+    return 1
+  else:
+    return max(1, sum(select.selection | map(count)))
+
+
+def unwrap_strategy(pagination_strategy: Type[PaginationStrategy]) -> Tuple[type, dict[str, Any]]:
+  """ Returns the class of the pagination strategy ``pagination_strategy`` and the
+  keyword arguments with which it is configured (e.g.: with ``functools.partial``).
+
+  Raises:
+    ValueError: If the pagination strategy is not a class (optionally wrapped
+      in partials with keyword arguments only)
+  """
+  match pagination_strategy:
+    case partial(args=()):
+      (cls, keywords) = unwrap_strategy(pagination_strategy.func)
+      return (cls, keywords | pagination_strategy.keywords)
+    case type():
+      return (pagination_strategy, {})
+    case _:
+      raise ValueError(
+        f'explain: unsupported pagination strategy {pagination_strategy} '
+        '(expected a class, optionally configured with keyword arguments using functools.partial)'
+      )
+
+
+def explain(
+  schema: SchemaMeta,
+  doc: Document,
+  pagination_strategy: Optional[Type[PaginationStrategy]] = LegacyStrategy,
+  bytes_per_field: int = DEFAULT_BYTES_PER_FIELD,
+  warn_threshold: int = DEFAULT_WARN_THRESHOLD
+) -> Explanation:
+  """ Estimates the cost of executing the document ``doc`` with the pagination
+  strategy ``pagination_strategy`` without executing it. Issues such as nested
+  list fields requiring many requests are reported as :class:`ExplainWarning`
+  warnings and in the returned :class:`Explanation`.
+
+  Only Subgrounds' own strategies (:class:`LegacyStrategy`,
+  :class:`ShallowStrategy` and :class:`RangePartitionStrategy`) are supported,
+  including when configured with ``functools.partial``. Pages are assumed to
+  contain the configured number of entities (for adaptive page sizes, the
+  initial page size). Documents which the :class:`FanOutStrategy` would fan out
+  are not supported.
+
+  Args:
+    schema (SchemaMeta): The GraphQL schema on which the document is based
+    doc (Document): The query document
+    pagination_strategy (Optional[Type[PaginationStrategy]], optional): The pagination
+      strategy. If ``None``, the document is assumed to be executed without
+      pagination. Defaults to :class:`LegacyStrategy`.
+    bytes_per_field (int, optional): Estimated size of a single field in the
+      response data. Defaults to :attr:`DEFAULT_BYTES_PER_FIELD`.
+    warn_threshold (int, optional): Number of requests above which a nested list
+      field is reported. Defaults to :attr:`DEFAULT_WARN_THRESHOLD`.
+
+  Raises:
+    ValueError: If the pagination strategy is not supported
+
+  Returns:
+    Explanation: The estimated cost of executing the document
+  """
+  plan = PaginationPlan.of_document(schema, doc)
+  issues: list[str] = []
+
+  (strategy_cls, keywords) = unwrap_strategy(pagination_strategy) if pagination_strategy is not None else (None, {})
+  adaptive_size = keywords.get('page_size')
+  page_size = adaptive_size.clamp(PAGE_SIZE, SERVER_MAX_FIRST.get(doc.url)) if adaptive_size is not None else PAGE_SIZE
+
+  def init() -> LegacyStrategy:
+    # The block is not pinned since that would query the subgraph
+    return strategy_cls(schema, doc, plan=plan, **(keywords | {'pin_block': False}))
+
+  def path(node: PaginationNode) -> str:
+    return '.'.join(node.key_path)
+
+  def entity_bytes(node: PaginationNode) -> int:
+    return num_fields(plan.normalized_doc, node.key_path) * bytes_per_field
+
+  # Estimates of a list field whose entities are all queried in a single
+  # request (i.e.: without pagination of nested fields)
+  def single_page(node: PaginationNode, num_entities: int, requests: int = 1) -> NodeEstimate:
+    inner = list(node.inner | map(lambda inner: single_page(inner, min(inner.first_value, PAGE_SIZE))))
+    return NodeEstimate(
+      key_path=node.key_path,
+      first_value=node.first_value,
+      requests=requests,
+      entities=num_entities * (1 + sum(inner | map(lambda est: est.entities))),
+      bytes=num_entities * (entity_bytes(node) + sum(inner | map(lambda est: est.bytes))),
+      inner=inner
+    )
+
+  def legacy(node: PaginationNode) -> NodeEstimate:
+    if node.inner == []:
+      return NodeEstimate(
+        key_path=node.key_path,
+        first_value=node.first_value,
+        requests=max(1, ceil(node.first_value / page_size)),
+        entities=node.first_value,
+        bytes=node.first_value * entity_bytes(node)
+      )
+
+    # Non-leaf cursors query their entities one at a time (i.e.: `first: 1`)
+    # and paginate through all nested fields for each entity
+    inner = list(node.inner | map(legacy))
+    inner_requests = sum(inner | map(lambda est: est.requests))
+    requests = node.first_value * inner_requests
+
+    if requests > warn_threshold:
+      issues.append(
+        f'{path(node)}: nested list fields are paginated for each of the {node.first_value} '
+        f'entities one at a time ({node.first_value} x {inner_requests} = {requests} requests)'
+      )
+
+    return NodeEstimate(
+      key_path=node.key_path,
+      first_value=node.first_value,
+      requests=requests,
+      entities=node.first_value * (1 + sum(inner | map(lambda est: est.entities))),
+      bytes=node.first_value * (
+        inner_requests * entity_bytes(node)
+        + sum(inner | map(lambda est: est.bytes))
+      ),
+      inner=inner
+    )
+
+  def check_truncated(node: PaginationNode) -> None:
+    for inner in node.inner:
+      if inner.first_value > PAGE_SIZE:
+        issues.append(
+          f'{path(inner)}: only the first {PAGE_SIZE} of the {inner.first_value} '
+          f'requested entities will be queried by ShallowStrategy'
+        )
+      check_truncated(inner)
+
+  def legacy_all() -> Tuple[list[NodeEstimate], int, int]:
+    nodes = list(plan.pagination_nodes | map(legacy))
+    documents = len(nodes) if keywords.get('concurrent_fields', False) and len(nodes) > 1 else 1
+    return (nodes, max(1, sum(nodes | map(lambda est: est.requests))), documents)
+
+  documents = 1
+  match pagination_strategy:
+    case None:
+      nodes = list(plan.pagination_nodes | map(lambda node: single_page(node, node.first_value)))
+      requests = 1
+      strategy_name = None
+
+    case _ if issubclass(strategy_cls, RangePartitionStrategy):
+      strategy_name = strategy_cls.__name__
+      strategy = init() if plan.pagination_nodes != [] else None
+      if strategy is None or strategy.page_node is None:
+        (nodes, requests, documents) = legacy_all()
+      else:
+        # The range is split into windows paginated concurrently after a first
+        # query fetching the range. Entities are assumed to be evenly spread.
+        node = strategy.page_node
+        num_partitions = keywords.get('num_partitions', DEFAULT_NUM_PARTITIONS)
+        if keywords.get('shard_size') is not None:
+          num_partitions = max(1, min(num_partitions, ceil(node.first_value / keywords['shard_size'])))
+
+        estimate = legacy(node)
+        if node.inner == []:
+          window_pages = max(1, ceil(ceil(node.first_value / num_partitions) / page_size))
+          estimate = replace(estimate, requests=num_partitions * window_pages)
+
+        nodes = [estimate]
+        requests = 1 + estimate.requests
+        documents = num_partitions
+
+    case _ if issubclass(strategy_cls, FanOutStrategy):
+      strategy_name = strategy_cls.__name__
+      if plan.pagination_nodes != [] and init().fan_out is not None:
+        raise ValueError(f'explain: documents fanned out by {strategy_name} are not supported')
+      (nodes, requests, documents) = legacy_all()
+
+    case _ if issubclass(strategy_cls, LegacyStrategy):
+      strategy_name = strategy_cls.__name__
+      (nodes, requests, documents) = legacy_all()
+
+    case _ if issubclass(strategy_cls, ShallowStrategy):
+      # All toplevel list fields are paginated at the same time and pagination
+      # stops as soon as one of them is exhausted
+      pages = list(plan.pagination_nodes | map(lambda node: max(1, ceil(node.first_value / PAGE_SIZE))))
+      requests = min(pages, default=1)
+
+      if len(set(pages)) > 1:
+        issues.append(
+          'toplevel list fields require different numbers of pages; '
+          f'ShallowStrategy will stop after {requests} request(s), truncating the others'
+        )
+      for node in plan.pagination_nodes:
+        check_truncated(node)
+
+      nodes = list(
+        plan.pagination_nodes
+        | map(lambda node: single_page(node, min(node.first_value, requests * PAGE_SIZE), requests))
+      )
+      strategy_name = strategy_cls.__name__
+
+    case _:
+      raise ValueError(f'explain: unsupported pagination strategy {strategy_cls.__name__}')
+
+  for issue in issues:
+    warnings.warn(f'{doc.url}: {issue}', ExplainWarning)
+
+  return Explanation(
+    url=doc.url,
+    strategy=strategy_name,
+    requests=requests,
+    entities=sum(nodes | map(lambda est: est.entities)),
+    bytes=sum(nodes | map(lambda est: est.bytes)),
+    nodes=nodes,
+    warnings=issues,
+    documents=documents
+  )
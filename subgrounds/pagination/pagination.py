@@ -4,14 +4,35 @@ iterative) that make use of pagination strategies.
 
 from __future__ import annotations
 
-from typing import Any, Iterator, Protocol, Tuple, Type, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import inspect
+from pathlib import Path
+from threading import Event
+from time import perf_counter
+import warnings
+from typing import Any, Callable, Iterator, Protocol, Tuple, Type, Optional
 
-from subgrounds.pagination.strategies import SkipPagination, StopPagination
-from subgrounds.pagination.utils import merge
+from subgrounds.pagination.checkpoint import DEFAULT_CHECKPOINT_EVERY, Checkpoint, ResumeWarning
+from subgrounds.pagination.preprocess import PaginationPlan
+from subgrounds.pagination.progress import Progress, ProgressTracker
+from subgrounds.pagination.strategies import (
+  FAN_OUT_CHILDREN_KEY,
+  FAN_OUT_PARENT_KEY,
+  FanOutField,
+  FanOutPagination,
+  LegacyStrategy,
+  SkipPagination,
+  SplitPagination,
+  StopPagination,
+  limit_document
+)
+from subgrounds.pagination.utils import PageAccumulator
 
 from subgrounds.query import Document
 import subgrounds.client as client
 from subgrounds.schema import SchemaMeta
+from subgrounds.utils import prefetch
 
 
 class PaginationError(RuntimeError):
@@ -26,6 +47,10 @@ class PaginationStrategy(Protocol):
     the provided :class:`Document` ``document``, then the constructor should raise a 
     :class:`SkipPagination` exception.
 
+    Strategies can optionally accept a ``plan`` keyword argument, in which case
+    they will be given a precomputed :class:`PaginationPlan` of ``document`` when
+    one is available (see :func:`init_strategy`).
+
     Args:
         schema (SchemaMeta): The schema of the API against which ``document`` will be executed
         document (Document): The query document
@@ -38,7 +63,9 @@ class PaginationStrategy(Protocol):
     ``page_data`` will be ``None``.
 
     If pagination should be interupted (e.g.: if enough entities have been queried), then this method
-    should raise a :class:`StopPagination` exception.
+    should raise a :class:`StopPagination` exception. If pagination should instead continue
+    with several independent documents paginated concurrently, then this method should raise
+    a :class:`SplitPagination` exception.
 
     Args:
         page_data (Optional[dict[str, Any]], optional): The previous query's response data.
@@ -52,82 +79,494 @@ class PaginationStrategy(Protocol):
     ...
 
 
+def accepts_plan(pagination_strategy: Type[PaginationStrategy]) -> bool:
+  """ Returns ``True`` if the pagination strategy ``pagination_strategy`` can be
+  initialized with a precomputed :class:`PaginationPlan` and ``False`` otherwise.
+  """
+  return 'plan' in inspect.signature(pagination_strategy).parameters
+
+
+def init_strategy(
+  schema: SchemaMeta,
+  doc: Document,
+  pagination_strategy: Type[PaginationStrategy],
+  plan: Optional[PaginationPlan] = None
+) -> PaginationStrategy:
+  """ Initializes the pagination strategy ``pagination_strategy`` for the document ``doc``.
+  If ``plan`` is provided and the strategy accepts a ``plan`` argument (like Subgrounds'
+  own strategies), then the strategy is initialized with the precomputed pagination plan.
+
+  Args:
+    schema (SchemaMeta): The GraphQL schema on which the request document is based
+    doc (Document): The request document
+    pagination_strategy (Type[PaginationStrategy]): The pagination strategy
+    plan (Optional[PaginationPlan], optional): Precomputed pagination plan of ``doc``.
+      Defaults to None.
+
+  Returns:
+    PaginationStrategy: The initialized pagination strategy
+  """
+  if plan is not None and accepts_plan(pagination_strategy):
+    return pagination_strategy(schema, doc, plan=plan)
+  else:
+    return pagination_strategy(schema, doc)
+
+
+def restore_strategy(strategy: PaginationStrategy, doc: Document, checkpoint: Checkpoint) -> None:
+  """ Restores the state of the pagination strategy ``strategy`` from the
+  checkpoint ``checkpoint``, which must have been created while paginating ``doc``.
+
+  Raises:
+    ValueError: If the checkpoint does not match ``doc`` or ``strategy``, or if
+      the strategy does not support checkpoints
+  """
+  checkpoint.check(doc, strategy)
+
+  if not hasattr(strategy, 'restore'):
+    raise ValueError(f'{type(strategy).__name__} does not support checkpoints')
+
+  strategy.restore(checkpoint.state)
+
+
+def mk_checkpoint(strategy: PaginationStrategy, doc: Document, pages: int) -> Optional[Checkpoint]:
+  """ Returns the checkpoint of the pagination strategy ``strategy`` after
+  ``pages`` pages of ``doc``, or ``None`` if the strategy does not support checkpoints.
+  """
+  state = strategy.checkpoint() if hasattr(strategy, 'checkpoint') else None
+  if state is None:
+    return None
+
+  return Checkpoint(
+    fingerprint=doc.fingerprint,
+    strategy=type(strategy).__name__,
+    pages=pages,
+    state=state
+  )
+
+
+def query_page(
+  strategy: PaginationStrategy,
+  doc: Document,
+  args: dict[str, Any]
+) -> dict[str, Any]:
+  """ Executes the document ``doc`` with the pagination arguments ``args`` and
+  returns the page of data.
+
+  Strategies can optionally implement an ``observe(latency, page_data)`` method,
+  which is called with the duration (in seconds) of each successful query, and a
+  ``recover(exn)`` method, which is called when a query fails and either returns
+  the new document and arguments with which to retry the query or raises an exception.
+
+  Args:
+    strategy (PaginationStrategy): The pagination strategy
+    doc (Document): The query document
+    args (dict[str, Any]): The pagination arguments
+
+  Returns:
+    dict[str, Any]: The page of data
+  """
+  while True:
+    start = perf_counter()
+    try:
+      page_data = client.query(
+        url=doc.url,
+        query_str=doc.graphql,
+        variables=doc.variables | args
+      )
+    except Exception as exn:
+      if not hasattr(strategy, 'recover'):
+        raise
+      doc, args = strategy.recover(exn)
+      continue
+
+    if hasattr(strategy, 'observe'):
+      strategy.observe(perf_counter() - start, page_data)
+
+    return page_data
+
+
+def paginate_split(schema: SchemaMeta, split: SplitPagination) -> Iterator[dict[str, Any]]:
+  """ Paginates the documents of ``split`` concurrently and returns an iterator
+  over their response data, in order. If ``split.key`` is set, the entities of
+  that toplevel list field are truncated to the first ``split.first`` entities.
+
+  Documents are started in order, with at most ``split.max_workers`` documents
+  being paginated at once. If ``split.key`` is set, each document only selects
+  the entities still missing when it is started and, once the first
+  ``split.first`` entities have been returned, no other document is started
+  and the documents being paginated are stopped after their current page.
+
+  Args:
+    schema (SchemaMeta): The GraphQL schema on which the documents are based
+    split (SplitPagination): The split pagination
+
+  Returns:
+    Iterator[dict[str, Any]]: An iterator over the response data of each document
+  """
+  remaining = split.first
+  documents = iter(split.documents)
+  stop = Event()
+  executor = ThreadPoolExecutor(max_workers=split.max_workers)
+
+  def fetch(doc: Document) -> dict[str, Any]:
+    data = PageAccumulator()
+    for (page_data, _) in paginate_pages(schema, doc, pagination_strategy=split.pagination_strategy):
+      data.add(page_data)
+      if stop.is_set():
+        break
+    return data.data
+
+  def submit() -> Optional[Future]:
+    doc = next(documents, None)
+    if doc is None:
+      return None
+    if split.key is not None:
+      doc = limit_document(doc, split.key, remaining)
+    return executor.submit(fetch, doc)
+
+  try:
+    num_workers = split.max_workers if split.max_workers is not None else len(split.documents)
+    futures: deque[Future] = deque()
+    for _ in range(num_workers):
+      future = submit()
+      if future is not None:
+        futures.append(future)
+
+    while len(futures) > 0:
+      data = futures.popleft().result()
+
+      if split.key is not None:
+        entities = data.get(split.key, [])
+        if len(entities) >= remaining:
+          data[split.key] = entities[:remaining]
+          yield data
+          break
+
+        remaining -= len(entities)
+
+      yield data
+
+      future = submit()
+      if future is not None:
+        futures.append(future)
+  finally:
+    stop.set()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def paginate_split_pages(schema: SchemaMeta, split: SplitPagination) -> Iterator[dict[str, Any]]:
+  """ Same as :func:`paginate_split`, except that the documents of ``split`` are
+  paginated one after the other and that each page of data is returned as soon
+  as it is queried (instead of the combined data of each document).
+
+  Args:
+    schema (SchemaMeta): The GraphQL schema on which the documents are based
+    split (SplitPagination): The split pagination
+
+  Returns:
+    Iterator[dict[str, Any]]: An iterator over the pages of data of each document
+  """
+  remaining = split.first
+
+  for doc in split.documents:
+    if split.key is not None:
+      doc = limit_document(doc, split.key, remaining)
+
+    for (page_data, _) in paginate_pages(schema, doc, pagination_strategy=split.pagination_strategy):
+      if split.key is None:
+        yield page_data
+        continue
+
+      entities = page_data.get(split.key) or []
+      if len(entities) >= remaining:
+        page_data[split.key] = entities[:remaining]
+        yield page_data
+        return
+
+      remaining -= len(entities)
+      yield page_data
+
+
+def fetch_children(
+  schema: SchemaMeta,
+  url: str,
+  field: FanOutField,
+  parent_ids: list[str]
+) -> dict[str, list[dict[str, Any]]]:
+  """ Fetches the first ``field.first`` child entities of each of the parent
+  entities ``parent_ids`` and returns them grouped by parent id.
+
+  Child entities are queried for all parent entities at once, up to a total of
+  ``field.first`` times the number of parent entities. If that many entities
+  are returned, the parent entities with fewer than ``field.first`` child
+  entities may be missing some, so they are queried again. At least one parent
+  entity is complete after each query, so this terminates.
+  """
+  children: dict[str, list[dict[str, Any]]] = {id_: [] for id_ in parent_ids}
+  remaining = parent_ids
+
+  while len(remaining) > 0:
+    data = paginate(schema, field.mk_doc(url, remaining), pagination_strategy=LegacyStrategy)
+    entities = data.get(FAN_OUT_CHILDREN_KEY, [])
+
+    grouped: dict[str, list[dict[str, Any]]] = {id_: [] for id_ in remaining}
+    for entity in entities:
+      parent_id = entity.pop(FAN_OUT_PARENT_KEY)['id']
+      if parent_id in grouped:
+        grouped[parent_id].append(entity)
+
+    for id_ in remaining:
+      children[id_] = grouped[id_][:field.first]
+
+    if len(entities) < field.first * len(remaining):
+      break
+
+    remaining = [id_ for id_ in remaining if len(children[id_]) < field.first]
+
+  return children
+
+
+def paginate_fan_out(schema: SchemaMeta, fan_out: FanOutPagination) -> Iterator[dict[str, Any]]:
+  """ Paginates the parent entities of ``fan_out``, then fetches the child
+  entities of each batch of parent entities concurrently and returns an
+  iterator over the batches of parent entities (with their child entities), in order.
+
+  Args:
+    schema (SchemaMeta): The GraphQL schema on which the documents are based
+    fan_out (FanOutPagination): The fanned out pagination
+
+  Returns:
+    Iterator[dict[str, Any]]: An iterator over the response data of each batch
+  """
+  url = fan_out.parent_doc.url
+  parents = paginate(schema, fan_out.parent_doc, pagination_strategy=LegacyStrategy).get(fan_out.key, [])
+  batches = [parents[i:i + fan_out.batch_size] for i in range(0, len(parents), fan_out.batch_size)]
+
+  def stitch(batch: list[dict[str, Any]]) -> dict[str, Any]:
+    parent_ids = [parent['id'] for parent in batch]
+    for field in fan_out.fields:
+      children = fetch_children(schema, url, field, parent_ids)
+      for parent in batch:
+        parent[field.key] = children[parent['id']]
+    return {fan_out.key: batch}
+
+  executor = ThreadPoolExecutor(max_workers=fan_out.max_workers)
+  try:
+    yield from executor.map(stitch, batches)
+  finally:
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
 def paginate(
   schema: SchemaMeta,
   doc: Document,
-  pagination_strategy: Type[PaginationStrategy]
+  pagination_strategy: Type[PaginationStrategy],
+  plan: Optional[PaginationPlan] = None,
+  checkpoint: Optional[Checkpoint] = None
 ) -> dict[str, Any]:
   """ Executes the request document `doc` based on the GraphQL schema `schema` and returns
   the response as a JSON dictionary.
 
+  If ``checkpoint`` is provided, pagination resumes from it and the returned data
+  only contains the pages queried after the checkpoint.
+
   Args:
     schema (SchemaMeta): The GraphQL schema on which the request document is based
     doc (Document): The request document
+    pagination_strategy (Type[PaginationStrategy]): The pagination strategy
+    plan (Optional[PaginationPlan], optional): Precomputed pagination plan of ``doc``.
+      Defaults to None.
+    checkpoint (Optional[Checkpoint], optional): Checkpoint from which to resume
+      the pagination. Defaults to None.
 
   Returns:
     dict[str, Any]: The response data as a JSON dictionary
   """
 
   try:
-    strategy = pagination_strategy(schema, doc)
+    strategy = init_strategy(schema, doc, pagination_strategy, plan)
+    if checkpoint is not None:
+      restore_strategy(strategy, doc, checkpoint)
 
-    data: dict[str, Any] = {}
+    data = PageAccumulator()
     doc, args = strategy.step()
 
     while True:
       try:
-        page_data = client.query(
-          url=doc.url,
-          query_str=doc.graphql,
-          variables=doc.variables | args
-        )
-        data = merge(data, page_data)
+        page_data = query_page(strategy, doc, args)
+        data.add(page_data)
         doc, args = strategy.step(page_data)
       except StopPagination:
         break
+      except SplitPagination as split:
+        data = PageAccumulator()
+        for split_data in paginate_split(schema, split):
+          data.add(split_data)
+        break
       except Exception as exn:
         raise PaginationError(exn.args[0], strategy)
 
-    return data
+    return data.data
 
   except SkipPagination:
     return client.query(doc.url, doc.graphql, variables=doc.variables)
 
+  except SplitPagination as split:
+    data = PageAccumulator()
+    for split_data in paginate_split(schema, split):
+      data.add(split_data)
+    return data.data
 
-def paginate_iter(
+  except FanOutPagination as fan_out:
+    data = PageAccumulator()
+    for fan_out_data in paginate_fan_out(schema, fan_out):
+      data.add(fan_out_data)
+    return data.data
+
+
+def paginate_pages(
   schema: SchemaMeta,
   doc: Document,
-  pagination_strategy: Type[PaginationStrategy]
-) -> Iterator[dict[str, Any]]:
-  """ Executes the request document `doc` based on the GraphQL schema `schema` and returns
-  the response as a JSON dictionary.
+  pagination_strategy: Type[PaginationStrategy],
+  plan: Optional[PaginationPlan] = None,
+  checkpoint: Optional[Checkpoint] = None
+) -> Iterator[Tuple[dict[str, Any], Optional[Checkpoint]]]:
+  """ Same as :func:`paginate_iter`, except that each page of data is returned
+  along with the checkpoint from which to resume the pagination after that page
+  (or ``None`` if the pagination cannot be resumed, e.g.: after the last page or
+  if the strategy does not support checkpoints).
 
   Args:
     schema (SchemaMeta): The GraphQL schema on which the request document is based
     doc (Document): The request document
+    pagination_strategy (Type[PaginationStrategy]): The pagination strategy
+    plan (Optional[PaginationPlan], optional): Precomputed pagination plan of ``doc``.
+      Defaults to None.
+    checkpoint (Optional[Checkpoint], optional): Checkpoint from which to resume
+      the pagination. Defaults to None.
 
   Returns:
-    dict[str, Any]: The response data as a JSON dictionary
+    Iterator[Tuple[dict[str, Any], Optional[Checkpoint]]]: An iterator over the pages
+    of data and their checkpoints
   """
+  fingerprint_doc = doc
 
   try:
-    strategy = pagination_strategy(schema, doc)
+    strategy = init_strategy(schema, doc, pagination_strategy, plan)
+    if checkpoint is not None:
+      restore_strategy(strategy, doc, checkpoint)
 
+    pages = checkpoint.pages if checkpoint is not None else 0
     doc, args = strategy.step()
 
     while True:
       try:
-        page_data = client.query(
-          url=doc.url,
-          query_str=doc.graphql,
-          variables=doc.variables | args
-        )
-        yield page_data
+        page_data = query_page(strategy, doc, args)
+        pages = pages + 1
         doc, args = strategy.step(page_data)
       except StopPagination:
+        yield (page_data, None)
+        break
+      except SplitPagination as split:
+        yield from ((data, None) for data in paginate_split_pages(schema, split))
         break
       except Exception as exn:
         raise PaginationError(exn.args[0], strategy)
 
+      yield (page_data, mk_checkpoint(strategy, fingerprint_doc, pages))
+
   except SkipPagination:
-    return client.query(doc.url, doc.graphql, variables=doc.variables)
\ No newline at end of file
+    yield (client.query(doc.url, doc.graphql, variables=doc.variables), None)
+
+  except SplitPagination as split:
+    yield from ((data, None) for data in paginate_split_pages(schema, split))
+
+  except FanOutPagination as fan_out:
+    yield from ((data, None) for data in paginate_fan_out(schema, fan_out))
+
+
+def paginate_iter(
+  schema: SchemaMeta,
+  doc: Document,
+  pagination_strategy: Type[PaginationStrategy],
+  plan: Optional[PaginationPlan] = None,
+  prefetch_depth: int = 0,
+  checkpoint: Optional[Checkpoint] = None,
+  checkpoint_path: Optional[str | Path] = None,
+  checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+  progress: Optional[Callable[[Progress], None]] = None,
+  probe: bool = False
+) -> Iterator[dict[str, Any]]:
+  """ Executes the request document `doc` based on the GraphQL schema `schema` and returns
+  the response as a JSON dictionary.
+
+  If ``prefetch_depth`` is positive, the next pages are queried on a background
+  thread while the current page is being consumed, with at most ``prefetch_depth``
+  pages queried ahead.
+
+  If ``checkpoint_path`` is provided, a :class:`Checkpoint` is saved to that file
+  every ``checkpoint_every`` pages, once the pages have been consumed. If the file
+  already exists (e.g.: because a previous pagination of ``doc`` was interrupted
+  or stopped early), pagination resumes from the checkpoint it contains and a
+  :class:`ResumeWarning` is emitted. Deleting the file (e.g.: with
+  :func:`Subgrounds.clear_checkpoints`) restarts the pagination from the first
+  page. The file is deleted once all pages have been consumed.
+
+  If ``progress`` is provided, it is called with a :class:`Progress` report after
+  each page. If ``probe`` is ``True``, the total number of entities is estimated
+  with an additional query before the first page (see :func:`estimate`), so that
+  the reports include the estimated remaining entities and time.
+
+  Args:
+    schema (SchemaMeta): The GraphQL schema on which the request document is based
+    doc (Document): The request document
+    pagination_strategy (Type[PaginationStrategy]): The pagination strategy
+    plan (Optional[PaginationPlan], optional): Precomputed pagination plan of ``doc``.
+      Defaults to None.
+    prefetch_depth (int, optional): Maximum number of pages queried ahead.
+      Defaults to 0 (i.e.: no prefetching).
+    checkpoint (Optional[Checkpoint], optional): Checkpoint from which to resume
+      the pagination. Defaults to None.
+    checkpoint_path (Optional[str | Path], optional): File in which checkpoints
+      are saved. Defaults to None (i.e.: no checkpoints).
+    checkpoint_every (int, optional): Number of pages between two checkpoints.
+      Defaults to :attr:`DEFAULT_CHECKPOINT_EVERY`.
+    progress (Optional[Callable[[Progress], None]], optional): Callback called
+      with the progress of the pagination after each page. Defaults to None.
+    probe (bool, optional): Whether or not to estimate the total number of
+      entities before the first page. Defaults to False.
+
+  Returns:
+    dict[str, Any]: The response data as a JSON dictionary
+  """
+  if checkpoint is None and checkpoint_path is not None:
+    checkpoint = Checkpoint.load(checkpoint_path)
+    if checkpoint is not None:
+      warnings.warn(
+        f'{doc.url}: resuming pagination after {checkpoint.pages} pages from checkpoint {checkpoint_path}',
+        ResumeWarning
+      )
+
+  tracker = None
+  if progress is not None:
+    tracker = ProgressTracker.of_document(schema, doc, progress, plan=plan, probe=probe)
+
+  pages = paginate_pages(schema, doc, pagination_strategy, plan, checkpoint)
+  if prefetch_depth > 0:
+    pages = prefetch(pages, prefetch_depth)
+
+  for page_data, page_checkpoint in pages:
+    if tracker is not None:
+      tracker.update(page_data)
+
+    yield page_data
+
+    if (
+      checkpoint_path is not None
+      and page_checkpoint is not None
+      and page_checkpoint.pages % checkpoint_every == 0
+    ):
+      page_checkpoint.save(checkpoint_path)
+
+  if checkpoint_path is not None:
+    Path(checkpoint_path).unlink(missing_ok=True)
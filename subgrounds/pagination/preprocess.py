@@ -3,8 +3,10 @@
 
 from __future__ import annotations
 
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from itertools import count
+from threading import Lock
 from pipe import map, traverse
 from typing import Any
 from subgrounds.pagination.utils import DEFAULT_NUM_ENTITIES
@@ -256,15 +258,90 @@ def normalize(
     | traverse
   )
 
-  return Document(
+  normalized_doc = Document(
     url=document.url,
     query=query.add_vardefs(vardefs),
-    fragments=document.fragments,     # TODO: normalize fragments
     variables=document.variables
   )
 
+  # Normalization modifies the selections of list fields, so fragments are
+  # extracted again from the normalized query
+  if document.fragments != []:
+    return normalized_doc.extract_fragments()
+  else:
+    return normalized_doc
+
+
+# Maximum number of pagination plans cached by `PaginationPlan.of_document`
+PLAN_CACHE_SIZE = 256
+
+# Cached pagination plans (and their schema) by schema id and document fingerprint
+_plan_cache: OrderedDict[tuple[int, str], tuple[SchemaMeta, PaginationPlan]] = OrderedDict()
+_plan_cache_lock = Lock()
+
+
+@dataclass(frozen=True)
+class PaginationPlan:
+  """ Class representing the result of the preprocessing of a query document
+  for pagination, i.e.: the document's pagination nodes and its normalized
+  version. Plans do not depend on the document's variables and can therefore
+  be computed once and reused every time the same document is executed.
+
+  Attributes:
+    pagination_nodes (list[PaginationNode]): The document's pagination nodes
+    normalized_doc (Document): The normalized document
+  """
+  pagination_nodes: list[PaginationNode]
+  normalized_doc: Document
+
+  @staticmethod
+  def of_document(schema: SchemaMeta, document: Document) -> PaginationPlan:
+    """ Returns the pagination plan of ``document``. Plans are cached by schema
+    (identity) and structural fingerprint of the document (see
+    :attr:`Document.structural_fingerprint`), with the least recently used
+    plans evicted once :attr:`PLAN_CACHE_SIZE` plans are cached, so that
+    documents executed repeatedly (e.g.: by dashboards) are only preprocessed once.
+    """
+    key = (id(schema), document.structural_fingerprint)
+
+    with _plan_cache_lock:
+      match _plan_cache.get(key):
+        case (cached_schema, plan) if cached_schema is schema:
+          _plan_cache.move_to_end(key)
+          return plan
+
+    pagination_nodes = generate_pagination_nodes(schema, document)
+    plan = PaginationPlan(
+      pagination_nodes=pagination_nodes,
+      normalized_doc=normalize(schema, document, pagination_nodes)
+    )
+
+    with _plan_cache_lock:
+      _plan_cache[key] = (schema, plan)
+      while len(_plan_cache) > PLAN_CACHE_SIZE:
+        _plan_cache.popitem(last=False)
+
+    return plan
+
+  @staticmethod
+  def cache_clear() -> None:
+    with _plan_cache_lock:
+      _plan_cache.clear()
+
+  def normalized_doc_with_variables(self, variables: dict[str, Any]) -> Document:
+    return Document(
+      url=self.normalized_doc.url,
+      query=self.normalized_doc.query,
+      fragments=self.normalized_doc.fragments,
+      variables=variables
+    )
+
 
 def prune_doc(document: Document, args: dict[str, Any]) -> Document:
+  # Variables already bound in the document (e.g.: user provided variables) are
+  # defined as well as the pagination arguments
+  args = document.variables | args
+
   def prune_where_arg(where_arg: Argument) -> Argument:
     input_val: InputValue.Object = where_arg.value
     return Argument(
@@ -290,4 +367,28 @@ def prune_doc(document: Document, args: dict[str, Any]) -> Document:
         )
       )
       .prune_undefined(args)
-  )
\ No newline at end of file
+  )
+
+
+@dataclass
+class PrunedDocCache:
+  """ Cache of the pruned versions of a normalized document (see :func:`prune_doc`).
+  The pruned document only depends on which pagination arguments are defined
+  (not on their values), so pruned documents are cached by the set of names
+  of the pagination arguments. Since the rendered GraphQL of a document is
+  cached as well (see :attr:`Document.graphql`), consecutive pages with the
+  same arguments reuse the same document and query string.
+
+  Attributes:
+    document (Document): The normalized document
+    pruned (dict[frozenset[str], Document]): The pruned documents by set of
+      pagination argument names
+  """
+  document: Document
+  pruned: dict[frozenset[str], Document] = field(default_factory=dict)
+
+  def prune(self, args: dict[str, Any]) -> Document:
+    key = frozenset(args)
+    if key not in self.pruned:
+      self.pruned[key] = prune_doc(self.document, args)
+    return self.pruned[key]
@@ -0,0 +1,215 @@
+""" Pagination progress reporting
+
+This module implements the progress reports of long paginations (e.g.: with
+:func:`paginate_iter`). After each page, a :class:`Progress` report with the
+number of entities and pages queried so far, the throughput and (if the total
+number of entities has been estimated) the estimated remaining entities and
+time is passed to a user provided callback.
+
+The total number of entities is estimated by :func:`estimate`, which queries
+the boundaries of the range of ordering values of each toplevel list field in
+a single cheap query (see :func:`estimate_num_entities`).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import partial
+from time import perf_counter
+from typing import Any, Callable, Optional
+
+from subgrounds.pagination.preprocess import PaginationNode, PaginationPlan
+from subgrounds.pagination.strategies import probe_document, probe_selection
+from subgrounds.pagination.utils import PROBE_SAMPLE_SIZE, estimate_num_entities
+from subgrounds.query import Document, Selection
+import subgrounds.client as client
+from subgrounds.schema import SchemaMeta
+
+
+@dataclass(frozen=True)
+class FieldEstimate:
+  """ Estimated number of entities of a toplevel list field.
+
+  Attributes:
+    key (str): Key of the toplevel list field
+    min_value (Any): Smallest ordering value of the list field's entities
+    max_value (Any): Largest ordering value of the list field's entities
+    entities (int): Estimated number of entities selected by the list field
+    exact (bool): Whether or not the number of entities is exact
+  """
+  key: str
+  min_value: Any
+  max_value: Any
+  entities: int
+  exact: bool
+
+
+@dataclass(frozen=True)
+class Estimate:
+  """ Estimated number of entities of each toplevel list field of a document.
+
+  Attributes:
+    fields (list[FieldEstimate]): The estimates of each toplevel list field
+  """
+  fields: list[FieldEstimate] = field(default_factory=list)
+
+  @property
+  def entities(self) -> int:
+    return sum(estimate.entities for estimate in self.fields)
+
+
+def estimate(
+  schema: SchemaMeta,
+  document: Document,
+  plan: Optional[PaginationPlan] = None,
+  sample_size: int = PROBE_SAMPLE_SIZE
+) -> Estimate:
+  """ Estimates the number of entities of each toplevel list field of ``document``
+  by querying, in a single query, the ordering values of the first ``sample_size``
+  entities and the ordering value of the last entity of each toplevel list field.
+
+  Args:
+    schema (SchemaMeta): The GraphQL schema on which the document is based
+    document (Document): The query document
+    plan (Optional[PaginationPlan], optional): Precomputed pagination plan of
+      ``document``. Defaults to None.
+    sample_size (int, optional): Number of sampled entities per list field.
+      Defaults to :attr:`PROBE_SAMPLE_SIZE`.
+
+  Returns:
+    Estimate: The estimated number of entities
+  """
+  if plan is None:
+    plan = PaginationPlan.of_document(schema, document)
+
+  toplevel = {select.key: select for select in document.query.selection}
+  nodes = [node for node in plan.pagination_nodes if node.key_path[0] in toplevel]
+  if nodes == []:
+    return Estimate()
+
+  def probes(node: PaginationNode) -> list[Selection]:
+    probe = partial(probe_selection, schema, toplevel[node.key_path[0]], node.filter_field)
+    return [
+      probe(f'probeHead{node.node_idx}', 'asc', first=sample_size),
+      probe(f'probeTail{node.node_idx}', 'desc'),
+    ]
+
+  doc = probe_document(document, [select for node in nodes for select in probes(node)])
+  data = client.query(doc.url, doc.graphql, variables=doc.variables)
+
+  def field_estimate(node: PaginationNode) -> FieldEstimate:
+    sample = [entity[node.filter_field] for entity in data.get(f'probeHead{node.node_idx}') or []]
+    tail = [entity[node.filter_field] for entity in data.get(f'probeTail{node.node_idx}') or []]
+    (entities, exact) = estimate_num_entities(
+      sample,
+      tail[0] if tail != [] else None,
+      first=node.first_value,
+      skip=node.skip_value,
+      sample_size=sample_size
+    )
+    return FieldEstimate(
+      key=node.key_path[0],
+      min_value=sample[0] if sample != [] else None,
+      max_value=tail[0] if tail != [] else None,
+      entities=entities,
+      exact=exact
+    )
+
+  return Estimate(fields=[field_estimate(node) for node in nodes])
+
+
+@dataclass(frozen=True)
+class Progress:
+  """ Progress report of a pagination.
+
+  Attributes:
+    entities (int): Number of entities of the toplevel list fields queried so far
+    pages (int): Number of pages queried so far
+    elapsed (float): Time elapsed since the start of the pagination (in seconds)
+    estimated_entities (Optional[int]): Estimated total number of entities of
+      the toplevel list fields, if estimated
+  """
+  entities: int
+  pages: int
+  elapsed: float
+  estimated_entities: Optional[int] = None
+
+  @property
+  def throughput(self) -> float:
+    """ Number of entities queried per second """
+    return self.entities / self.elapsed if self.elapsed > 0 else 0.0
+
+  @property
+  def remaining(self) -> Optional[int]:
+    """ Estimated number of entities left to query """
+    if self.estimated_entities is None:
+      return None
+    return max(0, self.estimated_entities - self.entities)
+
+  @property
+  def eta(self) -> Optional[float]:
+    """ Estimated time left (in seconds) """
+    if self.remaining is None or self.throughput == 0:
+      return None
+    return self.remaining / self.throughput
+
+
+class ProgressTracker:
+  """ Counts the entities and pages of a pagination and reports its progress
+  to the callback ``callback`` after each page.
+
+  For documents with nested list fields, only the entities of the toplevel
+  list fields are counted. Since parent entities may be queried again with each
+  page of their nested list fields, progress is then approximate.
+  """
+  keys: list[str]
+  callback: Callable[[Progress], None]
+  estimated_entities: Optional[int]
+  start: float
+  entities: int
+  pages: int
+
+  def __init__(
+    self,
+    keys: list[str],
+    callback: Callable[[Progress], None],
+    estimated_entities: Optional[int] = None
+  ) -> None:
+    self.keys = keys
+    self.callback = callback
+    self.estimated_entities = estimated_entities
+    self.start = perf_counter()
+    self.entities = 0
+    self.pages = 0
+
+  @staticmethod
+  def of_document(
+    schema: SchemaMeta,
+    document: Document,
+    callback: Callable[[Progress], None],
+    plan: Optional[PaginationPlan] = None,
+    probe: bool = False
+  ) -> ProgressTracker:
+    """ Returns the progress tracker of the pagination of ``document``. If
+    ``probe`` is ``True``, the number of entities is estimated beforehand
+    (see :func:`estimate`).
+    """
+    if plan is None:
+      plan = PaginationPlan.of_document(schema, document)
+
+    keys = list(dict.fromkeys(node.key_path[0] for node in plan.pagination_nodes))
+    estimated_entities = estimate(schema, document, plan).entities if probe else None
+    return ProgressTracker(keys, callback, estimated_entities)
+
+  def update(self, page_data: dict[str, Any]) -> Progress:
+    self.pages = self.pages + 1
+    self.entities = self.entities + sum(len(page_data.get(key) or []) for key in self.keys)
+
+    progress = Progress(
+      entities=self.entities,
+      pages=self.pages,
+      elapsed=perf_counter() - self.start,
+      estimated_entities=self.estimated_entities
+    )
+    self.callback(progress)
+    return progress
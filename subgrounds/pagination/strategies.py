@@ -69,18 +69,65 @@ Depending on the strategy, the variable values computed at step 3 will change.
 
 from __future__ import annotations
 from ast import Tuple
+import dataclasses
 from dataclasses import dataclass, field
 from functools import partial
 from itertools import count
+from math import ceil
 from pprint import pprint
-from pipe import traverse, map
-from typing import Any, Callable, Iterator, Literal, Optional
-
-from subgrounds.pagination.preprocess import PaginationNode, generate_pagination_nodes, normalize, prune_doc
-from subgrounds.pagination.utils import PAGE_SIZE
-from subgrounds.query import Document
-from subgrounds.schema import SchemaMeta
+import re
+import warnings
+from pipe import traverse, map, where
+from typing import Any, Callable, Iterator, Literal, Optional, Type
+
+from subgrounds.pagination.preprocess import (
+  PaginationNode,
+  PaginationPlan,
+  get_orderDirection_value,
+  is_pagination_node,
+  PrunedDocCache
+)
+from subgrounds.pagination.utils import (
+  DEFAULT_NUM_ENTITIES,
+  PAGE_SIZE,
+  PROBE_SAMPLE_SIZE,
+  SERVER_MAX_FIRST,
+  AdaptivePageSize,
+  estimate_num_entities,
+  max_first_of_error
+)
+from subgrounds.query import Argument, Document, InputValue, Query, Selection, VariableDefinition
+from subgrounds.schema import SchemaMeta, TypeMeta, TypeRef
 from subgrounds.utils import extract_data
+import subgrounds.client as client
+
+
+DEFAULT_NUM_PARTITIONS = 8
+
+# Maximum number of queried entities sharing the same ordering value that can
+# be skipped by compound cursors (i.e.: the maximum value of the `skip` argument)
+MAX_TIE_SKIP = 5000
+
+# Number of parent entities whose nested list fields are fetched in a single
+# (paginated) query by the `FanOutStrategy`
+DEFAULT_FAN_OUT_BATCH_SIZE = 100
+
+# Aliases of the fan-out queries' list field and of the child entities' link
+# to their parent entity
+FAN_OUT_CHILDREN_KEY = 'fanOutChildren'
+FAN_OUT_PARENT_KEY = 'fanOutParent'
+
+# Types of the ordering fields whose range can be partitioned
+NUMERIC_TYPES: set[str] = {'Int', 'BigInt', 'Float', 'BigDecimal'}
+
+# Hexadecimal ids (e.g.: addresses) and number of their leading hexadecimal
+# digits used by the bounds of the `RangePartitionStrategy`'s windows
+HEX_ID_PREFIX = re.compile(r'0x([0-9a-f]+)')
+ID_BOUND_DIGITS = 8
+
+
+class TieWarning(UserWarning):
+  pass
 
 
 class StopPagination(Exception):
@@ -93,6 +140,171 @@ class SkipPagination(Exception):
     super().__init__(*args)
 
 
+class SplitPagination(Exception):
+  """ Exception raised by a pagination strategy's ``step`` method to split the
+  pagination of a document into the independent paginations of several documents,
+  which are then paginated concurrently (see :func:`paginate_split`) or, when
+  paginating iteratively, one after the other (see :func:`paginate_split_pages`). The data of the pages queried so far
+  by the strategy is discarded and replaced by the combined data of the
+  documents (in order).
+
+  Attributes:
+    documents (list[Document]): The documents to paginate
+    pagination_strategy (Type): The pagination strategy used to paginate each document
+    key (Optional[str]): Key of the toplevel list field whose entities are split
+      across the documents, if any
+    first (Optional[int]): Total number of entities of the toplevel list field ``key`` to keep
+    max_workers (Optional[int]): Maximum number of documents paginated concurrently
+  """
+  def __init__(
+    self,
+    documents: list[Document],
+    pagination_strategy: Type,
+    key: Optional[str] = None,
+    first: Optional[int] = None,
+    max_workers: Optional[int] = None
+  ) -> None:
+    super().__init__(f'Pagination split into {len(documents)} documents')
+    self.documents = documents
+    self.pagination_strategy = pagination_strategy
+    self.key = key
+    self.first = first
+    self.max_workers = max_workers
+
+
+class FanOutPagination(Exception):
+  """ Exception raised by a pagination strategy's ``step`` method to paginate a
+  document's toplevel list field (the parent entities) and some of its nested
+  list fields (the child entities) separately: the parent entities are paginated
+  first, after which the child entities of each batch of ``batch_size`` parent
+  entities are fetched through the child entities' toplevel list field (with a
+  ``{link}_in`` filter) and stitched back into the parent entities.
+
+  Attributes:
+    parent_doc (Document): The document selecting the parent entities (without
+      the fanned-out nested list fields)
+    key (str): Key of the toplevel list field of the parent entities
+    fields (list[FanOutField]): The fanned-out nested list fields
+    batch_size (int): Number of parent entities per batch
+    max_workers (Optional[int]): Maximum number of batches fetched concurrently
+  """
+  def __init__(
+    self,
+    parent_doc: Document,
+    key: str,
+    fields: list[FanOutField],
+    batch_size: int = DEFAULT_FAN_OUT_BATCH_SIZE,
+    max_workers: Optional[int] = None
+  ) -> None:
+    super().__init__(f'Pagination fanned out over {len(fields)} nested list fields')
+    self.parent_doc = parent_doc
+    self.key = key
+    self.fields = fields
+    self.batch_size = batch_size
+    self.max_workers = max_workers
+
+
+@dataclass(frozen=True)
+class FanOutField:
+  """ Nested list field whose entities are fetched through their toplevel list
+  field instead of through their parent entity.
+
+  Attributes:
+    select (Selection): The nested list field's selection
+    collection (TypeMeta.FieldMeta): The toplevel list field of the child entities
+    link (TypeMeta.FieldMeta): The field of the child entities referencing their parent entity
+    first (int): Number of child entities per parent entity
+  """
+  select: Selection
+  collection: TypeMeta.FieldMeta
+  link: TypeMeta.FieldMeta
+  first: int
+  block_number: Optional[int] = None
+
+  @property
+  def key(self) -> str:
+    return self.select.key
+
+  def mk_doc(self, url: str, parent_ids: list[str]) -> Document:
+    """ Returns the document selecting (at most) ``first`` child entities for
+    each of the parent entities ``parent_ids``, along with their parent's id.
+    """
+    where_arg = self.select.find_args(lambda arg: arg.name == 'where', recurse=False)
+    where_value = where_arg.value.value if where_arg is not None else {}
+
+    return pin_document(Document(url=url, query=Query(selection=[
+      Selection(
+        fmeta=self.collection,
+        alias=FAN_OUT_CHILDREN_KEY,
+        arguments=[
+          Argument(name='first', value=InputValue.Int(self.first * len(parent_ids))),
+          *[arg for arg in self.select.arguments if arg.name in {'orderBy', 'orderDirection'}],
+          Argument(name='where', value=InputValue.Object(where_value | {
+            f'{self.link.name}_in': InputValue.List(list(parent_ids | map(InputValue.String)))
+          }))
+        ],
+        selection=[
+          *self.select.selection,
+          Selection(
+            fmeta=self.link,
+            alias=FAN_OUT_PARENT_KEY,
+            selection=[Selection(fmeta=TypeMeta.FieldMeta(
+              name='id',
+              description='',
+              args=[],
+              type=TypeRef.Named(name='String', kind='SCALAR')
+            ))]
+          )
+        ]
+      )
+    ])), self.block_number)
+
+  @staticmethod
+  def of_selection(
+    schema: SchemaMeta,
+    parent_type: str,
+    select: Selection
+  ) -> Optional[FanOutField]:
+    """ Returns the :class:`FanOutField` of the nested list field ``select`` of
+    entities of type ``parent_type``, or ``None`` if the child entities have no
+    toplevel list field or no unique field referencing their parent entity.
+    """
+    if (
+      not is_pagination_node(schema, select)
+      or select.exists_args(lambda arg: arg.name == 'skip', recurse=False)
+    ):
+      return None
+
+    child_type = TypeRef.root_type_name(select.fmeta.type_)
+    query_type: TypeMeta.ObjectMeta = schema.type_map[schema.query_type]
+    collection = next(filter(
+      lambda fmeta: fmeta.type_.is_list and TypeRef.root_type_name(fmeta.type_) == child_type,
+      query_type.fields
+    ), None)
+    if collection is None:
+      return None
+
+    child_object = schema.type_map[child_type]
+    links = list(
+      child_object.fields
+      | where(lambda fmeta: not fmeta.type_.is_list and TypeRef.root_type_name(fmeta.type_) == parent_type)
+    )
+    if len(links) != 1:
+      return None
+
+    where_type: TypeMeta.InputObjectMeta = schema.type_of_typeref(collection.type_of_arg('where'))
+    if not any(where_type.input_fields | map(lambda input_field: input_field.name == f'{links[0].name}_in')):
+      return None
+
+    first_arg = select.find_args(lambda arg: arg.name == 'first', recurse=False)
+    return FanOutField(
+      select=select,
+      collection=collection,
+      link=links[0],
+      first=first_arg.value.value if first_arg is not None else DEFAULT_NUM_ENTITIES
+    )
+
+
 @dataclass
 class LegacyStrategyArgGenerator:
   cursor: list[Cursor]
@@ -109,13 +321,46 @@ class LegacyStrategyArgGenerator:
     queried_entities: int = 0
     stop: bool = False
     page_count: int = 0
-    keys: set[str] = field(default_factory=set)
 
-    def __init__(self, page_node: PaginationNode) -> None:
+    # Page size of the next query and of the previous query
+    page_size: int = PAGE_SIZE
+    requested_page_size: int = PAGE_SIZE
+
+    # Compound cursors (see `add_tie_filters`): when the last entities of the
+    # previous page share the same ordering value, the next page is queried with
+    # the inclusive filter (e.g.: `timestamp_gte`), skipping the `tie_count`
+    # entities with that ordering value which were already queried
+    compound: bool = False
+    initial_tie_value: Any = None
+    inclusive: bool = False
+    tie_count: int = 0
+
+    def __init__(
+      self,
+      page_node: PaginationNode,
+      page_size: int = PAGE_SIZE,
+      tie_values: Optional[dict[int, Any]] = None
+    ) -> None:
+      if tie_values is None:
+        tie_values = {}
+
       self.page_node = page_node
-      self.inner = list(page_node.inner | map(LegacyStrategyArgGenerator.Cursor))
+      self.inner = list(page_node.inner | map(partial(
+        LegacyStrategyArgGenerator.Cursor,
+        page_size=page_size,
+        tie_values=tie_values
+      )))
+      self.page_size = page_size
+      self.requested_page_size = page_size
+      self.compound = page_node.node_idx in tie_values
+      self.initial_tie_value = tie_values.get(page_node.node_idx)
       self.reset()
 
+    def iter(self) -> Iterator[LegacyStrategyArgGenerator.Cursor]:
+      yield self
+      for cursor in self.inner:
+        yield from cursor.iter()
+
     @property
     def is_leaf(self):
       return len(self.inner) == 0
@@ -133,23 +378,47 @@ class LegacyStrategyArgGenerator:
       filter_value = index_field_data[-1] if len(index_field_data) > 0 else None
 
       id_data = list(extract_data([*self.page_node.key_path, 'id'], data) | traverse)
-      for key in id_data:
-        if key not in self.keys:
-          self.keys.add(key)
+      self.queried_entities = self.queried_entities + len(id_data)
 
       self.page_count = self.page_count + 1
-      self.queried_entities = len(self.keys)
 
       if filter_value:
+        if self.compound:
+          self.update_ties(index_field_data, filter_value)
         self.filter_value = filter_value
 
       if (
-        (self.is_leaf and num_entities < PAGE_SIZE)
+        (self.is_leaf and num_entities < self.requested_page_size)
         or (not self.is_leaf and num_entities == 0)
         or (self.queried_entities == self.page_node.first_value)
       ):
         raise StopPagination
 
+    def update_ties(self, index_field_data: list[Any], filter_value: Any) -> None:
+      """ Updates the number of queried entities sharing the ordering value
+      ``filter_value`` of the last entity of the page ``index_field_data``
+      """
+      trailing = next(
+        (i for i, value in enumerate(reversed(index_field_data)) if value != filter_value),
+        len(index_field_data)
+      )
+
+      if self.inclusive and filter_value == self.filter_value:
+        # The whole page shares the ordering value of the previous page's last entities
+        self.tie_count = self.tie_count + trailing
+      else:
+        self.tie_count = trailing
+
+      self.inclusive = True
+      if self.tie_count > MAX_TIE_SKIP:
+        warnings.warn(
+          f'{".".join(self.page_node.key_path)}: more than {MAX_TIE_SKIP} entities share the '
+          f'ordering value {filter_value}, some of them may be skipped',
+          TieWarning
+        )
+        self.inclusive = False
+        self.tie_count = 0
+
     def step(self, data: dict) -> None:
       """ Updates either ``self`` cursor or inner state machine depending on
       whether the inner state machine has reached its limit
@@ -174,8 +443,8 @@ class LegacyStrategyArgGenerator:
       if self.is_leaf:
         return (
           self.page_node.first_value - self.queried_entities
-          if self.page_node.first_value - self.queried_entities < PAGE_SIZE
-          else PAGE_SIZE
+          if self.page_node.first_value - self.queried_entities < self.page_size
+          else self.page_size
         )
       else:
         return 1
@@ -187,11 +456,18 @@ class LegacyStrategyArgGenerator:
       """
       args = {}
       args[f'first{self.page_node.node_idx}'] = self.first_arg_value()
+      self.requested_page_size = self.page_size
 
-      args[f'skip{self.page_node.node_idx}'] = self.page_node.skip_value if self.page_count == 0 else 0
+      args[f'skip{self.page_node.node_idx}'] = (
+        (self.page_node.skip_value if self.page_count == 0 else 0)
+        + (self.tie_count if self.inclusive else 0)
+      )
 
       if self.filter_value is not None:
-        args[f'lastOrderingValue{self.page_node.node_idx}'] = self.filter_value
+        if self.inclusive:
+          args[f'tieOrderingValue{self.page_node.node_idx}'] = self.filter_value
+        else:
+          args[f'lastOrderingValue{self.page_node.node_idx}'] = self.filter_value
 
       if self.is_leaf:
         return args
@@ -207,10 +483,77 @@ class LegacyStrategyArgGenerator:
       self.queried_entities = 0
       self.stop = False
       self.page_count = 0
-      self.keys = set()
+      self.tie_count = 0
 
-  def __init__(self, pagination_nodes: list[PaginationNode]) -> None:
-    self.cursor = list(pagination_nodes | map(LegacyStrategyArgGenerator.Cursor))
+      # The inclusive filter's initial value (e.g.: a lower bound given by the
+      # user) is used until the first page is queried
+      self.inclusive = self.filter_value is None and self.initial_tie_value is not None
+      if self.inclusive:
+        self.filter_value = self.initial_tie_value
+
+    def checkpoint(self) -> dict[str, Any]:
+      """ Returns the state of the cursor (and of its inner cursors) as a JSON
+      serializable dictionary.
+      """
+      return {
+        'inner_idx': self.inner_idx,
+        'filter_value': self.filter_value,
+        'queried_entities': self.queried_entities,
+        'page_count': self.page_count,
+        'page_size': self.page_size,
+        'inclusive': self.inclusive,
+        'tie_count': self.tie_count,
+        'inner': list(self.inner | map(lambda cursor: cursor.checkpoint()))
+      }
+
+    def restore(self, state: dict[str, Any]) -> None:
+      """ Restores the state ``state`` returned by :func:`checkpoint` """
+      self.inner_idx = state['inner_idx']
+      self.filter_value = state['filter_value']
+      self.queried_entities = state['queried_entities']
+      self.page_count = state['page_count']
+      self.page_size = state['page_size']
+      self.requested_page_size = state['page_size']
+      self.inclusive = state['inclusive']
+      self.tie_count = state['tie_count']
+      for cursor, inner_state in zip(self.inner, state['inner']):
+        cursor.restore(inner_state)
+
+  def __init__(
+    self,
+    pagination_nodes: list[PaginationNode],
+    page_size: int = PAGE_SIZE,
+    tie_values: Optional[dict[int, Any]] = None
+  ) -> None:
+    self.cursor = list(pagination_nodes | map(partial(
+      LegacyStrategyArgGenerator.Cursor,
+      page_size=page_size,
+      tie_values=tie_values
+    )))
+
+  def iter_cursors(self) -> Iterator[Cursor]:
+    for cursor in self.cursor:
+      yield from cursor.iter()
+
+  def checkpoint(self) -> dict[str, Any]:
+    return {
+      'active_idx': self.active_idx,
+      'cursors': list(self.cursor | map(lambda cursor: cursor.checkpoint()))
+    }
+
+  def restore(self, state: dict[str, Any]) -> None:
+    self.active_idx = state['active_idx']
+    for cursor, cursor_state in zip(self.cursor, state['cursors']):
+      cursor.restore(cursor_state)
+
+  def active_leaf(self) -> Cursor:
+    """ Returns the leaf cursor whose page size determines the size of the
+    current page, i.e.: the innermost cursor currently being paginated.
+    """
+    cursor = self.cursor[self.active_idx]
+    while not cursor.is_leaf:
+      cursor = cursor.inner[cursor.inner_idx]
+    return cursor
 
   def step(self, page_data: Optional[dict[str, Any]] = None) -> dict[str, Any]:
     try:
@@ -226,34 +569,395 @@ class LegacyStrategyArgGenerator:
         raise StopPagination
 
 
+def add_tie_filters(
+  document: Document,
+  pagination_nodes: list[PaginationNode]
+) -> tuple[Document, dict[int, Any]]:
+  """ Adds the inclusive filter (e.g.: ``timestamp_gte: $tieOrderingValueN``)
+  matching the strict filter (e.g.: ``timestamp_gt: $lastOrderingValueN``) of
+  each list field of the normalized document ``document`` which is not ordered
+  by ``id``. With these filters, cursors can query the entities sharing the
+  ordering value of the previous page's last entity which were not queried
+  yet (relying on list fields being sorted by ``id`` when their ordering values
+  are equal), instead of skipping them.
+
+  If the document already has an inclusive filter (e.g.: a lower bound given
+  by the user), it is replaced and its value is returned as the filter's
+  initial value.
+
+  Returns:
+    tuple[Document, dict[int, Any]]: The new document and the initial value of
+    the inclusive filter of each list field with such a filter (by node index)
+  """
+  def flatten(nodes: list[PaginationNode]) -> Iterator[PaginationNode]:
+    for node in nodes:
+      yield node
+      yield from flatten(node.inner)
+
+  nodes = {node.node_idx: node for node in flatten(pagination_nodes) if node.filter_field != 'id'}
+  tie_values: dict[int, Any] = {}
+
+  def add_filter(arg: Argument) -> Argument:
+    if arg.name != 'where':
+      return arg
+
+    for name, value in arg.value.value.items():
+      if value.is_variable and value.name.startswith('lastOrderingValue'):
+        idx = int(value.name.removeprefix('lastOrderingValue'))
+        if idx in nodes and name.endswith(('_gt', '_lt')):
+          inclusive = f'{name}e'
+          initial = arg.value.value.get(inclusive)
+          match initial:
+            case None:
+              tie_values[idx] = None
+            case InputValue.Variable(name=var_name):
+              tie_values[idx] = document.variables.get(var_name)
+            case _:
+              tie_values[idx] = initial.value
+
+          return Argument(name='where', value=InputValue.Object(
+            arg.value.value | {inclusive: InputValue.Variable(f'tieOrderingValue{idx}')}
+          ))
+
+    return arg
+
+  query = document.query.map_args(add_filter)
+  vardefs = [
+    VariableDefinition(f'tieOrderingValue{idx}', nodes[idx].filter_value_type)
+    for idx in tie_values
+  ]
+
+  new_doc = Document(
+    url=document.url,
+    query=query.add_vardefs(vardefs),
+    variables=document.variables
+  )
+
+  return (
+    new_doc.extract_fragments() if document.fragments != [] else new_doc,
+    tie_values
+  )
+
+
+def probe_selection(
+  schema: SchemaMeta,
+  select: Selection,
+  filter_field: str,
+  alias: str,
+  direction: str,
+  first: int = 1
+) -> Selection:
+  """ Returns a copy of the list field ``select`` (aliased to ``alias``) selecting
+  the ordering value ``filter_field`` of its first ``first`` entities in the
+  order ``direction`` (taking its ``where`` filter into account).
+  """
+  field_type = schema.type_of_typeref(select.fmeta.type_).type_of_field(filter_field)
+  return Selection(
+    fmeta=select.fmeta,
+    alias=alias,
+    arguments=[
+      *select.find_all_args(
+        lambda arg: arg.name not in {'first', 'skip', 'orderBy', 'orderDirection'},
+        recurse=False
+      ),
+      Argument('first', InputValue.Int(first)),
+      Argument('orderBy', InputValue.Enum(filter_field)),
+      Argument('orderDirection', InputValue.Enum(direction)),
+    ],
+    selection=[
+      Selection(TypeMeta.FieldMeta(name=filter_field, description='', args=[], type=field_type))
+    ]
+  )
+
+
+def probe_document(document: Document, selections: list[Selection]) -> Document:
+  """ Returns the document querying the probe selections ``selections`` (see
+  :func:`probe_selection`) with the variables of ``document``.
+  """
+  used_vars = {
+    var.name
+    for select in selections
+    for arg in select.iter_args(recurse=False)
+    for var in arg.iter_vars()
+  }
+
+  return Document(
+    url=document.url,
+    query=Query(
+      selection=selections,
+      variables=[vardef for vardef in document.query.variables if vardef.name in used_vars]
+    ),
+    variables=document.variables
+  )
+
+
+def split_document(document: Document, keys: set[str]) -> list[Document]:
+  """ Splits ``document`` into one document per toplevel field of ``document``
+  whose key is in ``keys``. The other toplevel fields are selected by the first
+  document. Each document only defines the variables used by its selections.
+  """
+  split_keys = list(document.query.selection | map(lambda select: select.key) | where(lambda key: key in keys))
+  rest = list(document.query.selection | where(lambda select: select.key not in keys))
+
+  def mk_doc(selections: list[Selection]) -> Document:
+    used = set(
+      selections
+      | map(lambda select: select.iter_args())
+      | traverse
+      | map(lambda arg: arg.iter_vars())
+      | traverse
+      | map(lambda var: var.name)
+    )
+    return Document(
+      url=document.url,
+      query=Query(
+        name=document.query.name,
+        selection=selections,
+        variables=list(document.query.variables | where(lambda vardef: vardef.name in used))
+      ),
+      fragments=document.fragments,
+      variables=document.variables
+    )
+
+  return [
+    mk_doc([
+      *(rest if i == 0 else []),
+      *(document.query.selection | where(lambda select: select.key == key))
+    ])
+    for i, key in enumerate(split_keys)
+  ]
+
+
+def pin_document(document: Document, block_number: Optional[int]) -> Document:
+  """ Returns a copy of ``document`` in which all toplevel fields accepting a
+  ``block`` argument (i.e.: all toplevel fields of subgraphs) query the data
+  as of block ``block_number``. Fields which already have a ``block`` argument
+  are left unchanged. If ``block_number`` is ``None``, ``document`` is returned as is.
+  """
+  if block_number is None:
+    return document
+
+  def pin(select: Selection) -> Selection:
+    if (
+      not any(select.fmeta.arguments | map(lambda arg: arg.name == 'block'))
+      or select.exists_args(lambda arg: arg.name == 'block', recurse=False)
+    ):
+      return select
+
+    return Selection(
+      fmeta=select.fmeta,
+      alias=select.alias,
+      arguments=[
+        *select.arguments,
+        Argument('block', InputValue.Object({'number': InputValue.Int(block_number)}))
+      ],
+      selection=select.selection
+    )
+
+  return Document(
+    url=document.url,
+    query=Query(
+      name=document.query.name,
+      selection=list(document.query.selection | map(pin)),
+      variables=document.query.variables
+    ),
+    fragments=document.fragments,
+    variables=document.variables
+  )
+
+
+def limit_document(document: Document, key: str, first: int) -> Document:
+  """ Returns a copy of ``document`` in which the toplevel list field ``key``
+  selects at most ``first`` entities (i.e.: its ``first`` argument is lowered
+  to ``first`` if needed).
+  """
+  def limit(select: Selection) -> Selection:
+    if select.key != key:
+      return select
+
+    match select.find_args(lambda arg: arg.name == 'first', recurse=False):
+      case Argument(value=InputValue.Int(value=value)) if value <= first:
+        return select
+
+    return Selection(
+      fmeta=select.fmeta,
+      alias=select.alias,
+      arguments=[
+        *select.find_all_args(lambda arg: arg.name != 'first', recurse=False),
+        Argument('first', InputValue.Int(first))
+      ],
+      selection=select.selection
+    )
+
+  return Document(
+    url=document.url,
+    query=Query(
+      name=document.query.name,
+      selection=list(document.query.selection | map(limit)),
+      variables=document.query.variables
+    ),
+    fragments=document.fragments,
+    variables=document.variables
+  )
+
+
 class LegacyStrategy:
+  """ Pagination strategy supporting nested list fields (see module documentation).
+
+  By default, pages contain :attr:`PAGE_SIZE` entities. If ``page_size`` is
+  provided, the page size of each list field is instead adapted to the observed
+  query latencies and errors (see :class:`AdaptivePageSize`), e.g.:
+
+  >>> sg.query_df(swaps, pagination_strategy=partial(LegacyStrategy, page_size=AdaptivePageSize()))
+
+  If ``pin_block`` is ``True``, the latest block indexed by the subgraph is
+  queried once and all pages are queried as of that block (by adding a
+  ``block: {number: N}`` argument to the toplevel fields), so that entities
+  added or modified during the pagination do not shift between pages. A block
+  number can also be given directly, e.g.:
+
+  >>> sg.query_df(swaps, pagination_strategy=partial(LegacyStrategy, pin_block=True))
+
+  If ``concurrent_fields`` is ``True``, documents selecting several toplevel list
+  fields (e.g.: ``mints``, ``burns`` and ``swaps``) are split into one document
+  per toplevel list field, which are paginated independently and concurrently
+  (with at most ``max_workers`` workers) instead of one after the other. Such
+  paginations cannot be checkpointed, and iterative paginations (e.g.:
+  :func:`paginate_iter`) stream the documents' pages one document after the other.
+  """
   schema: SchemaMeta
   arg_generator: LegacyStrategyArgGenerator
   normalized_doc: Document
+  pruned_docs: PrunedDocCache
+  page_size: Optional[AdaptivePageSize]
+  max_first: Optional[int]
+  block_number: Optional[int]
+  split: Optional[SplitPagination]
 
-  def __init__(self, schema: SchemaMeta, document: Document) -> None:
+  def __init__(
+    self,
+    schema: SchemaMeta,
+    document: Document,
+    plan: Optional[PaginationPlan] = None,
+    page_size: Optional[AdaptivePageSize] = None,
+    pin_block: bool | int = False,
+    concurrent_fields: bool = False,
+    max_workers: Optional[int] = None
+  ) -> None:
     self.schema = schema
-    
-    pagination_nodes = generate_pagination_nodes(schema, document)
 
-    if len(pagination_nodes) == 0:
+    if plan is None:
+      plan = PaginationPlan.of_document(schema, document)
+
+    if len(plan.pagination_nodes) == 0:
       raise SkipPagination
 
-    self.arg_generator = LegacyStrategyArgGenerator(pagination_nodes)
-    self.normalized_doc = normalize(
-      schema,
-      document,
-      pagination_nodes
+    match pin_block:
+      case bool():
+        self.block_number = client.get_block_number(document.url) if pin_block else None
+      case int():
+        self.block_number = pin_block
+
+    normalized_doc, tie_values = add_tie_filters(
+      plan.normalized_doc_with_variables(document.variables),
+      plan.pagination_nodes
+    )
+
+    self.page_size = page_size
+    self.max_first = SERVER_MAX_FIRST.get(document.url)
+    self.arg_generator = LegacyStrategyArgGenerator(
+      plan.pagination_nodes,
+      page_size=page_size.clamp(PAGE_SIZE, self.max_first) if page_size is not None else PAGE_SIZE,
+      tie_values=tie_values
     )
+    self.normalized_doc = pin_document(normalized_doc, self.block_number)
+    self.pruned_docs = PrunedDocCache(self.normalized_doc)
+
+    self.split = None
+    if concurrent_fields and len(plan.pagination_nodes) > 1:
+      self.split = SplitPagination(
+        documents=split_document(
+          document,
+          set(plan.pagination_nodes | map(lambda node: node.key_path[0]))
+        ),
+        pagination_strategy=partial(
+          LegacyStrategy,
+          page_size=page_size,
+          pin_block=self.block_number if self.block_number is not None else False,
+          concurrent_fields=False
+        ),
+        max_workers=max_workers
+      )
 
   def step(
     self,
     page_data: Optional[dict[str, Any]] = None
   ) ->  Tuple[Document, dict[str, Any]]:
+    if self.split is not None:
+      raise self.split
+
     args = self.arg_generator.step(page_data)
-    trimmed_doc = prune_doc(self.normalized_doc, args)
+    trimmed_doc = self.pruned_docs.prune(args)
     return (trimmed_doc, args)
 
+  def checkpoint(self) -> Optional[dict[str, Any]]:
+    """ Returns the state of the strategy as a JSON serializable dictionary
+    (see :class:`Checkpoint`).
+    """
+    # Split paginations cannot be checkpointed
+    if self.split is None:
+      return self.arg_generator.checkpoint()
+    else:
+      return None
+
+  def restore(self, state: dict[str, Any]) -> None:
+    """ Restores the state ``state`` returned by :func:`checkpoint`. The next
+    call to :func:`step` (without page data) returns the query following the
+    checkpoint.
+    """
+    if self.split is None:
+      self.arg_generator.restore(state)
+    else:
+      raise ValueError('LegacyStrategy: split paginations cannot be restored')
+
+  def observe(self, latency: float, page_data: dict[str, Any]) -> None:
+    """ Adapts the page size of the list field being paginated given the
+    ``latency`` (in seconds) of the last query. Only used if ``page_size`` is set.
+    """
+    if self.page_size is None:
+      return
+
+    cursor = self.arg_generator.active_leaf()
+    cursor.page_size = self.page_size.next_size(cursor.requested_page_size, latency, self.max_first)
+
+  def recover(self, exn: Exception) -> tuple[Document, dict[str, Any]]:
+    """ Returns the document and variables with which to retry the last query
+    after it failed with the error ``exn``, i.e.: with a smaller page size.
+    Re-raises ``exn`` if ``page_size`` is not set or if the page size cannot
+    be reduced.
+    """
+    if self.page_size is None:
+      raise exn
+
+    cursor = self.arg_generator.active_leaf()
+    max_first = max_first_of_error(exn)
+
+    if max_first is not None:
+      SERVER_MAX_FIRST[self.normalized_doc.url] = max_first
+      self.max_first = max_first
+      for other in self.arg_generator.iter_cursors():
+        if other is not cursor:
+          other.page_size = self.page_size.clamp(other.page_size, max_first)
+      page_size = self.page_size.clamp(cursor.page_size, max_first)
+    else:
+      page_size = self.page_size.shrink(cursor.page_size, self.max_first)
+
+    if page_size >= cursor.page_size:
+      raise exn
+
+    cursor.page_size = page_size
+    return self.step()
+
 
 
 @dataclass
@@ -366,6 +1070,34 @@ class ShallowStrategyArgGenerator:
     for cur in self.cursor:
       yield from cur.iter()
 
+  def checkpoint(self) -> dict[str, Any]:
+    def cursor_state(cursor: ShallowStrategyArgGenerator.Cursor) -> dict[str, Any]:
+      return {
+        'inner_idx': cursor.inner_idx,
+        'filter_value': cursor.filter_value,
+        'queried_entities': cursor.queried_entities,
+        'page_count': cursor.page_count,
+        'inner': list(cursor.inner | map(cursor_state))
+      }
+
+    return {'cursors': list(self.cursor | map(cursor_state))}
+
+  def restore(self, state: dict[str, Any]) -> None:
+    def restore_cursor(
+      cursor: ShallowStrategyArgGenerator.Cursor,
+      state: dict[str, Any]
+    ) -> ShallowStrategyArgGenerator.Cursor:
+      return ShallowStrategyArgGenerator.Cursor(
+        page_node=cursor.page_node,
+        inner=[restore_cursor(inner, inner_state) for inner, inner_state in zip(cursor.inner, state['inner'])],
+        inner_idx=state['inner_idx'],
+        filter_value=state['filter_value'],
+        queried_entities=state['queried_entities'],
+        page_count=state['page_count'],
+      )
+
+    self.cursor = [restore_cursor(cursor, cursor_state) for cursor, cursor_state in zip(self.cursor, state['cursors'])]
+
   @staticmethod
   def update_cursor(cursor: Cursor, data: dict[str, Any]) -> Cursor:
     index_field_data = list(extract_data([*cursor.page_node.key_path, cursor.page_node.filter_field], data) | traverse)
@@ -420,26 +1152,402 @@ class ShallowStrategy:
   schema: SchemaMeta
   arg_generator: ShallowStrategyArgGenerator
   normalized_doc: Document
+  pruned_docs: PrunedDocCache
 
-  def __init__(self, schema: SchemaMeta, document: Document) -> None:
+  def __init__(
+    self,
+    schema: SchemaMeta,
+    document: Document,
+    plan: Optional[PaginationPlan] = None
+  ) -> None:
     self.schema = schema
-    
-    pagination_nodes = generate_pagination_nodes(schema, document)
 
-    if len(pagination_nodes) == 0:
+    if plan is None:
+      plan = PaginationPlan.of_document(schema, document)
+
+    if len(plan.pagination_nodes) == 0:
       raise SkipPagination
-    
-    self.arg_generator = ShallowStrategyArgGenerator(pagination_nodes)
-    self.normalized_doc = normalize(
-      schema,
-      document,
-      pagination_nodes
-    )
+
+    self.arg_generator = ShallowStrategyArgGenerator(plan.pagination_nodes)
+    self.normalized_doc = plan.normalized_doc_with_variables(document.variables)
+    self.pruned_docs = PrunedDocCache(self.normalized_doc)
 
   def step(
     self,
     page_data: Optional[dict[str, Any]] = None
   ) ->  Tuple[Document, dict[str, Any]]:
     args = self.arg_generator.step(page_data)
-    trimmed_doc = prune_doc(self.normalized_doc, args)
-    return (trimmed_doc, args)
\ No newline at end of file
+    trimmed_doc = self.pruned_docs.prune(args)
+    return (trimmed_doc, args)
+
+  def checkpoint(self) -> Optional[dict[str, Any]]:
+    return self.arg_generator.checkpoint()
+
+  def restore(self, state: dict[str, Any]) -> None:
+    self.arg_generator.restore(state)
+
+
+class RangePartitionStrategy(LegacyStrategy):
+  """ Pagination strategy that splits the range of ordering values of the
+  toplevel list field into ``num_partitions`` disjoint windows which are then
+  paginated concurrently (each with the :class:`LegacyStrategy`). The windows'
+  data is concatenated in order, so the result is the same as with the
+  :class:`LegacyStrategy`.
+
+  The first query made by the strategy fetches the smallest and largest
+  ordering values of the list field (taking the ``where`` filter into account),
+  between which the windows' bounds are interpolated. Windows are started in
+  order and stop being started (or paginated) once ``first`` entities have
+  been returned (see :func:`paginate_split`).
+
+  This strategy is only applicable to documents with a single toplevel list
+  field, ordered by a numeric field (e.g.: a timestamp) or by ``id`` (if the
+  ids are hexadecimal strings), and selecting more than one page of entities.
+  Other documents are paginated with the :class:`LegacyStrategy`.
+
+  The number of windows and of concurrent workers can be configured with
+  ``functools.partial``, e.g.:
+
+  >>> sg.query_df(swaps, pagination_strategy=partial(RangePartitionStrategy, num_partitions=16))
+
+  If ``shard_size`` is provided, the first query also samples the ordering
+  values of :attr:`PROBE_SAMPLE_SIZE` entities to estimate the number of
+  entities of the list field (see :func:`estimate_num_entities`) and the number
+  of windows is chosen so that each window contains about ``shard_size``
+  entities (with at most ``num_partitions`` windows).
+  """
+  document: Document
+  page_node: Optional[PaginationNode]
+  num_partitions: int
+  max_workers: Optional[int]
+  shard_size: Optional[int]
+
+  def __init__(
+    self,
+    schema: SchemaMeta,
+    document: Document,
+    plan: Optional[PaginationPlan] = None,
+    num_partitions: int = DEFAULT_NUM_PARTITIONS,
+    max_workers: Optional[int] = None,
+    page_size: Optional[AdaptivePageSize] = None,
+    pin_block: bool | int = False,
+    shard_size: Optional[int] = None
+  ) -> None:
+    if plan is None:
+      plan = PaginationPlan.of_document(schema, document)
+
+    super().__init__(schema, document, plan=plan, page_size=page_size, pin_block=pin_block)
+
+    # The probe and all windows are queried as of the same block (if pinned)
+    self.document = pin_document(document, self.block_number)
+    self.num_partitions = num_partitions
+    self.max_workers = max_workers if max_workers is not None else num_partitions
+    self.shard_size = shard_size
+
+    self.page_node = None
+    if num_partitions > 1 and len(plan.pagination_nodes) == 1:
+      self.page_node = plan.pagination_nodes[0]
+      if not self.partitionable():
+        self.page_node = None
+
+  @property
+  def toplevel_select(self) -> Selection:
+    return next(filter(
+      lambda select: select.key == self.page_node.key_path[0],
+      self.document.query.selection
+    ))
+
+  @property
+  def range_filters(self) -> tuple[str, str]:
+    """ Names of the ``where`` filters used for the lower and upper bounds of
+    the windows. Windows include their lower bound when entities are sorted in
+    ascending order and their upper bound otherwise, so that the bounds do not
+    conflict with the filter used by the :class:`LegacyStrategy` to paginate
+    through each window (e.g.: ``timestamp_gt`` in ascending order).
+    """
+    field = self.page_node.filter_field
+    if get_orderDirection_value(self.toplevel_select) == 'desc':
+      return (f'{field}_gt', f'{field}_lte')
+    else:
+      return (f'{field}_gte', f'{field}_lt')
+
+  @property
+  def range_type(self) -> TypeRef.T:
+    """ Type of the window bounds """
+    where_type: TypeMeta.InputObjectMeta = self.schema.type_of_typeref(
+      self.toplevel_select.fmeta.type_of_arg('where')
+    )
+    return where_type.type_of_input_field(self.range_filters[0])
+
+  def partitionable(self) -> bool:
+    """ Returns ``True`` if the range of the toplevel list field can be split
+    into windows and ``False`` otherwise.
+    """
+    node = self.page_node
+    if node.first_value <= PAGE_SIZE or node.skip_value != 0:
+      return False
+
+    where = self.toplevel_select.find_args(lambda arg: arg.name == 'where', recurse=False)
+    match where:
+      case None:
+        pass
+      case Argument(value=InputValue.Object(value=where_value)):
+        # The windows' bounds cannot be combined with existing bounds
+        if any(name in where_value for name in self.range_filters):
+          return False
+      case _:
+        return False
+
+    return node.filter_field == 'id' or TypeRef.root_type_name(self.range_type) in NUMERIC_TYPES
+
+  def probe_doc(self) -> Document:
+    """ Returns the document querying the smallest and largest ordering values
+    of the toplevel list field.
+    """
+    probe = partial(probe_selection, self.schema, self.toplevel_select, self.page_node.filter_field)
+    return probe_document(self.document, [
+      probe('rangeMin', 'asc', first=PROBE_SAMPLE_SIZE if self.shard_size is not None else 1),
+      probe('rangeMax', 'desc'),
+    ])
+
+  def bounds(self, min_value: Any, max_value: Any) -> list[Any]:
+    """ Returns the (sorted) inner bounds of the windows given the smallest and
+    largest ordering values.
+    """
+    n = self.num_partitions
+
+    if self.page_node.filter_field == 'id':
+      # Ids are compared as strings, so the bounds are interpolated between the
+      # leading hexadecimal digits of the smallest and largest ids
+      (min_digits, max_digits) = (HEX_ID_PREFIX.match(str(min_value)), HEX_ID_PREFIX.match(str(max_value)))
+      if min_digits is None or max_digits is None:
+        return []
+
+      lo = int(min_digits.group(1)[:ID_BOUND_DIGITS].ljust(ID_BOUND_DIGITS, '0'), 16)
+      hi = int(max_digits.group(1)[:ID_BOUND_DIGITS].ljust(ID_BOUND_DIGITS, '0'), 16)
+      return [
+        f'0x{bound:0{ID_BOUND_DIGITS}x}'
+        for bound in sorted(set(lo + (hi - lo) * i // n for i in range(1, n)))
+      ]
+
+    match TypeRef.root_type_name(self.range_type):
+      case 'Int':
+        lo, hi = int(min_value), int(max_value)
+        return sorted(set(lo + (hi - lo) * i // n for i in range(1, n)))
+      case 'BigInt':
+        lo, hi = int(min_value), int(max_value)
+        return [str(bound) for bound in sorted(set(lo + (hi - lo) * i // n for i in range(1, n)))]
+      case 'Float':
+        lo, hi = float(min_value), float(max_value)
+        return sorted(set(lo + (hi - lo) * i / n for i in range(1, n)))
+      case 'BigDecimal':
+        lo, hi = float(min_value), float(max_value)
+        return [str(bound) for bound in sorted(set(lo + (hi - lo) * i / n for i in range(1, n)))]
+
+    return []
+
+  def window_docs(self, bounds: list[Any]) -> list[Document]:
+    """ Returns the documents querying each window delimited by ``bounds``
+    (in the order requested by the list field's ``orderDirection``). The first
+    window has no lower bound and the last window has no upper bound.
+    """
+    (low_filter, high_filter) = self.range_filters
+
+    def with_range(select: Selection) -> Selection:
+      if select.key != self.page_node.key_path[0]:
+        return select
+
+      where = select.find_args(lambda arg: arg.name == 'where', recurse=False)
+      where_value = where.value.value if where is not None else {}
+      return Selection(
+        fmeta=select.fmeta,
+        alias=select.alias,
+        arguments=[
+          *select.find_all_args(lambda arg: arg.name != 'where', recurse=False),
+          Argument('where', InputValue.Object(where_value | {
+            low_filter: InputValue.Variable('rangeLow'),
+            high_filter: InputValue.Variable('rangeHigh'),
+          }))
+        ],
+        selection=select.selection
+      )
+
+    query = Query(
+      name=self.document.query.name,
+      selection=list(self.document.query.selection | map(with_range)),
+      variables=[
+        *self.document.query.variables,
+        VariableDefinition('rangeLow', self.range_type),
+        VariableDefinition('rangeHigh', self.range_type),
+      ]
+    )
+
+    # Undefined bounds are pruned during pagination
+    windows = list(zip([None, *bounds], [*bounds, None]))
+    if get_orderDirection_value(self.toplevel_select) == 'desc':
+      windows.reverse()
+
+    return [
+      Document(
+        url=self.document.url,
+        query=query,
+        fragments=self.document.fragments,
+        variables=self.document.variables | (
+          ({'rangeLow': low} if low is not None else {})
+          | ({'rangeHigh': high} if high is not None else {})
+        )
+      )
+      for (low, high) in windows
+    ]
+
+  def step(
+    self,
+    page_data: Optional[dict[str, Any]] = None
+  ) -> tuple[Document, dict[str, Any]]:
+    if self.page_node is None:
+      return super().step(page_data)
+
+    if page_data is None:
+      return (self.probe_doc(), {})
+
+    field = self.page_node.filter_field
+    match (page_data.get('rangeMin'), page_data.get('rangeMax')):
+      case ([{**min_data}, *sample], [{**max_data}]):
+        if self.shard_size is not None:
+          (num_entities, _) = estimate_num_entities(
+            [min_data[field], *(sample | map(lambda data: data[field]))],
+            max_data[field],
+            first=self.page_node.first_value
+          )
+          self.num_partitions = max(1, min(self.num_partitions, ceil(num_entities / self.shard_size)))
+
+        bounds = self.bounds(min_data[field], max_data[field])
+      case _:
+        bounds = []
+
+    window_args = (
+      ({'page_size': self.page_size} if self.page_size is not None else {})
+      | ({'pin_block': self.block_number} if self.block_number is not None else {})
+    )
+
+    raise SplitPagination(
+      documents=self.window_docs(bounds),
+      pagination_strategy=partial(LegacyStrategy, **window_args) if window_args != {} else LegacyStrategy,
+      key=self.page_node.key_path[0],
+      first=self.page_node.first_value,
+      max_workers=self.max_workers
+    )
+
+  def observe(self, latency: float, page_data: dict[str, Any]) -> None:
+    if self.page_node is None:
+      super().observe(latency, page_data)
+
+  def recover(self, exn: Exception) -> tuple[Document, dict[str, Any]]:
+    if self.page_node is None:
+      return super().recover(exn)
+    else:
+      raise exn
+
+  def checkpoint(self) -> Optional[dict[str, Any]]:
+    # Split paginations cannot be checkpointed
+    if self.page_node is None:
+      return super().checkpoint()
+    else:
+      return None
+
+  def restore(self, state: dict[str, Any]) -> None:
+    if self.page_node is None:
+      super().restore(state)
+    else:
+      raise ValueError('RangePartitionStrategy: split paginations cannot be restored')
+
+
+class FanOutStrategy(LegacyStrategy):
+  """ Pagination strategy for documents selecting nested list fields, e.g.:
+  ``pools { swaps { ... } }``. Instead of paginating the nested list fields
+  of each parent entity one at a time (like the :class:`LegacyStrategy`), the
+  parent entities are paginated first, after which the child entities of
+  ``batch_size`` parent entities at a time are fetched through the child
+  entities' toplevel list field with a ``{link}_in: [...]`` filter (e.g.:
+  ``swaps(where: {pool_in: [...]})``). The child entities are then stitched
+  back into their parent entities, so the result has the same shape as with
+  the :class:`LegacyStrategy`.
+
+  This strategy is only applicable to documents with a single toplevel list
+  field and without variables. Only the nested list fields (directly below
+  the toplevel list field) whose entities have a toplevel list field and a
+  unique field referencing their parent entity are fanned out, the others are
+  paginated with the parent entities. Other documents are paginated with the
+  :class:`LegacyStrategy`.
+
+  The number of parent entities per batch and of concurrent workers can be
+  configured with ``functools.partial``, e.g.:
+
+  >>> sg.query_df(pools, pagination_strategy=partial(FanOutStrategy, batch_size=50))
+  """
+  fan_out: Optional[FanOutPagination]
+
+  def __init__(
+    self,
+    schema: SchemaMeta,
+    document: Document,
+    plan: Optional[PaginationPlan] = None,
+    batch_size: int = DEFAULT_FAN_OUT_BATCH_SIZE,
+    max_workers: Optional[int] = None,
+    pin_block: bool | int = False
+  ) -> None:
+    super().__init__(schema, document, plan=plan, pin_block=pin_block)
+
+    self.fan_out = None
+    if len(document.query.selection) == 1 and document.query.variables == []:
+      toplevel = document.query.selection[0]
+      if is_pagination_node(schema, toplevel):
+        parent_type = TypeRef.root_type_name(toplevel.fmeta.type_)
+        fields = list(
+          toplevel.selection
+          | map(partial(FanOutField.of_selection, schema, parent_type))
+          | where(lambda field: field is not None)
+          | map(lambda field: dataclasses.replace(field, block_number=self.block_number))
+        )
+
+        if len(fields) > 0:
+          fanned_out = set(fields | map(lambda field: field.key))
+          parent_select = Selection(
+            fmeta=toplevel.fmeta,
+            alias=toplevel.alias,
+            arguments=toplevel.arguments,
+            selection=list(toplevel.selection | where(lambda select: select.key not in fanned_out))
+          )
+          self.fan_out = FanOutPagination(
+            parent_doc=pin_document(Document(
+              url=document.url,
+              query=Query(name=document.query.name, selection=[parent_select]),
+              variables=document.variables
+            ), self.block_number),
+            key=toplevel.key,
+            fields=fields,
+            batch_size=batch_size,
+            max_workers=max_workers
+          )
+
+  def step(
+    self,
+    page_data: Optional[dict[str, Any]] = None
+  ) -> tuple[Document, dict[str, Any]]:
+    if self.fan_out is not None:
+      raise self.fan_out
+
+    return super().step(page_data)
+
+  def checkpoint(self) -> Optional[dict[str, Any]]:
+    # Fanned out paginations cannot be checkpointed
+    if self.fan_out is None:
+      return super().checkpoint()
+    else:
+      return None
+
+  def restore(self, state: dict[str, Any]) -> None:
+    if self.fan_out is None:
+      super().restore(state)
+    else:
+      raise ValueError('FanOutStrategy: fanned out paginations cannot be restored')
@@ -1,10 +1,131 @@
-from typing import Any
+from __future__ import annotations
+
+from dataclasses import dataclass
+import os
+import pickle
+import re
+import tempfile
+from typing import IO, Any, Iterator, Optional
 
 from subgrounds.utils import union
 
 DEFAULT_NUM_ENTITIES = 100
 PAGE_SIZE = 900
 
+# Maximum value of the `first` argument of each API (by url), as detected from
+# the APIs' error messages
+SERVER_MAX_FIRST: dict[str, int] = {}
+
+MAX_FIRST_ERROR_RE = re.compile(r'`first` argument must be between \d+ and (\d+)')
+
+
+def max_first_of_error(exn: Exception) -> Optional[int]:
+  """ Returns the maximum value of the ``first`` argument allowed by the server
+  if the error ``exn`` was caused by a ``first`` argument exceeding it (e.g.:
+  ``The `first` argument must be between 0 and 1000, but is 5000``) and ``None``
+  otherwise.
+  """
+  match = MAX_FIRST_ERROR_RE.search(str(exn))
+  return int(match.group(1)) if match is not None else None
+
+
+@dataclass(frozen=True)
+class AdaptivePageSize:
+  """ Configuration of adaptive page sizes. When used, the page size (i.e.: the
+  value of the ``first`` argument) of each paginated list field starts at
+  :attr:`PAGE_SIZE` and is adjusted after each page so that queries take about
+  :attr:`target_latency` seconds. Failed queries are retried with half the page
+  size. The page size always stays between :attr:`min_size` and :attr:`max_size`
+  and below the server's maximum ``first`` value, which is detected from the
+  server's error messages.
+
+  Attributes:
+    min_size (int): Smallest page size. Defaults to 100.
+    max_size (int): Largest page size. Defaults to 5000.
+    target_latency (float): Target duration of each query (in seconds). Defaults to 2.
+    max_factor (float): Maximum factor by which the page size is increased or
+      decreased after each page. Defaults to 2.
+  """
+  min_size: int = 100
+  max_size: int = 5000
+  target_latency: float = 2.0
+  max_factor: float = 2.0
+
+  def clamp(self, size: int, max_first: Optional[int] = None) -> int:
+    ceiling = self.max_size if max_first is None else min(self.max_size, max_first)
+    return max(min(self.min_size, ceiling), min(ceiling, size))
+
+  def next_size(self, size: int, latency: float, max_first: Optional[int] = None) -> int:
+    """ Returns the page size following a page of size ``size`` queried in ``latency`` seconds """
+    factor = self.target_latency / latency if latency > 0 else self.max_factor
+    factor = max(1 / self.max_factor, min(self.max_factor, factor))
+    return self.clamp(int(size * factor), max_first)
+
+  def shrink(self, size: int, max_first: Optional[int] = None) -> int:
+    """ Returns the page size to use after a failed query with page size ``size`` """
+    return self.clamp(size // 2, max_first)
+
+
+# Number of entities sampled at the start of a list field's range of ordering
+# values to estimate the density of its entities (see `estimate_num_entities`)
+PROBE_SAMPLE_SIZE = 100
+
+
+def ordering_number(value: Any) -> Optional[float]:
+  """ Returns the ordering value ``value`` as a number, or ``None`` if it is not
+  numeric. Numeric strings (e.g.: ``BigInt`` values) are parsed and hexadecimal
+  strings (e.g.: ``0x12ab`` ids) are parsed as hexadecimal integers.
+  """
+  match value:
+    case bool():
+      return None
+    case int() | float():
+      return value
+    case str() if value.startswith('0x'):
+      try:
+        return int(value, 16)
+      except ValueError:
+        return None
+    case str():
+      try:
+        return float(value)
+      except ValueError:
+        return None
+    case _:
+      return None
+
+
+def estimate_num_entities(
+  sample: list[Any],
+  last_value: Any,
+  first: int,
+  skip: int = 0,
+  sample_size: int = PROBE_SAMPLE_SIZE
+) -> tuple[int, bool]:
+  """ Estimates the number of entities selected by a list field (with arguments
+  ``first`` and ``skip``) given the ordering values ``sample`` of (up to)
+  ``sample_size`` entities at one end of its range of ordering values and the
+  ordering value ``last_value`` at the other end of the range.
+
+  If the sample is complete (i.e.: the list field has fewer than ``sample_size``
+  entities), the number is exact. Otherwise, the density of entities in the
+  sample is extrapolated to the whole range, which requires numeric ordering
+  values. If they are not numeric, the estimate is ``first``.
+
+  Returns:
+    tuple[int, bool]: The estimated number of entities and whether it is exact
+  """
+  if len(sample) < sample_size:
+    return (max(0, min(len(sample) - skip, first)), True)
+
+  start, sample_end, end = ordering_number(sample[0]), ordering_number(sample[-1]), ordering_number(last_value)
+  if start is None or sample_end is None or end is None or sample_end == start:
+    return (first, False)
+
+  density = (len(sample) - 1) / abs(sample_end - start)
+  total = round(abs(end - start) * density) + 1
+  return (max(0, min(total - skip, first)), False)
+
 
 def merge(
   data1: list[Any] | dict[str, Any] | Any,
@@ -53,3 +174,222 @@ def merge(
       return val1
 
   assert False  # Suppress mypy missing return statement warning
+
+
+class _EntityIndex:
+  """ List of entities indexed by id (in list order) used by :class:`PageAccumulator` """
+  entities: dict[Any, Any]
+
+  def __init__(self, entities: list[dict[str, Any]]) -> None:
+    self.entities = {data['id']: data for data in entities}
+
+
+class PageAccumulator:
+  """ Accumulates pages of response data in place. Adding all pages of a
+  paginated query to the accumulator yields the same data as successively
+  merging them with :func:`merge`, but in time linear in the total number of
+  entities instead of quadratic: list fields that are merged are indexed by
+  entity id so that the entities of new pages are appended (or merged with
+  existing entities) without scanning and copying the accumulated entities.
+
+  The data of the pages added to the accumulator may be modified.
+  """
+  _data: dict[str, Any]
+
+  def __init__(self) -> None:
+    self._data = {}
+
+  def add(self, page_data: dict[str, Any]) -> None:
+    """ Merges the page of data ``page_data`` into the accumulated data.
+
+    Args:
+      page_data (dict[str, Any]): The page of data
+    """
+    self._data = PageAccumulator._merge(self._data, page_data)
+
+  @property
+  def data(self) -> dict[str, Any]:
+    """ Returns the accumulated data. """
+    return PageAccumulator._materialize(self._data)
+
+  @staticmethod
+  def _merge(
+    data1: _EntityIndex | list[Any] | dict[str, Any] | Any,
+    data2: list[Any] | dict[str, Any] | Any
+  ) -> _EntityIndex | list[Any] | dict[str, Any] | Any:
+    match (data1, data2):
+      case (_EntityIndex() as index, list() as l2):
+        # Same ordering as `union`: entities present in both lists are merged
+        # and moved after the others (sorted by id), new entities come last
+        entities = index.entities
+        common = sorted(
+          [data for data in l2 if data['id'] in entities],
+          key=lambda data: data['id']
+        )
+        new = [data for data in l2 if data['id'] not in entities]
+
+        for data in common:
+          entities[data['id']] = PageAccumulator._merge(entities.pop(data['id']), data)
+
+        for data in new:
+          entities[data['id']] = data
+
+        return index
+
+      case (list() as l1, list()):
+        return PageAccumulator._merge(_EntityIndex(l1), data2)
+
+      case (dict() as d1, dict() as d2):
+        for key in d2:
+          if key in d1:
+            d1[key] = PageAccumulator._merge(d1[key], d2[key])
+          else:
+            d1[key] = d2[key]
+
+        return d1
+
+      case (_EntityIndex(), _):
+        raise TypeError(f'merge: incompatible data types! type(data1): {list} != type(data2): {type(data2)}')
+
+      case (dict(), _) | (_, dict()) | (list(), _) | (_, list()):
+        raise TypeError(f'merge: incompatible data types! type(data1): {type(data1)} != type(data2): {type(data2)}')
+
+      case (val1, _):
+        return val1
+
+    assert False  # Suppress mypy missing return statement warning
+
+  @staticmethod
+  def _materialize(data: _EntityIndex | list[Any] | dict[str, Any] | Any) -> list[Any] | dict[str, Any] | Any:
+    match data:
+      case _EntityIndex():
+        return list(PageAccumulator._materialize(value) for value in data.entities.values())
+      case list():
+        return list(PageAccumulator._materialize(value) for value in data)
+      case dict():
+        return {key: PageAccumulator._materialize(value) for key, value in data.items()}
+      case _:
+        return data
+
+
+class PageSpill:
+  """ Memory-bounded store of pages of response data. Pages are kept in memory
+  until their total size exceeds :attr:`memory_budget` bytes, after which the
+  following pages are pickled to a spill file in the directory :attr:`directory`
+  (the system's temporary directory by default). Pages are read back one at a
+  time with :func:`iter_pages`, so consumers streaming over them never hold
+  more than the in-memory pages and one page read from disk.
+
+  Pages are pickled (and their size is measured as the length of their pickled
+  serialization) so that values converted by transforms (e.g.: ``datetime``
+  values of synthetic fields) are read back unchanged. The spill file is deleted
+  when the store is closed (e.g.: at the end of a ``with`` block).
+
+  The store also records the last page in which each entity of the toplevel
+  list fields appears (see :func:`iter_merged`), i.e.: only the ids of the
+  entities are kept in memory for each page spilled to disk.
+  """
+  memory_budget: int
+  directory: Optional[str]
+  pages: list[Any]
+  size: int
+  spilled: int
+  last_pages: dict[str, dict[Any, int]]
+  _file: Optional[IO[bytes]]
+
+  def __init__(self, memory_budget: int, directory: Optional[str] = None) -> None:
+    self.memory_budget = memory_budget
+    self.directory = directory
+    self.pages = []
+    self.size = 0
+    self.spilled = 0
+    self.last_pages = {}
+    self._file = None
+
+  @property
+  def num_pages(self) -> int:
+    return len(self.pages) + self.spilled
+
+  def add(self, page_data: Any) -> None:
+    for (key, value) in page_data.items():
+      if isinstance(value, list):
+        last_pages = self.last_pages.setdefault(key, {})
+        for entity in value:
+          if isinstance(entity, dict) and 'id' in entity:
+            last_pages[entity['id']] = self.num_pages
+
+    data = pickle.dumps(page_data, protocol=pickle.HIGHEST_PROTOCOL)
+
+    if self._file is None and self.size + len(data) <= self.memory_budget:
+      self.pages.append(page_data)
+      self.size = self.size + len(data)
+      return
+
+    if self._file is None:
+      self._file = tempfile.NamedTemporaryFile(
+        mode='w+b', prefix='subgrounds-', suffix='.pickle', dir=self.directory, delete=False
+      )
+
+    self._file.write(data)
+    self.spilled = self.spilled + 1
+
+  def iter_pages(self) -> Iterator[Any]:
+    """ Returns an iterator over the pages, in the order in which they were added. """
+    yield from self.pages
+
+    if self._file is not None:
+      self._file.flush()
+      with open(self._file.name, mode='rb') as f:
+        for _ in range(self.spilled):
+          yield pickle.load(f)
+
+  def iter_merged(self) -> Iterator[dict[str, Any]]:
+    """ Returns an iterator over the data of the pages merged as by a
+    :class:`PageAccumulator`, in chunks: the entities of each toplevel list
+    field are returned (merged with their data from the previous pages) once
+    the last page in which they appear has been read. Concatenating the
+    entities of the chunks therefore yields the same lists, in the same order,
+    as merging all pages at once. Every chunk contains all toplevel list fields
+    (empty if none of their entities were completed by the page) and the other
+    toplevel fields are returned in the last chunk.
+
+    Only the entities whose last page has not been read yet are kept in memory.
+    """
+    data = PageAccumulator()
+
+    def done(key: str, entity: Any, page_idx: int) -> bool:
+      return not (isinstance(entity, dict) and 'id' in entity) or self.last_pages[key][entity['id']] == page_idx
+
+    for (page_idx, page_data) in enumerate(self.iter_pages()):
+      data.add(page_data)
+
+      chunk: dict[str, Any] = {key: [] for key in self.last_pages}
+      for (key, value) in data._data.items():
+        match value:
+          case _EntityIndex(entities=entities):
+            ids = [id_ for (id_, entity) in entities.items() if done(key, entity, page_idx)]
+            chunk[key] = [PageAccumulator._materialize(entities.pop(id_)) for id_ in ids]
+          case list():
+            chunk[key] = [entity for entity in value if done(key, entity, page_idx)]
+            data._data[key] = [entity for entity in value if not done(key, entity, page_idx)]
+
+      if any(entities != [] for entities in chunk.values()):
+        yield chunk
+
+    rest = {key: [] for key in self.last_pages} | data.data
+    if any(value != [] for value in rest.values()):
+      yield rest
+
+  def close(self) -> None:
+    self.pages = []
+    self.last_pages = {}
+    if self._file is not None:
+      self._file.close()
+      os.unlink(self._file.name)
+      self._file = None
+
+  def __enter__(self) -> PageSpill:
+    return self
+
+  def __exit__(self, *exn_info) -> None:
+    self.close()
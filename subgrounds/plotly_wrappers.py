@@ -30,8 +30,8 @@ class TraceWrapper(ABC):
 
   def mk_trace(self, data: list[dict[str, Any]] | dict[str, Any]) -> BaseTraceType:
     fpath_data = {}
-    for key, fpath in self.fpaths.items():
-      item = fpath._extract_data(data)
+    items = FieldPath._extractor(list(self.fpaths.values()))(data)
+    for key, item in zip(self.fpaths.keys(), items):
       if type(item) == list and len(item) == 1:
         fpath_data[key] = item[0]
       else:
@@ -22,7 +22,9 @@ A typical Subgrounds request will have the following dataclass hierarchy:
 
 from __future__ import annotations
 from dataclasses import dataclass, field
-from functools import partial, reduce
+from functools import cached_property, partial, reduce
+from hashlib import blake2b
+import json
 from typing import Any, Callable, Iterable, Iterator, Literal, Optional, Protocol, TypeVar, runtime_checkable
 from pipe import map, traverse, where, take, Pipe
 import warnings
@@ -380,7 +382,20 @@ class Selection:
     else:
       return ""
 
-  def graphql(self, level: int = 0) -> str:
+  def graphql(self, level: int = 0, fragments: list[Fragment] = []) -> str:
+    """ Returns the GraphQL string of the current selection. If the inner
+    selections of the current selection (or of any of its nested selections)
+    match one of the fragments in ``fragments``, then they are replaced by a
+    spread of that fragment (i.e.: ``...FragmentName``).
+
+    Args:
+      level (int, optional): Indentation level. Defaults to 0.
+      fragments (list[Fragment], optional): Fragments that can be spread in
+        the selection. Defaults to [].
+
+    Returns:
+      str: The GraphQL string
+    """
     indent = "  " * level
 
     if self.alias:
@@ -392,9 +407,13 @@ class Selection:
       case None | []:
         return f"{indent}{alias_str}{self.fmeta.name}{self.args_graphql}"
       case inner_selection:
-        inner_str = "\n".join(
-          [f.graphql(level=level + 1) for f in inner_selection]
-        )
+        fragment = Fragment.find(fragments, self)
+        if fragment is not None:
+          inner_str = f'{indent}  ...{fragment.name}'
+        else:
+          inner_str = "\n".join(
+            [f.graphql(level=level + 1, fragments=fragments) for f in inner_selection]
+          )
         return f"{indent}{alias_str}{self.fmeta.name}{self.args_graphql} {{\n{inner_str}\n{indent}}}"
 
   @property
@@ -1054,15 +1073,30 @@ class Query:
   # Variables as query arguments, not the values of those variables
   variables: list[VariableDefinition] = field(default_factory=list)
 
-  @property
+  @cached_property
   def graphql(self) -> str:
+    """ Returns a string containing a GraphQL query matching the current query.
+    Queries are immutable, so the string is only rendered once.
+
+    Returns:
+      str: The string containing the GraphQL query
+    """
+    return self.mk_graphql()
+
+  def mk_graphql(self, fragments: list[Fragment] = []) -> str:
     """ Returns a string containing a GraphQL query matching the current query
+    in which sub-selections matching one of the fragments ``fragments`` are
+    replaced by a spread of that fragment.
+
+    Args:
+      fragments (list[Fragment], optional): Fragments that can be spread in
+        the query. Defaults to [].
 
     Returns:
       str: The string containing the GraphQL query
     """
     selection_str = "\n".join(
-      [select.graphql(level=1) for select in self.selection]
+      [select.graphql(level=1, fragments=fragments) for select in self.selection]
     )
 
     if len(self.variables) > 0:
@@ -1499,6 +1533,103 @@ class Query:
         )
     )
 
+
+class QueryBuilder:
+  """ Mutable builder used to construct a :class:`Query` from many selections
+  (e.g.: the selections of thousands of fieldpaths) in linear time.
+
+  Adding selections to the builder is equivalent to successively adding
+  them to a :class:`Query` with :func:`Query.add`, without copying the
+  selection tree on each addition. The selections are stored in a mutable trie
+  which is frozen into a :class:`Query` by :func:`QueryBuilder.build`.
+
+  Like :func:`Query.add`, toplevel selections are identified by their key
+  (i.e.: alias or name) and inner selections by their field name. When a
+  selection is added that already exists, the existing selection is combined
+  with the new one and moved to the end (see :func:`Selection.combine`).
+  """
+  class Node:
+    fmeta: TypeMeta.FieldMeta
+    alias: Optional[str]
+    arguments: list[Argument]
+    children: dict[str, QueryBuilder.Node]
+
+    def __init__(self, select: Selection) -> None:
+      self.fmeta = select.fmeta
+      self.alias = select.alias
+      self.arguments = select.arguments
+      self.children = {}
+      QueryBuilder.insert(self.children, select.selection, key=lambda select: select.fmeta.name)
+
+    def build(self) -> Selection:
+      return Selection(
+        fmeta=self.fmeta,
+        alias=self.alias,
+        arguments=self.arguments,
+        selection=list(self.children.values() | map(QueryBuilder.Node.build))
+      )
+
+  name: Optional[str]
+  selection: dict[str, QueryBuilder.Node]
+
+  def __init__(self, name: Optional[str] = None) -> None:
+    self.name = name
+    self.selection = {}
+
+  @staticmethod
+  def insert(
+    nodes: dict[str, QueryBuilder.Node],
+    selections: list[Selection],
+    key: Callable[[Selection], str]
+  ) -> None:
+    # Same ordering as `union`: selections already present are combined and
+    # moved after the others (sorted by key), new selections come last
+    common = sorted(
+      [select for select in selections if key(select) in nodes],
+      key=key
+    )
+    new = [select for select in selections if key(select) not in nodes]
+
+    for select in common:
+      node = nodes.pop(key(select))
+      QueryBuilder.insert(node.children, select.selection, key=lambda select: select.fmeta.name)
+      nodes[key(select)] = node
+
+    for select in new:
+      nodes[key(select)] = QueryBuilder.Node(select)
+
+  def add(self, selections: Selection | list[Selection]) -> QueryBuilder:
+    """ Adds the selection(s) :attr:`selections` to the builder and returns
+    the builder.
+
+    Args:
+      selections (Selection | list[Selection]): The selection(s) to add
+
+    Returns:
+      QueryBuilder: The builder
+    """
+    match selections:
+      case Selection() as select:
+        QueryBuilder.insert(self.selection, [select], key=lambda select: select.key)
+      case list():
+        # Selections are added one at a time, like successive calls to :func:`Query.add`
+        for select in selections:
+          QueryBuilder.insert(self.selection, [select], key=lambda select: select.key)
+
+    return self
+
+  def build(self) -> Query:
+    """ Returns the :class:`Query` containing all selections added to the builder.
+
+    Returns:
+      Query: The query
+    """
+    return Query(
+      name=self.name,
+      selection=list(self.selection.values() | map(QueryBuilder.Node.build))
+    )
+
+
 @dataclass(frozen=True)
 class Fragment:
   name: str
@@ -1510,11 +1641,43 @@ class Fragment:
 
   @property
   def graphql(self):
+    return self.mk_graphql()
+
+  def mk_graphql(self, fragments: list[Fragment] = []) -> str:
     selection_str = "\n".join(
-      [select.graphql(level=1) for select in self.selection]
+      [select.graphql(level=1, fragments=fragments) for select in self.selection]
     )
     return f"""fragment {self.name} on {TypeRef.root_type_name(self.type_)} {{\n{selection_str}\n}}"""
 
+  def matches(self, select: Selection) -> bool:
+    """ Returns ``True`` if the inner selections of ``select`` can be replaced
+    by a spread of the current fragment, i.e.: if ``select`` selects a field of
+    the fragment's type and its inner selections are the fragment's selections.
+    """
+    return (
+      TypeRef.root_type_name(select.fmeta.type_) == TypeRef.root_type_name(self.type_)
+      and select.selection == self.selection
+    )
+
+  @staticmethod
+  def find(fragments: list[Fragment], select: Selection) -> Optional[Fragment]:
+    """ Returns the first fragment of ``fragments`` that matches the selection
+    ``select`` (see :func:`Fragment.matches`) or ``None`` if there are none.
+    """
+    return next(filter(lambda frag: frag.matches(select), fragments), None)
+
+  @staticmethod
+  def spreads(fragments: list[Fragment], selections: list[Selection]) -> Iterator[Fragment]:
+    """ Returns an iterator over the fragments of ``fragments`` that would be
+    spread when rendering ``selections``.
+    """
+    for select in selections:
+      fragment = Fragment.find(fragments, select)
+      if fragment is not None:
+        yield fragment
+      else:
+        yield from Fragment.spreads(fragments, select.selection)
+
   # TODO: Cleanup combine
   @staticmethod
   def combine(frag: Fragment, other: Fragment) -> Fragment:
@@ -1541,9 +1704,143 @@ class Document:
   # assignments)
   variables: dict[str, Any] = field(default_factory=dict)
 
-  @property
+  @cached_property
   def graphql(self):
-    return '\n'.join([self.query.graphql, *list(self.fragments | map(lambda frag: frag.graphql))])
+    if self.fragments == []:
+      return self.query.graphql
+
+    # Only fragments that are actually spread are rendered (unused fragments
+    # are invalid GraphQL), e.g.: if the query was modified after the fragments
+    # were extracted
+    used = self.used_fragments
+    return '\n'.join([
+      self.query.mk_graphql(used),
+      *list(used | map(lambda frag: frag.mk_graphql(used)))
+    ])
+
+  @property
+  def fingerprint(self) -> str:
+    """ Returns a digest of the current ``Document``'s url, query and variables,
+    used to check that a pagination checkpoint belongs to the document.
+    """
+    h = blake2b(digest_size=16)
+    h.update(self.url.encode('UTF-8'))
+    h.update(self.graphql.encode('UTF-8'))
+    h.update(json.dumps(self.variables, sort_keys=True, default=str).encode('UTF-8'))
+    return h.hexdigest()
+
+  @property
+  def structural_fingerprint(self) -> str:
+    """ Returns a digest of the current ``Document``'s url and query, i.e.: the
+    same digest for documents which only differ by their variables' values.
+    """
+    h = blake2b(digest_size=16)
+    h.update(self.url.encode('UTF-8'))
+    h.update(self.graphql.encode('UTF-8'))
+    return h.hexdigest()
+
+  @property
+  def used_fragments(self) -> list[Fragment]:
+    """ Returns the fragments of the current ``Document`` that are spread in
+    its query, either directly or through other fragments.
+    """
+    used: set[str] = set()
+    stack = list(Fragment.spreads(self.fragments, self.query.selection))
+    while stack:
+      fragment = stack.pop()
+      if fragment.name not in used:
+        used.add(fragment.name)
+        stack.extend(Fragment.spreads(self.fragments, fragment.selection))
+
+    return [frag for frag in self.fragments if frag.name in used]
+
+  def extract_fragments(self, min_occurrences: int = 2, min_fields: int = 2) -> Document:
+    """ Returns a new ``Document`` in which the inner selections that are
+    repeated in the current ``Document``'s query (e.g.: the same sub-selection
+    on the ``token0`` and ``token1`` fields of a pair) are factored into named
+    fragments. The query itself is left unchanged: fragments are spread when
+    the document is rendered (see :func:`Document.graphql`), so the returned
+    document can still be transformed, normalized and pruned like any other.
+
+    Args:
+      min_occurrences (int, optional): Minimum number of times an inner selection
+        must be repeated to be extracted. Defaults to 2.
+      min_fields (int, optional): Minimum number of (leaf) fields an inner
+        selection must select to be extracted. Defaults to 2.
+
+    Returns:
+      Document: The document with its fragments
+    """
+    def key_of(select: Selection) -> tuple[str, str]:
+      return (
+        TypeRef.root_type_name(select.fmeta.type_),
+        '\n'.join([inner.graphql() for inner in select.selection])
+      )
+
+    def num_fields(select: Selection) -> int:
+      if select.selection == []:
+        return 1
+      else:
+        return sum(select.selection | map(num_fields))
+
+    # First pass: count all occurrences of each inner selection
+    occurrences: dict[tuple[str, str], int] = {}
+    sizes: dict[tuple[str, str], int] = {}
+    for select in self.query.iter():
+      if select.selection != []:
+        key = key_of(select)
+        occurrences[key] = occurrences.get(key, 0) + 1
+        sizes.setdefault(key, num_fields(select))
+
+    candidates = {
+      key for key, n in occurrences.items()
+      if n >= min_occurrences and sizes[key] >= min_fields
+    }
+
+    # Second pass: count occurrences again without descending into the repeated
+    # occurrences of candidates, since these will be replaced by a spread
+    # (e.g.: a sub-selection that is only repeated within a larger repeated
+    # sub-selection is not worth extracting)
+    counts: dict[tuple[str, str], int] = {}
+    firsts: dict[tuple[str, str], Selection] = {}
+
+    def visit(select: Selection) -> None:
+      if select.selection == []:
+        return
+
+      key = key_of(select)
+      seen = key in firsts
+      counts[key] = counts.get(key, 0) + 1
+      firsts.setdefault(key, select)
+
+      if not (seen and key in candidates):
+        for inner in select.selection:
+          visit(inner)
+
+    for select in self.query.selection:
+      visit(select)
+
+    def mk_fragment(key: tuple[str, str], select: Selection) -> Fragment:
+      h = blake2b(digest_size=4)
+      h.update(key[1].encode('UTF-8'))
+      return Fragment(
+        name=f'{key[0]}_{h.hexdigest()}',
+        type_=select.fmeta.type_,
+        selection=list(select.selection)
+      )
+
+    fragments = [
+      mk_fragment(key, select)
+      for key, select in firsts.items()
+      if key in candidates and counts[key] >= min_occurrences
+    ]
+
+    return Document(
+      url=self.url,
+      query=self.query,
+      fragments=fragments,
+      variables=self.variables
+    )
 
   @staticmethod
   def mk_single_query(url: str, query: Query) -> Document:
@@ -1729,6 +2026,10 @@ def input_value_of_argument(
 ) -> InputValue:
   def fmt_value(type_ref: TypeRef.T, value: Any, non_null=False):
     match (type_ref, schema.type_map[TypeRef.root_type_name(type_ref)], value):
+      # Variables are bound when the query is executed
+      case (_, _, InputValue.Variable()):
+        return value
+
       # Only allow Null values when non_null=True
       case (_, _, None):
         if not non_null:
@@ -1800,4 +2101,55 @@ def arguments_of_field_args(
       args = [f(arg_meta) for arg_meta in field.arguments]
       return list(filter(lambda arg: arg is not None, args))
     case _:
-      raise TypeError(f"arguments_of_field_args: TypeMeta {field.name} is not of type FieldMeta")
\ No newline at end of file
+      raise TypeError(f"arguments_of_field_args: TypeMeta {field.name} is not of type FieldMeta")
+
+
+def variable_definitions_of_selections(
+  schema: SchemaMeta,
+  selections: list[Selection]
+) -> list[VariableDefinition]:
+  """ Returns the definitions of all variables used (possibly nested in input
+  objects or lists) as argument values in the selection trees :attr:`selections`.
+  Unlike :func:`Selection.infer_variable_definitions`, the variables' types
+  are resolved using the :attr:`schema`.
+
+  Args:
+    schema (SchemaMeta): The schema of the API against which the selections are made
+    selections (list[Selection]): The selection trees
+
+  Returns:
+    list[VariableDefinition]: The variable definitions
+  """
+  def vardefs_of_input_value(type_ref: TypeRef.T, value: InputValue.T) -> list[VariableDefinition]:
+    match (type_ref, value):
+      case (_, InputValue.Variable(name=name)):
+        return [VariableDefinition(name, type_ref)]
+
+      case (TypeRef.NonNull(inner=t), InputValue.Object() | InputValue.List()):
+        return vardefs_of_input_value(t, value)
+
+      case (TypeRef.List(inner=t), InputValue.List(value=values)):
+        return list(values | map(partial(vardefs_of_input_value, t)) | traverse)
+
+      case (_, InputValue.Object(value=fields)):
+        input_object: TypeMeta.InputObjectMeta = schema.type_of_typeref(type_ref)
+        return list(
+          list(fields.items())
+          | map(lambda item: vardefs_of_input_value(input_object.type_of_input_field(item[0]), item[1]))
+          | traverse
+        )
+
+      case _:
+        return []
+
+  def vardefs_of_selection(select: Selection) -> list[VariableDefinition]:
+    args_vardefs = list(
+      select.arguments
+      | map(lambda arg: vardefs_of_input_value(select.fmeta.type_of_arg(arg.name), arg.value))
+      | traverse
+    )
+    return args_vardefs + list(select.selection | map(vardefs_of_selection) | traverse)
+
+  # Deduplicate variables used in multiple places
+  vardefs = list(selections | map(vardefs_of_selection) | traverse)
+  return list({vardef.name: vardef for vardef in vardefs}.values())
@@ -0,0 +1,333 @@
+""" Synthetic field expressions module
+
+This module defines the expression trees recorded by :class:`SyntheticField`
+objects. The leaves of an expression are the synthetic field's dependencies
+(i.e.: :class:`Expr.Dep` nodes referring to :attr:`SyntheticField._deps` by
+index) and constants. Inner nodes are either arithmetic operators
+(see :data:`OPERATORS`) or arbitrary functions.
+
+Since arithmetic operators work the same way on scalar values and on Pandas
+``Series``, expressions made only of operators can be evaluated on entire
+DataFrame columns at once (see :func:`subgrounds.dataframe_utils.synthetic_column`).
+
+Expressions are compiled (see :func:`compile_exprs`) into a single flat Python
+function in which identical sub-expressions are only computed once.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional, Protocol, Sequence
+import operator
+
+# Operators which can be evaluated on scalar values as well as on whole columns
+OPERATORS: dict[str, Callable] = {
+  'add': operator.add,
+  'sub': operator.sub,
+  'mul': operator.mul,
+  'truediv': operator.truediv,
+  'floordiv': operator.floordiv,
+  'pow': operator.pow,
+  'mod': operator.mod,
+  'neg': operator.neg,
+  'abs': operator.abs,
+}
+
+# Infix symbols of the binary operators, used by the generated code
+BINARY_SYMBOLS: dict[str, str] = {
+  'add': '+',
+  'sub': '-',
+  'mul': '*',
+  'truediv': '/',
+  'floordiv': '//',
+  'pow': '**',
+  'mod': '%',
+}
+
+
+class Expr:
+  class T(Protocol):
+    @property
+    def is_vectorizable(self) -> bool:
+      """ Returns True i.f.f. the expression only contains operators, dependencies
+      and constants (i.e.: it can be evaluated on whole columns)
+
+      Returns:
+        bool: True i.f.f. the expression can be evaluated on whole columns
+      """
+      ...
+
+    def evaluate(self, values: Sequence[Any]) -> Any:
+      """ Evaluates the expression given the values of the dependencies ``values``
+
+      Args:
+        values (Sequence[Any]): The values of the dependencies (by index)
+
+      Returns:
+        Any: The value of the expression
+      """
+      ...
+
+    def remap(self, indices: Sequence[int]) -> Expr.T:
+      """ Returns the expression in which each dependency index ``idx`` is
+      replaced by ``indices[idx]``
+
+      Args:
+        indices (Sequence[int]): The new dependency indices
+
+      Returns:
+        Expr.T: The remapped expression
+      """
+      ...
+
+  @dataclass(frozen=True)
+  class Dep:
+    idx: int
+
+    @property
+    def is_vectorizable(self) -> bool:
+      return True
+
+    def evaluate(self, values: Sequence[Any]) -> Any:
+      return values[self.idx]
+
+    def remap(self, indices: Sequence[int]) -> Expr.T:
+      return Expr.Dep(indices[self.idx])
+
+  @dataclass(frozen=True)
+  class Const:
+    value: Any
+
+    @property
+    def is_vectorizable(self) -> bool:
+      return True
+
+    def evaluate(self, values: Sequence[Any]) -> Any:
+      return self.value
+
+    def remap(self, indices: Sequence[int]) -> Expr.T:
+      return self
+
+  @dataclass(frozen=True)
+  class Op:
+    name: str
+    args: tuple[Expr.T, ...]
+
+    @property
+    def is_vectorizable(self) -> bool:
+      return all(arg.is_vectorizable for arg in self.args)
+
+    def evaluate(self, values: Sequence[Any]) -> Any:
+      return OPERATORS[self.name](*[arg.evaluate(values) for arg in self.args])
+
+    def remap(self, indices: Sequence[int]) -> Expr.T:
+      return Expr.Op(self.name, tuple(arg.remap(indices) for arg in self.args))
+
+  @dataclass(frozen=True)
+  class Call:
+    f: Callable
+    args: tuple[Expr.T, ...]
+
+    @property
+    def is_vectorizable(self) -> bool:
+      return False
+
+    def evaluate(self, values: Sequence[Any]) -> Any:
+      return self.f(*[arg.evaluate(values) for arg in self.args])
+
+    def remap(self, indices: Sequence[int]) -> Expr.T:
+      return Expr.Call(self.f, tuple(arg.remap(indices) for arg in self.args))
+
+  @staticmethod
+  def apply(f: Callable, args: tuple[Expr.T, ...]) -> Expr.T:
+    """ Returns the expression applying ``f`` to the expressions ``args``, i.e.:
+    an :class:`Expr.Op` node if ``f`` is one of :data:`OPERATORS`, otherwise
+    an :class:`Expr.Call` node.
+    """
+    for (name, op) in OPERATORS.items():
+      if f is op:
+        return Expr.Op(name, args)
+
+    return Expr.Call(f, args)
+
+
+def compile_exprs(
+  exprs: Sequence[Expr.T],
+  num_deps: int,
+  defaults: Optional[Sequence[Any]] = None
+) -> Callable[..., tuple]:
+  """ Compiles the expressions ``exprs`` into a single function which takes the
+  values of the ``num_deps`` dependencies as arguments and returns the value of
+  each expression. Sub-expressions shared by one or more expressions (e.g.:
+  ``abs(x - y)`` in ``abs(x - y) / (abs(x - y) + 1)``) are only computed once.
+  Functions of :class:`Expr.Call` nodes are therefore assumed to be pure.
+
+  The expressions are evaluated in order, and dependencies whose index ``idx``
+  is greater than or equal to ``num_deps`` refer to the value of the expression
+  ``idx - num_deps``, which must come first.
+
+  If ``defaults`` is set, an expression whose evaluation raises an exception
+  (e.g.: division by zero) evaluates to its default value instead, without
+  affecting the other expressions (unless they share the failed sub-expression).
+  Otherwise, the exception is raised.
+
+  Args:
+    exprs (Sequence[Expr.T]): The expressions
+    num_deps (int): The number of dependencies
+    defaults (Optional[Sequence[Any]], optional): The default value of each
+      expression. Defaults to None.
+
+  Returns:
+    Callable[..., tuple]: The compiled function
+  """
+  return _compile(exprs, num_deps, defaults, unpack=False)
+
+
+class _SubexpressionError(Exception):
+  """ Raised by compiled functions when a shared sub-expression failed """
+  pass
+
+
+# Value of shared sub-expressions whose evaluation raised an exception
+_FAILED = object()
+
+
+def _compile(
+  exprs: Sequence[Expr.T],
+  num_deps: int,
+  defaults: Optional[Sequence[Any]],
+  unpack: bool
+) -> Callable:
+  namespace: dict[str, Any] = {'_failed': _FAILED, '_Error': _SubexpressionError}
+  names: dict[Hashable, str] = {}
+  keys: dict[int, Hashable] = {}
+
+  def key_of(expr: Expr.T) -> Hashable:
+    """ Returns the structural key of ``expr`` """
+    if id(expr) not in keys:
+      match expr:
+        case Expr.Dep(idx=idx) if idx < num_deps:
+          keys[id(expr)] = ('dep', idx)
+        case Expr.Dep(idx=idx):
+          keys[id(expr)] = ('result', idx)
+        case Expr.Const(value=value):
+          # The type is part of the key since e.g.: 1 == 1.0 == True
+          keys[id(expr)] = ('const', type(value), value)
+        case Expr.Op(name=op, args=args) | Expr.Call(f=op, args=args):
+          kind = 'op' if isinstance(expr, Expr.Op) else 'call'
+          keys[id(expr)] = (kind, op, tuple(key_of(arg) for arg in args))
+        case _:
+          raise TypeError(f'compile_exprs: unexpected expression {expr}')
+    return keys[id(expr)]
+
+  def inner_keys(expr: Expr.T) -> set[Hashable]:
+    match expr:
+      case Expr.Op(args=args) | Expr.Call(args=args):
+        return {key_of(expr)}.union(*[inner_keys(arg) for arg in args])
+      case _:
+        return set()
+
+  # When expressions fall back to their defaults, each of them is evaluated in
+  # its own try block. Sub-expressions shared by several expressions are then
+  # evaluated in their own try block beforehand, such that an exception only
+  # affects the expressions which depend on the failed sub-expression.
+  shared: set[Hashable] = set()
+  if defaults is not None:
+    seen: set[Hashable] = set()
+    for expr in exprs:
+      expr_keys = inner_keys(expr)
+      shared |= expr_keys & seen
+      seen |= expr_keys
+
+  body: list[str] = []
+
+  def guarded(lines: list[str], name: str, on_error: str) -> list[str]:
+    return [
+      'try:',
+      *[f'  {line}' for line in lines],
+      'except Exception:',
+      f'  {name} = {on_error}',
+    ]
+
+  def emit(expr: Expr.T, lines: list[str], checked: set[str]) -> str:
+    """ Emits the lines computing ``expr`` (unless already emitted) and returns
+    the name of the variable holding its value. Shared sub-expressions are
+    emitted in their own block of ``body``, and ``lines`` checks (once) that
+    they did not fail. """
+    key = key_of(expr)
+    match expr:
+      case Expr.Dep(idx=idx) if idx < num_deps:
+        return f'x{idx}'
+
+      case Expr.Dep(idx=idx):
+        return f'r{idx - num_deps}'
+
+      case Expr.Const(value=value):
+        if key not in names:
+          names[key] = f'c{len(namespace)}'
+          namespace[names[key]] = value
+        return names[key]
+
+    if key not in names:
+      if key in shared:
+        (block_lines, block_checked) = ([], set())
+      else:
+        (block_lines, block_checked) = (lines, checked)
+
+      arg_names = [emit(arg, block_lines, block_checked) for arg in expr.args]
+      match expr:
+        case Expr.Op(name=name) if name in BINARY_SYMBOLS:
+          code = f'{arg_names[0]} {BINARY_SYMBOLS[name]} {arg_names[1]}'
+        case Expr.Op(name='neg'):
+          code = f'-{arg_names[0]}'
+        case Expr.Op(name='abs'):
+          code = f'abs({arg_names[0]})'
+        case _:
+          fname = f'f{len(namespace)}'
+          namespace[fname] = expr.f if isinstance(expr, Expr.Call) else OPERATORS[expr.name]
+          code = f'{fname}({", ".join(arg_names)})'
+
+      names[key] = f't{len(names)}'
+      block_lines.append(f'{names[key]} = {code}')
+      if key in shared:
+        body.extend(guarded(block_lines, names[key], '_failed'))
+
+    if key in shared and names[key] not in checked:
+      lines.append(f'if {names[key]} is _failed: raise _Error')
+      checked.add(names[key])
+
+    return names[key]
+
+  for (idx, expr) in enumerate(exprs):
+    lines: list[str] = []
+    lines.append(f'r{idx} = {emit(expr, lines, set())}')
+
+    if defaults is None:
+      body.extend(lines)
+    else:
+      namespace[f'd{idx}'] = defaults[idx]
+      body.extend(guarded(lines, f'r{idx}', f'd{idx}'))
+
+  params = ', '.join(f'x{idx}' for idx in range(num_deps))
+  results = 'r0' if unpack else '(' + ''.join(f'r{idx}, ' for idx in range(len(exprs))) + ')'
+  source = '\n'.join([
+    f'def compiled({params}):',
+    *[f'  {line}' for line in body],
+    f'  return {results}',
+  ])
+  exec(compile(source, '<synthetic fields>', 'exec'), namespace)
+  return namespace['compiled']
+
+
+def compile_expr(expr: Expr.T, num_deps: int) -> Callable:
+  """ Compiles the expression ``expr`` into a function which takes the values of
+  the ``num_deps`` dependencies as arguments and returns the value of the
+  expression (see :func:`compile_exprs`).
+
+  Args:
+    expr (Expr.T): The expression
+    num_deps (int): The number of dependencies
+
+  Returns:
+    Callable: The compiled function
+  """
+  return _compile([expr], num_deps, None, unpack=True)
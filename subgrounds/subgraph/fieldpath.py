@@ -1,7 +1,7 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any, Callable, ClassVar, Optional, Tuple, TYPE_CHECKING
-from functools import partial, reduce
+from functools import lru_cache, partial
 import operator
 from hashlib import blake2b
 from pipe import map, traverse
@@ -9,9 +9,10 @@ import logging
 import warnings
 from datetime import datetime
 
-from subgrounds.query import Query, Selection, arguments_of_field_args
+from subgrounds.query import QueryBuilder, Selection, arguments_of_field_args
 from subgrounds.schema import SchemaMeta, TypeMeta, TypeRef
-from subgrounds.utils import extract_data
+from subgrounds.utils import compile_extractor
+from subgrounds.subgraph.expr import Expr, compile_expr
 from subgrounds.subgraph.filter import Filter
 if TYPE_CHECKING:
   from subgrounds.subgraph.subgraph import Subgraph
@@ -84,43 +85,43 @@ class FieldOperatorMixin:
     return SyntheticField(operator.add, typeref_of_binary_op('add', self._type, other), [self, other])
 
   def __radd__(self, other: Any) -> SyntheticField:
-    return SyntheticField(lambda x, y: operator.add(y, x), typeref_of_binary_op('add', self._type, other), [self, other])
+    return SyntheticField(operator.add, typeref_of_binary_op('add', self._type, other), [other, self])
 
   def __sub__(self, other: Any) -> SyntheticField:
     return SyntheticField(operator.sub, typeref_of_binary_op('sub', self._type, other), [self, other])
 
   def __rsub__(self, other: Any) -> SyntheticField:
-    return SyntheticField(lambda x, y: operator.sub(y, x), typeref_of_binary_op('sub', self._type, other), [self, other])
+    return SyntheticField(operator.sub, typeref_of_binary_op('sub', self._type, other), [other, self])
 
   def __mul__(self, other: Any) -> SyntheticField:
     return SyntheticField(operator.mul, typeref_of_binary_op('mul', self._type, other), [self, other])
 
   def __rmul__(self, other: Any) -> SyntheticField:
-    return SyntheticField(lambda x, y: operator.mul(y, x), typeref_of_binary_op('mul', self._type, other), [self, other])
+    return SyntheticField(operator.mul, typeref_of_binary_op('mul', self._type, other), [other, self])
 
   def __truediv__(self, other: Any) -> SyntheticField:
     return SyntheticField(operator.truediv, typeref_of_binary_op('div', self._type, other), [self, other])
 
   def __rtruediv__(self, other: Any) -> SyntheticField:
-    return SyntheticField(lambda x, y: operator.truediv(y, x), typeref_of_binary_op('div', self._type, other), [self, other])
+    return SyntheticField(operator.truediv, typeref_of_binary_op('div', self._type, other), [other, self])
 
   def __floordiv__(self, other: Any) -> SyntheticField:
     return SyntheticField(operator.floordiv, typeref_of_binary_op('div', self._type, other), [self, other])
 
   def __rfloordiv__(self, other: Any) -> SyntheticField:
-    return SyntheticField(lambda x, y: operator.floordiv(y, x), typeref_of_binary_op('div', self._type, other), [self, other])
+    return SyntheticField(operator.floordiv, typeref_of_binary_op('div', self._type, other), [other, self])
 
   def __pow__(self, rhs: Any) -> SyntheticField:
     return SyntheticField(operator.pow, typeref_of_binary_op('pow', self._type, rhs), [self, rhs])
 
   def __rpow__(self, lhs: Any) -> SyntheticField:
-    return SyntheticField(lambda x, y: operator.pow(y, x), typeref_of_binary_op('pow', self._type, lhs), [self, lhs])
+    return SyntheticField(operator.pow, typeref_of_binary_op('pow', self._type, lhs), [lhs, self])
 
   def __mod__(self, rhs: Any) -> SyntheticField:
     return SyntheticField(operator.mod, typeref_of_binary_op('mod', self._type, rhs), [self, rhs])
 
   def __rmod__(self, lhs: Any) -> SyntheticField:
-    return SyntheticField(lambda x, y: operator.mod(y, x), typeref_of_binary_op('mod', self._type, lhs), [self, lhs])
+    return SyntheticField(operator.mod, typeref_of_binary_op('mod', self._type, lhs), [lhs, self])
 
   def __neg__(self) -> SyntheticField:
     return SyntheticField(operator.neg, type_ref_of_unary_op('neg', self._type), self)
@@ -174,6 +175,10 @@ class FieldPath(FieldOperatorMixin):
     self._type = type_
     self._path = path
 
+    # Results of the internal methods that only depend on `_path`
+    # (see `_memoized`). Reset when `_path` is modified.
+    self._memo = {}
+
     # Add fields as attributes if leaf is object
     match self._subgraph._schema.type_of(self._leaf):
       case TypeMeta.ObjectMeta() | TypeMeta.InterfaceMeta() as type_ if len(self._path) < FPATH_DEPTH_LIMIT:
@@ -226,7 +231,15 @@ class FieldPath(FieldOperatorMixin):
     """
     return self._path[-1][1]
 
+  def _memoized(self, key: Tuple, f: Callable[[], Any]) -> Any:
+    try:
+      return self._memo[key]
+    except KeyError:
+      value = self._memo[key] = f()
+      return value
+
   @staticmethod
+  @lru_cache(maxsize=4096)
   def _hash(msg: str) -> str:
     h = blake2b(digest_size=8)
     h.update(msg.encode('UTF-8'))
@@ -243,7 +256,7 @@ class FieldPath(FieldOperatorMixin):
     Returns:
       list[Selection]: _description_
     """
-    query = reduce(Query.add, fpaths | map(FieldPath._selection), Query())
+    query = QueryBuilder().add(list(fpaths | map(FieldPath._selection))).build()
     return query.selection
 
   def _name_path(self, use_aliases: bool = False) -> list[str]:
@@ -268,10 +281,11 @@ class FieldPath(FieldOperatorMixin):
       else:
         return ele[1].name
 
-    return list(
+    name_path = self._memoized(('_name_path', use_aliases), lambda: tuple(
       self._path
       | map(lambda ele: gen_alias(ele) if use_aliases else ele[1].name)
-    )
+    ))
+    return list(name_path)
 
   def _name(self, use_aliases: bool = False) -> str:
     """ Generates the name of the current :class:`FieldPath` using the names of
@@ -285,7 +299,10 @@ class FieldPath(FieldOperatorMixin):
     Returns:
       str: The generated name of the current :class:`FieldPath`.
     """
-    return '_'.join(self._name_path(use_aliases=use_aliases))
+    return self._memoized(
+      ('_name', use_aliases),
+      lambda: '_'.join(self._name_path(use_aliases=use_aliases))
+    )
 
   def _auto_select(self) -> FieldPath | list[FieldPath]:
     match self._subgraph._schema.type_of_typeref(self._leaf.type_):
@@ -309,7 +326,25 @@ class FieldPath(FieldOperatorMixin):
     Returns:
       list[Any] | Any: Data corresponding to the current :class:`FieldPath`.
     """
-    return extract_data(self._name_path(use_aliases=True), data)
+    return FieldPath._extractor([self])(data)[0]
+
+  @staticmethod
+  def _extractor(fpaths: list[FieldPath]) -> Callable[[dict | list[dict]], list[Any]]:
+    """ Returns a function which extracts the data corresponding to each
+    :class:`FieldPath` in :attr:`fpaths` from a response in a single pass
+    over the data.
+
+    Args:
+      fpaths (list[FieldPath]): The fieldpaths whose data is to be extracted
+
+    Returns:
+      Callable[[dict | list[dict]], list[Any]]: Function returning the data
+      corresponding to each :class:`FieldPath` in :attr:`fpaths` (in the same order)
+    """
+    return compile_extractor(tuple(
+      tuple(fpath._name_path(use_aliases=True))
+      for fpath in fpaths
+    ))
 
   def _selection(self) -> Selection | list[Selection]:
     """ Returns a selection or list of selections corresponding to the current
@@ -337,7 +372,7 @@ class FieldPath(FieldOperatorMixin):
 
       assert False  # Suppress mypy missing return statement warning
 
-    return f(self._path)[0]
+    return self._memoized(('_selection',), lambda: f(self._path)[0])
 
   def _set_arguments(
     self,
@@ -371,6 +406,7 @@ class FieldPath(FieldOperatorMixin):
       case TypeMeta.FieldMeta():
         args = {key: fmt_arg(key, val) for key, val in args.items()}
         self._path[-1] = (args, self._path[-1][1])
+        self._memo = {}
         if len(selection) > 0:
           return list(selection | map(partial(FieldPath._extend, self)))
         else:
@@ -417,6 +453,24 @@ class FieldPath(FieldOperatorMixin):
       case _:
         raise TypeError(f"FieldPath: Unexpected type {self._type.name} when selection {name} on {self}")
 
+  def _parent(self) -> Optional[FieldPath]:
+    """ Returns the :class:`FieldPath` selecting the object on which the leaf
+    field of the current :class:`FieldPath` is selected, or ``None`` if the
+    current :class:`FieldPath` selects a single field.
+
+    Returns:
+      Optional[FieldPath]: The parent :class:`FieldPath`
+    """
+    if len(self._path) < 2:
+      return None
+
+    return FieldPath(
+      subgraph=self._subgraph,
+      root_type=self._root_type,
+      type_=self._path[-2][1].type_,
+      path=self._path[:-1]
+    )
+
   def _extend(self, ext: FieldPath) -> FieldPath:
     """ Extends the current :class:`FieldPath` with the :class:`FieldPath`
     :attr:`ext`. :attr:`ext` must start where the current :class:`FieldPath` ends.
@@ -534,6 +588,7 @@ class SyntheticField(FieldOperatorMixin):
   _type: TypeRef.T
   _default: Any
   _deps: list[FieldPath]
+  _expr: Expr.T
 
   def __init__(
     self,
@@ -544,74 +599,39 @@ class SyntheticField(FieldOperatorMixin):
   ) -> None:
     deps = list([deps] | traverse)
 
-    def mk_deps(
-      deps: list[FieldPath | SyntheticField],
-      f: Callable,
-      acc: list[Tuple[Optional[Callable], int]] = []
-    ) -> Tuple[Callable, list[FieldPath]]:
-      """If all dependencies are field paths, then this function does nothing. If the dependencies contain
-      one or more other synthetic fields, as is the case when chaining binary operators, then the synthetic
-      field tree is flattened to a single synthetic field containing all leaf dependencies.
-
-      Args:
-        deps (list): Initial dependencies for synthetic field
-        f (Callable): Function to apply to the values of those dependencies
-        acc (list[Tuple[Optional[Callable], list[FieldPath]]], optional): Accumulator. Defaults to [].
-
-      Returns:
-        Tuple[Callable, list[FieldPath]]: A tuple containing the potentially modified
-        function and dependency list.
+    # Dependencies are deduplicated by name (including aliases), such that
+    # repeated field paths are only selected (and passed to `_f`) once
+    unique_deps: dict[str, int] = {}
+    flat_deps: list[FieldPath] = []
+
+    def dep_idx(fpath: FieldPath) -> int:
+      name = fpath._name(use_aliases=True)
+      if name not in unique_deps:
+        unique_deps[name] = len(flat_deps)
+        flat_deps.append(fpath)
+      return unique_deps[name]
+
+    def mk_expr(dep: FieldPath | SyntheticField | int | float | str | bool) -> Expr.T:
+      """ Returns the expression of the dependency ``dep``. The expressions of
+      nested synthetic fields (as is the case when chaining binary operators) are
+      inlined, such that the synthetic field tree is flattened into a single
+      expression over all leaf dependencies.
       """
-      match deps:
-        case []:
-          def new_f(*args):
-            new_args = []
-            _counter = 0
-            for (f_, deps) in acc:
-              match (f_, deps):
-                case (None, FieldPath()):
-                  new_args.append(args[_counter])
-                  _counter += 1
-                case (None, int() | float() | str() | bool() as constant):
-                  new_args.append(constant)
-                case (f_, list() as deps):
-                  new_args.append(f_(*args[_counter:_counter + len(deps)]))
-                  _counter += len(deps)
-
-            return f(*new_args)
-
-          new_deps = []
-          for (_, deps) in acc:
-            match deps:
-              case FieldPath() as dep:
-                new_deps.append(dep)
-              case int() | float() | str() | bool():
-                pass
-              case list() as deps:
-                new_deps = new_deps + deps
-
-          return (new_f, new_deps)
-
-        case [SyntheticField(_f=inner_f, _deps=inner_deps), *rest]:
-          acc.append((inner_f, inner_deps))
-          return mk_deps(rest, f, acc)
-
-        case [FieldPath() as dep, *rest]:
-          acc.append((None, dep))
-          return mk_deps(rest, f, acc)
-
-        case [int() | float() | str() | bool() as constant, *rest]:
-          acc.append((None, constant))
-          return mk_deps(rest, f, acc)
-
-        case _ as deps:
-          raise TypeError(f'mk_deps: unexpected argument {deps}')
-
-    (f, deps) = mk_deps(deps, f)
-    self._f = f
+      match dep:
+        case SyntheticField(_expr=expr, _deps=inner_deps):
+          return expr.remap([dep_idx(inner_dep) for inner_dep in inner_deps])
+        case FieldPath():
+          return Expr.Dep(dep_idx(dep))
+        case int() | float() | str() | bool() as constant:
+          return Expr.Const(constant)
+        case _:
+          raise TypeError(f'SyntheticField: unexpected argument {dep}')
+
+    self._expr = Expr.apply(f, tuple(deps | map(mk_expr)))
+    self._f = compile_expr(self._expr, len(flat_deps))
     self._type = type_
     self._default = default if default is not None else SyntheticField.default_of_type(type_)
-    self._deps = deps
+    self._deps = flat_deps
 
     SyntheticField._counter += 1
 
@@ -10,10 +10,11 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from pipe import map
 import logging
+from typing import Optional
 import warnings
 
 from subgrounds.schema import SchemaMeta, TypeMeta, TypeRef
-from subgrounds.transform import DEFAULT_SUBGRAPH_TRANSFORMS, LocalSyntheticField, DocumentTransform
+from subgrounds.transform import DEFAULT_SUBGRAPH_TRANSFORMS, LocalSyntheticField, DocumentTransform, fuse_transforms
 from subgrounds.subgraph.fieldpath import FieldPath, SyntheticField
 from subgrounds.subgraph.object import Object
 
@@ -27,6 +28,7 @@ class Subgraph:
   _schema: SchemaMeta
   _transforms: list[DocumentTransform] = field(default_factory=list)
   _is_subgraph: bool = True
+  _fused: Optional[tuple[tuple[DocumentTransform, ...], list[DocumentTransform]]] = field(default=None, repr=False, compare=False)
 
   def __init__(
     self,
@@ -39,6 +41,7 @@ class Subgraph:
     self._schema = schema
     self._transforms = transforms
     self._is_subgraph = is_subgraph
+    self._fused = None
 
     # Add objects as attributes
     for (key, obj) in self._schema.type_map.items():
@@ -66,7 +69,26 @@ class Subgraph:
       object_,
       sfield._f,
       sfield._default,
-      list(sfield._deps | map(FieldPath._selection))
+      list(sfield._deps | map(FieldPath._selection)),
+      sfield
     )
 
     self._transforms = [transform, *self._transforms]
+
+  def _fused_transforms(self) -> list[DocumentTransform]:
+    """ Returns the subgraph's transforms fused by :func:`fuse_transforms`. The
+    fused transforms (and the response walks they compile for each document)
+    are reused across requests until :attr:`_transforms` changes.
+
+    Returns:
+      list[DocumentTransform]: The fused transforms
+    """
+    transforms = tuple(self._transforms)
+    if (
+      self._fused is None
+      or len(self._fused[0]) != len(transforms)
+      or any(cached is not transform for (cached, transform) in zip(self._fused[0], transforms))
+    ):
+      self._fused = (transforms, fuse_transforms(list(transforms)))
+
+    return self._fused[1]
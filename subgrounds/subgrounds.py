@@ -4,10 +4,10 @@ This module implements the toplevel API that most developers will be using when
 querying The Graph with Subgrounds.
 """
 
+from __future__ import annotations
 from dataclasses import dataclass, field
-from functools import reduce
-import functools
-from typing import Any, Iterator, Optional, Type
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Optional, Type, TypeVar
 from pipe import map, groupby, traverse, where
 import json
 import pandas as pd
@@ -15,20 +15,29 @@ import logging
 import warnings
 from pathlib import Path
 
-from subgrounds.dataframe_utils import df_of_json
-from subgrounds.pagination.pagination import PaginationStrategy
+from subgrounds.dataframe_utils import DataFramePlan, df_of_json, vectorized_fpaths
+from subgrounds.pagination.checkpoint import DEFAULT_CHECKPOINT_EVERY
+from subgrounds.pagination.pagination import PaginationStrategy, accepts_plan
+from subgrounds.pagination.preprocess import PaginationPlan
+from subgrounds.pagination.progress import Progress
+from subgrounds.pagination.utils import PageSpill
 from subgrounds.pagination.strategies import LegacyStrategy
-from subgrounds.query import DataRequest, Document, Query
+from subgrounds.query import DataRequest, Document, Query, QueryBuilder, variable_definitions_of_selections
 from subgrounds.schema import SchemaMeta
 from subgrounds.subgraph.fieldpath import FieldPath
 from subgrounds.subgraph.subgraph import Subgraph
+from subgrounds.sync import WatermarkStore, seed_document, watermarks_of_data
 from subgrounds.transform import DEFAULT_GLOBAL_TRANSFORMS, DEFAULT_SUBGRAPH_TRANSFORMS, DocumentTransform, RequestTransform
 import subgrounds.client as client
 from subgrounds.pagination import paginate, paginate_iter
+from subgrounds.pagination.explain import Explanation, explain
 
 logger = logging.getLogger('subgrounds')
 warnings.simplefilter('default')
 
+T = TypeVar('T')
+U = TypeVar('U')
+
 
 def store_schema(schema: dict[str, Any], path: Path):
   with path.open("w") as f:
@@ -51,6 +60,31 @@ class Subgrounds:
   global_transforms: list[RequestTransform] = field(default_factory=lambda: DEFAULT_GLOBAL_TRANSFORMS)
   subgraphs: dict[str, Subgraph] = field(default_factory=dict)
 
+  # Maximum number of documents of a request executed concurrently
+  max_workers: int = 1
+
+  # Maximum number of data pages queried ahead when iterating over paginated
+  # query results (e.g.: with `query_df_iter`)
+  prefetch_depth: int = 0
+
+  # Directory in which pagination checkpoints are saved when iterating over
+  # paginated query results, one file per document. Interrupted iterations
+  # resume from these checkpoints unless they are cleared with
+  # `clear_checkpoints` (see `paginate_iter`)
+  checkpoint_dir: Optional[str] = None
+  checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY
+
+  # Callback called with the progress of the pagination of each document after
+  # each page when iterating over paginated query results. If `probe_progress`
+  # is set, the number of entities of each document is estimated beforehand so
+  # that progress reports include an ETA (see `paginate_iter`)
+  progress: Optional[Callable[[Progress], None]] = None
+  probe_progress: bool = False
+
+  # Directory of the spill files of memory-bounded queries (see `query_df`).
+  # Defaults to the system's temporary directory
+  spill_dir: Optional[str] = None
+
   def load(
     self,
     url: str,
@@ -136,15 +170,51 @@ class Subgrounds:
       | traverse
     )
 
+    def mk_query(fpaths: list[FieldPath]) -> Query:
+      query = QueryBuilder().add(list(fpaths | map(FieldPath._selection))).build()
+      return query.add_vardefs(variable_definitions_of_selections(
+        fpaths[0]._subgraph._schema,
+        query.selection
+      ))
+
     return DataRequest(documents=list(
       fpaths
       | groupby(lambda fpath: fpath._subgraph._url)
       | map(lambda group: Document(
         url=group[0],
-        query=reduce(Query.add, group[1] | map(FieldPath._selection), Query())
+        query=mk_query(list(group[1]))
       ))
     ))
 
+  def _checkpoint_path(self, doc: Document) -> Optional[Path]:
+    if self.checkpoint_dir is None:
+      return None
+
+    Path(self.checkpoint_dir).mkdir(parents=True, exist_ok=True)
+    return Path(self.checkpoint_dir) / f'{doc.fingerprint}.json'
+
+  def clear_checkpoints(self) -> None:
+    """ Deletes the pagination checkpoints saved in :attr:`checkpoint_dir`, so
+    that the next iterations over paginated query results start from the first
+    page instead of resuming from the checkpoints (see :func:`paginate_iter`).
+    """
+    if self.checkpoint_dir is None:
+      return
+
+    for path in Path(self.checkpoint_dir).glob('*.json'):
+      path.unlink(missing_ok=True)
+
+  def _map_concurrent(self, f: Callable[[U], T], items: list[U]) -> list[T]:
+    """ Applies :attr:`f` to each item in :attr:`items` (typically the documents
+    of a request), concurrently if :attr:`max_workers` is greater than 1. The
+    results are in the same order as :attr:`items`.
+    """
+    if self.max_workers > 1 and len(items) > 1:
+      with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+        return list(executor.map(f, items))
+    else:
+      return list(items | map(f))
+
   def execute(
     self,
     req: DataRequest,
@@ -188,7 +258,10 @@ class Subgrounds:
     def transform_req(transforms: list[RequestTransform], req: DataRequest) -> list[dict]:
       match transforms:
         case []:
-          return list(req.documents | map(lambda doc: transform_doc(self.subgraphs[doc.url]._transforms, doc)))
+          return self._map_concurrent(
+            lambda doc: transform_doc(self.subgraphs[doc.url]._fused_transforms(), doc),
+            req.documents
+          )
         case [transform, *rest]:
           new_req = transform.transform_request(req)
           data = transform_req(rest, new_req)
@@ -221,7 +294,16 @@ class Subgrounds:
         | where(lambda sg: sg._url == doc.url)
       )
       if pagination_strategy is not None and subgraph._is_subgraph:
-        yield from paginate_iter(subgraph._schema, doc, pagination_strategy=pagination_strategy)
+        yield from paginate_iter(
+          subgraph._schema,
+          doc,
+          pagination_strategy=pagination_strategy,
+          prefetch_depth=self.prefetch_depth,
+          checkpoint_path=self._checkpoint_path(doc),
+          checkpoint_every=self.checkpoint_every,
+          progress=self.progress,
+          probe=self.probe_progress
+        )
       else:
         yield client.query(doc.url, doc.graphql, variables=doc.variables)
 
@@ -239,7 +321,7 @@ class Subgrounds:
       match transforms:
         case []:
           for doc in req.documents:
-            yield from transform_doc(self.subgraphs[doc.url]._transforms, doc)
+            yield from transform_doc(self.subgraphs[doc.url]._fused_transforms(), doc)
         case [transform, *rest]:
           new_req = transform.transform_request(req)
           for data in transform_req(rest, new_req):
@@ -247,6 +329,42 @@ class Subgrounds:
 
     yield from transform_req(self.global_transforms, req)
 
+  def explain(
+    self,
+    req: DataRequest,
+    pagination_strategy: Optional[Type[PaginationStrategy]] = LegacyStrategy
+  ) -> list[Explanation]:
+    """ Estimates the cost (number of requests, entities and bytes) of executing
+    the :class:`DataRequest` object ``req`` without executing it (see
+    :func:`subgrounds.pagination.explain`). The estimates are made on the
+    documents that would actually be executed, i.e.: after all transforms
+    have been applied.
+
+    Args:
+      req (DataRequest): The :class:`DataRequest` object to be explained
+      pagination_strategy (Optional[Type[PaginationStrategy]], optional): A Class
+        implementing the :class:`PaginationStrategy` ``Protocol``. If ``None``, then
+        automatic pagination is disabled. Defaults to :class:`LegacyStrategy`.
+
+    Returns:
+      list[Explanation]: The estimated cost of each document to be executed
+    """
+    for transform in self.global_transforms:
+      req = transform.transform_request(req)
+
+    def explain_document(doc: Document) -> Explanation:
+      subgraph = self.subgraphs[doc.url]
+      for transform in subgraph._transforms:
+        doc = transform.transform_document(doc)
+
+      return explain(
+        subgraph._schema,
+        doc,
+        pagination_strategy if subgraph._is_subgraph else None
+      )
+
+    return list(req.documents | map(explain_document))
+
   def query_json(
     self,
     fpaths: FieldPath | list[FieldPath],
@@ -304,7 +422,8 @@ class Subgrounds:
     fpaths: FieldPath | list[FieldPath],
     columns: Optional[list[str]] = None,
     concat: bool = False,
-    pagination_strategy: Optional[Type[PaginationStrategy]] = LegacyStrategy
+    pagination_strategy: Optional[Type[PaginationStrategy]] = LegacyStrategy,
+    memory_budget: Optional[int] = None
   ) -> pd.DataFrame | list[pd.DataFrame]:
     """Same as :func:`Subgrounds.query` but formats the response data into a
     Pandas DataFrame. If the response data cannot be flattened to a single query
@@ -323,6 +442,14 @@ class Subgrounds:
     as well as the same column names and types (the names can be set using the
     ``columns`` argument).
 
+    ``memory_budget`` bounds the memory used by the response data (in bytes, as
+    pickled data). If set, pages of response data beyond the budget are
+    spilled to a file in :attr:`spill_dir` (see :class:`PageSpill`) instead of
+    being kept in memory, and the DataFrames are built chunk by chunk while
+    streaming the pages back from disk. Entities spanning several pages are
+    merged as when the budget is not set (see :func:`PageSpill.iter_merged`),
+    so the resulting DataFrames are the same.
+
     Args:
       fpaths (FieldPath | list[FieldPath]): One or more `FieldPath` objects that
         should be included in the request.
@@ -331,6 +458,8 @@ class Subgrounds:
       pagination_strategy (Optional[Type[PaginationStrategy]], optional): A Class
         implementing the :class:`PaginationStrategy` ``Protocol``. If ``None``, then
         automatic pagination is disabled. Defaults to :class:`LegacyStrategy`.
+      memory_budget (Optional[int], optional): Maximum size of the response data
+        kept in memory (in bytes). Defaults to None (i.e.: unbounded).
 
     Returns:
       pd.DataFrame | list[pd.DataFrame]: A DataFrame containing the reponse data
@@ -377,8 +506,31 @@ class Subgrounds:
       | map(FieldPath._auto_select)
       | traverse
     )
-    json_data = self.query_json(fpaths, pagination_strategy=pagination_strategy)
-    return df_of_json(json_data, fpaths, columns, concat)
+    # Synthetic fields are computed on the DataFrame columns of their dependencies
+    query_fpaths = vectorized_fpaths(fpaths)
+    if memory_budget is None:
+      json_data = self.query_json(query_fpaths, pagination_strategy=pagination_strategy)
+      return df_of_json(json_data, fpaths, columns, concat, vectorize=True)
+
+    df_plan = DataFramePlan.of_fpaths(fpaths, columns, vectorize=True)
+    with PageSpill(memory_budget, self.spill_dir) as spill:
+      for page in self.query_json_iter(query_fpaths, pagination_strategy=pagination_strategy):
+        spill.add(page)
+
+      dfs = [df_plan.mk_dfs(chunk, concat) for chunk in spill.iter_merged()]
+
+    def concat_dfs(chunk_dfs: list[pd.DataFrame]) -> pd.DataFrame:
+      # Empty DataFrames are skipped since they would change the columns' dtypes
+      non_empty = [df for df in chunk_dfs if len(df) > 0]
+      return pd.concat(non_empty, ignore_index=True) if non_empty != [] else chunk_dfs[0]
+
+    match dfs:
+      case []:
+        return df_plan.mk_dfs([], concat)
+      case [pd.DataFrame(), *_]:
+        return concat_dfs(dfs)
+      case _:
+        return [concat_dfs(list(chunk_dfs)) for chunk_dfs in zip(*dfs)]
 
   def query_df_iter(
     self,
@@ -404,8 +556,77 @@ class Subgrounds:
       | map(FieldPath._auto_select)
       | traverse
     )
-    for page in self.query_json_iter(fpaths, pagination_strategy=pagination_strategy):
-      yield df_of_json(page, fpaths, None, False)
+    df_plan = DataFramePlan.of_fpaths(fpaths, vectorize=True)
+    for page in self.query_json_iter(vectorized_fpaths(fpaths), pagination_strategy=pagination_strategy):
+      yield df_plan.mk_dfs(page)
+
+  def sync(
+    self,
+    fpaths: FieldPath | list[FieldPath],
+    path: str,
+    store_path: Optional[str] = None,
+    pagination_strategy: Optional[Type[PaginationStrategy]] = LegacyStrategy
+  ) -> pd.DataFrame:
+    """ Incrementally syncs the entities selected by ``fpaths`` to the CSV file
+    ``path``: only the entities added since the previous sync of the same
+    query are queried and appended to the file (which is created on the first sync).
+
+    The last ordering value of each toplevel list field is persisted in the
+    JSON file ``store_path`` (see :class:`subgrounds.sync.WatermarkStore`) once
+    the new entities have been written. The toplevel list fields must be sorted
+    in ascending order, ideally by a strictly increasing field (e.g.: a block
+    number or a timestamp), and not by a ``BigDecimal`` field (whose values are
+    converted to inexact floats by the type transforms).
+
+    Args:
+      fpaths (FieldPath | list[FieldPath]): One or more `FieldPath` objects that
+        should be included in the request
+      path (str): The CSV file to which the new entities are appended
+      store_path (Optional[str], optional): The watermark store. Defaults to
+        ``{path}.watermarks.json``.
+      pagination_strategy (Optional[Type[PaginationStrategy]], optional): A Class
+        implementing the :class:`PaginationStrategy` ``Protocol``. If ``None``, then
+        automatic pagination is disabled. Defaults to :class:`LegacyStrategy`.
+
+    Raises:
+      ValueError: If the response data does not fit in a single DataFrame or if
+        a toplevel list field is sorted in descending order or by a ``BigDecimal``
+        field
+
+    Returns:
+      pd.DataFrame: The new entities
+    """
+    fpaths = list(
+      [fpaths]
+      | traverse
+      | map(FieldPath._auto_select)
+      | traverse
+    )
+    store = WatermarkStore.load(store_path if store_path is not None else f'{path}.watermarks.json')
+    req = self.mk_request(fpaths)
+
+    seeded_req = DataRequest(documents=list(
+      req.documents
+      | map(lambda doc: seed_document(
+        self.subgraphs[doc.url]._schema,
+        doc,
+        store.get(doc.fingerprint)
+      ))
+    ))
+    json_data = self.execute(seeded_req, pagination_strategy=pagination_strategy)
+
+    df = df_of_json(json_data, fpaths, None, concat=False)
+    if type(df) == list:
+      raise ValueError('sync: the selected fields must fit in a single DataFrame')
+
+    if len(df) > 0:
+      df.to_csv(path, mode='a', header=not Path(path).exists(), index=False)
+
+    for doc, data in zip(req.documents, json_data):
+      store.update(doc.fingerprint, watermarks_of_data(self.subgraphs[doc.url]._schema, doc, data))
+    store.save()
+
+    return df
 
   def query(
     self,
@@ -461,14 +682,13 @@ class Subgrounds:
     )
     blob = self.query_json(fpaths, pagination_strategy=pagination_strategy)
 
-    def f(fpath: FieldPath) -> dict[str, Any]:
-      data = fpath._extract_data(blob)
+    def f(data: Any) -> Any:
       if type(data) == list and len(data) == 1 and unwrap:
         return data[0]
       else:
         return data
 
-    data = tuple(fpaths | map(f))
+    data = tuple(FieldPath._extractor(fpaths)(blob) | map(f))
 
     if len(data) == 1:
       return data[0]
@@ -495,8 +715,7 @@ class Subgrounds:
     Returns:
       Iterator[type]: An iterator over the ``FieldPath`` object(s)' data pages
     """
-    def f(fpath: FieldPath, blob: dict[str, Any]) -> dict[str, Any]:
-      data = fpath._extract_data(blob)
+    def f(data: Any) -> Any:
       if type(data) == list and len(data) == 1 and unwrap:
         return data[0]
       else:
@@ -508,10 +727,227 @@ class Subgrounds:
       | map(FieldPath._auto_select)
       | traverse
     )
+    extractor = FieldPath._extractor(fpaths)
     for page in self.query_json_iter(fpaths, pagination_strategy=pagination_strategy):
-      data = tuple(fpaths | map(functools.partial(f, blob=page)))
+      data = tuple(extractor(page) | map(f))
 
       if len(data) == 1:
         yield data[0]
       else:
         yield data
+
+  def prepare(
+    self,
+    fpaths: FieldPath | list[FieldPath],
+    pagination_strategy: Optional[Type[PaginationStrategy]] = LegacyStrategy
+  ) -> PreparedQuery:
+    """Prepares the request corresponding to one or more ``FieldPath`` objects
+    so that it can be executed multiple times without rebuilding the request,
+    transformed documents, pagination plans and DataFrame columns every time.
+
+    Arguments of the ``FieldPath`` objects can be left as variables (using
+    :class:`InputValue.Variable`) whose values are provided when the prepared
+    query is executed. Pagination arguments (i.e.: ``first``, ``skip``,
+    ``orderBy``, ``orderDirection`` and the ``where`` argument as a whole) cannot
+    be variables.
+
+    Args:
+      fpaths (FieldPath | list[FieldPath]): One or more ``FieldPath`` object(s) to query.
+      pagination_strategy (Optional[Type[PaginationStrategy]], optional): A Class
+        implementing the :class:`PaginationStrategy` ``Protocol``. If ``None``, then
+        automatic pagination is disabled. Defaults to :class:`LegacyStrategy`.
+
+    Returns:
+      PreparedQuery: The prepared query
+
+    Example:
+
+    .. code-block:: python
+
+        >>> from subgrounds import Subgrounds
+        >>> from subgrounds.query import InputValue
+        >>> sg = Subgrounds()
+        >>> univ3 = sg.load_subgraph('https://api.thegraph.com/subgraphs/name/uniswap/uniswap-v3')
+
+        >>> swaps = univ3.Query.swaps(
+        ...     orderBy=univ3.Swap.timestamp,
+        ...     orderDirection='desc',
+        ...     first=10,
+        ...     where=[
+        ...         univ3.Swap.pool == InputValue.Variable('pool')
+        ...     ]
+        ... )
+        >>> prepared = sg.prepare([swaps.timestamp, swaps.amountUSD])
+        >>> prepared.run_df({'pool': '0x8ad599c3a0ff1de082011efddc58f1908eb6e6d8'})
+          swaps_timestamp  swaps_amountUSD
+        0       1643213811      1934.284376
+        ...
+    """
+    return PreparedQuery(self, fpaths, pagination_strategy)
+
+
+class PreparedQuery:
+  """ A request that has been prepared once (see :func:`Subgrounds.prepare`) and
+  can be executed many times with different variable bindings.
+
+  Preparing a request caches the auto-selected fieldpaths, the request itself,
+  the chains of transformed requests and documents, the pagination plans of the
+  final documents and the DataFrame plans. Transforms and synthetic fields are
+  therefore captured when the query is prepared.
+  """
+  subgrounds: Subgrounds
+  fpaths: list[FieldPath]
+  pagination_strategy: Optional[Type[PaginationStrategy]]
+  request: DataRequest
+
+  def __init__(
+    self,
+    subgrounds: Subgrounds,
+    fpaths: FieldPath | list[FieldPath],
+    pagination_strategy: Optional[Type[PaginationStrategy]] = LegacyStrategy
+  ) -> None:
+    self.subgrounds = subgrounds
+    self.fpaths = list(
+      [fpaths]
+      | traverse
+      | map(FieldPath._auto_select)
+      | traverse
+    )
+    self.pagination_strategy = pagination_strategy
+    self.request = subgrounds.mk_request(self.fpaths)
+
+    # Chain of requests produced by the global transforms
+    self._global_transforms = list(subgrounds.global_transforms)
+    self._requests = [self.request]
+    for transform in self._global_transforms:
+      self._requests.append(transform.transform_request(self._requests[-1]))
+
+    # Chain of documents produced by the subgraph transforms for each document
+    # of the final request, along with the pagination plans of the final documents
+    self._doc_transforms: list[list[DocumentTransform]] = []
+    self._doc_chains: list[list[Document]] = []
+    self._plans: list[Optional[PaginationPlan]] = []
+    for doc in self._requests[-1].documents:
+      subgraph = subgrounds.subgraphs[doc.url]
+
+      transforms = subgraph._fused_transforms()
+      docs = [doc]
+      for transform in transforms:
+        docs.append(transform.transform_document(docs[-1]))
+
+      self._doc_transforms.append(transforms)
+      self._doc_chains.append(docs)
+
+      if self._paginated(subgraph) and accepts_plan(pagination_strategy):
+        self._plans.append(PaginationPlan.of_document(subgraph._schema, docs[-1]))
+      else:
+        self._plans.append(None)
+
+    self._df_plans: dict[Optional[tuple[str, ...]], DataFramePlan] = {}
+
+  def _paginated(self, subgraph: Subgraph) -> bool:
+    return self.pagination_strategy is not None and subgraph._is_subgraph
+
+  def _document(self, idx: int, variables: dict[str, Any]) -> Document:
+    doc = self._doc_chains[idx][-1]
+    return Document(url=doc.url, query=doc.query, fragments=doc.fragments, variables=variables)
+
+  def _transform_doc_response(self, idx: int, data: dict[str, Any]) -> dict[str, Any]:
+    docs = self._doc_chains[idx]
+    for transform, doc in zip(reversed(self._doc_transforms[idx]), reversed(docs[:-1])):
+      data = transform.transform_response(doc, data)
+    return data
+
+  def _transform_req_response(self, data: list[dict[str, Any]] | dict[str, Any]) -> list[dict[str, Any]] | dict[str, Any]:
+    for transform, req in zip(reversed(self._global_transforms), reversed(self._requests[:-1])):
+      data = transform.transform_response(req, data)
+    return data
+
+  def _execute_document(self, idx: int, variables: dict[str, Any]) -> dict[str, Any]:
+    doc = self._document(idx, variables)
+    subgraph = self.subgrounds.subgraphs[doc.url]
+    if self._paginated(subgraph):
+      return paginate(subgraph._schema, doc, pagination_strategy=self.pagination_strategy, plan=self._plans[idx])
+    else:
+      return client.query(doc.url, doc.graphql, variables=doc.variables)
+
+  def _execute_document_iter(self, idx: int, variables: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    doc = self._document(idx, variables)
+    subgraph = self.subgrounds.subgraphs[doc.url]
+    if self._paginated(subgraph):
+      yield from paginate_iter(
+        subgraph._schema,
+        doc,
+        pagination_strategy=self.pagination_strategy,
+        plan=self._plans[idx],
+        prefetch_depth=self.subgrounds.prefetch_depth,
+        checkpoint_path=self.subgrounds._checkpoint_path(doc),
+        checkpoint_every=self.subgrounds.checkpoint_every,
+        progress=self.subgrounds.progress,
+        probe=self.subgrounds.probe_progress
+      )
+    else:
+      yield client.query(doc.url, doc.graphql, variables=doc.variables)
+
+  def run(self, variables: Optional[dict[str, Any]] = None) -> list[dict[str, Any]]:
+    """ Executes the prepared query with the variable bindings :attr:`variables`
+    and returns the response data (see :func:`Subgrounds.query_json`).
+
+    Args:
+      variables (Optional[dict[str, Any]], optional): Values of the query's
+        variables. Defaults to None.
+
+    Returns:
+      list[dict[str, Any]]: The reponse data
+    """
+    if variables is None:
+      variables = {}
+
+    data = self.subgrounds._map_concurrent(
+      lambda idx: self._transform_doc_response(idx, self._execute_document(idx, variables)),
+      list(range(len(self._doc_chains)))
+    )
+    return self._transform_req_response(data)
+
+  def iter(self, variables: Optional[dict[str, Any]] = None) -> Iterator[dict[str, Any]]:
+    """ Same as :func:`PreparedQuery.run` except an iterator over the response
+    data pages is returned (see :func:`Subgrounds.query_json_iter`).
+
+    Args:
+      variables (Optional[dict[str, Any]], optional): Values of the query's
+        variables. Defaults to None.
+
+    Returns:
+      Iterator[dict[str, Any]]: An iterator over the reponse data pages
+    """
+    if variables is None:
+      variables = {}
+
+    for idx in range(len(self._doc_chains)):
+      for page in self._execute_document_iter(idx, variables):
+        yield self._transform_req_response(self._transform_doc_response(idx, page))
+
+  def run_df(
+    self,
+    variables: Optional[dict[str, Any]] = None,
+    columns: Optional[list[str]] = None,
+    concat: bool = False
+  ) -> pd.DataFrame | list[pd.DataFrame]:
+    """ Same as :func:`PreparedQuery.run` but formats the response data into
+    Pandas DataFrame(s) (see :func:`Subgrounds.query_df`).
+
+    Args:
+      variables (Optional[dict[str, Any]], optional): Values of the query's
+        variables. Defaults to None.
+      columns (Optional[list[str]], optional): The column labels. Defaults to None.
+      concat (bool, optional): Whether or not to concatenate the resulting
+        dataframes. Defaults to False.
+
+    Returns:
+      pd.DataFrame | list[pd.DataFrame]: A DataFrame containing the reponse data
+    """
+    key = tuple(columns) if columns is not None else None
+    if key not in self._df_plans:
+      self._df_plans[key] = DataFramePlan.of_fpaths(self.fpaths, columns)
+
+    return self._df_plans[key].mk_dfs(self.run(variables), concat)
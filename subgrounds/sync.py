@@ -0,0 +1,161 @@
+""" Incremental sync module
+
+This module contains the helpers used by :func:`Subgrounds.sync` to only query
+the entities added since the previous sync of a query. The last ordering value
+(i.e.: the value of the ``orderBy`` field of the last entity) of each toplevel
+list field is persisted in a :class:`WatermarkStore`, keyed by the fingerprint
+of the query document (see :attr:`Document.fingerprint`) and by the key of the
+list field. Later syncs add a ``{orderBy}_gt`` filter with that value to the
+list field, which seeds the pagination's initial filter value.
+
+Since the filter is strict, entities added after a sync with the *same* ordering
+value as the watermark are skipped. Syncs should therefore order entities by a
+strictly increasing field when possible.
+
+Watermarks are read from the response data after the type transforms have been
+applied. ``BigDecimal`` values are converted to (inexact) floats, so list fields
+ordered by a ``BigDecimal`` field cannot be synced.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from pipe import map
+
+from subgrounds.pagination.preprocess import (
+  get_filtering_arg,
+  get_orderBy_value,
+  get_orderDirection_value,
+  is_pagination_node
+)
+from subgrounds.query import Argument, Document, InputValue, Query, Selection
+from subgrounds.schema import SchemaMeta, TypeRef
+
+
+@dataclass
+class WatermarkStore:
+  """ Local store of the watermarks (i.e.: last ordering values) of synced queries,
+  persisted as a JSON file.
+
+  Attributes:
+    path (Path): Location of the JSON file
+    watermarks (dict[str, dict[str, Any]]): Watermarks of each toplevel list
+      field (by key) of each document (by fingerprint)
+  """
+  path: Path
+  watermarks: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+  @staticmethod
+  def load(path: str | Path) -> WatermarkStore:
+    path = Path(path)
+    if path.exists():
+      with open(path) as f:
+        return WatermarkStore(path=path, watermarks=json.load(f))
+    else:
+      return WatermarkStore(path=path)
+
+  def get(self, fingerprint: str) -> dict[str, Any]:
+    return self.watermarks.get(fingerprint, {})
+
+  def update(self, fingerprint: str, watermarks: dict[str, Any]) -> None:
+    self.watermarks[fingerprint] = self.get(fingerprint) | watermarks
+
+  def save(self) -> None:
+    tmp_path = self.path.with_name(f'{self.path.name}.tmp')
+    with open(tmp_path, mode='w') as f:
+      json.dump(self.watermarks, f)
+    os.replace(tmp_path, self.path)
+
+
+def input_value_of_watermark(type_: TypeRef.T, value: Any) -> InputValue:
+  """ Returns the input value of the watermark ``value`` for a filter of type
+  ``type_``. Watermarks are taken from the response data, so they may have been
+  converted by type transforms (e.g.: ``BigInt`` values to ``int``).
+  """
+  match TypeRef.root_type_name(type_):
+    case 'Int':
+      return InputValue.Int(int(value))
+    case 'Float':
+      return InputValue.Float(float(value))
+    case _:
+      return InputValue.String(str(value))
+
+
+def seed_document(schema: SchemaMeta, doc: Document, watermarks: dict[str, Any]) -> Document:
+  """ Returns a copy of ``doc`` in which the toplevel list fields with a watermark
+  in ``watermarks`` only select the entities whose ordering value is greater
+  than the watermark.
+
+  Raises:
+    ValueError: If a toplevel list field is sorted in descending order or by a
+      ``BigDecimal`` field
+
+  Returns:
+    Document: The seeded document
+  """
+  def seed(select: Selection) -> Selection:
+    if not is_pagination_node(schema, select):
+      return select
+
+    if get_orderDirection_value(select) != 'asc':
+      raise ValueError(f'sync: list field {select.key} must be sorted in ascending order')
+
+    filtering_arg = get_filtering_arg(select)
+    where_type = schema.type_of_typeref(select.fmeta.type_of_arg('where'))
+    filter_type = where_type.type_of_input_field(filtering_arg)
+
+    if TypeRef.root_type_name(filter_type) == 'BigDecimal':
+      raise ValueError(
+        f'sync: list field {select.key} cannot be sorted by BigDecimal field {get_orderBy_value(select)}'
+      )
+
+    if select.key not in watermarks:
+      return select
+
+    where_arg = select.find_args(lambda arg: arg.name == 'where', recurse=False)
+    where_value = where_arg.value.value if where_arg is not None else {}
+    filter_value = input_value_of_watermark(filter_type, watermarks[select.key])
+
+    return Selection(
+      fmeta=select.fmeta,
+      alias=select.alias,
+      arguments=[
+        *[arg for arg in select.arguments if arg.name != 'where'],
+        Argument(name='where', value=InputValue.Object(where_value | {filtering_arg: filter_value}))
+      ],
+      selection=select.selection
+    )
+
+  return Document(
+    url=doc.url,
+    query=Query(
+      name=doc.query.name,
+      selection=list(doc.query.selection | map(seed)),
+      variables=doc.query.variables
+    ),
+    fragments=doc.fragments,
+    variables=doc.variables
+  )
+
+
+def watermarks_of_data(schema: SchemaMeta, doc: Document, data: dict[str, Any]) -> dict[str, Any]:
+  """ Returns the watermarks of the toplevel list fields of ``doc`` given the
+  response data ``data``, i.e.: the ordering value of the last entity of each
+  list field. List fields without entities are omitted.
+  """
+  watermarks = {}
+  for select in doc.query.selection:
+    if not is_pagination_node(schema, select):
+      continue
+
+    entities = data.get(select.key) or []
+    order_by = get_orderBy_value(select)
+    if len(entities) > 0 and entities[-1].get(order_by) is not None:
+      watermarks[select.key] = entities[-1][order_by]
+
+  return watermarks
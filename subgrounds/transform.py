@@ -14,22 +14,30 @@ respectively (see the actual transforms in ``DEFAULT_SUBGRAPH_TRANSFORMS``).
 Transforms are also used to apply :class:`SyntheticField` to queries and the
 response data (see :class:`LocalSyntheticField` transform class). Each
 :class:`SyntheticField` defined on a subgraph creates a new transformation layer
-by instantiating a new :class:`LocalSyntheticField` object.
+by instantiating a new :class:`LocalSyntheticField` object. When executing
+queries, consecutive synthetic field and type transforms are combined in a
+single :class:`FusedTransform` (see :func:`fuse_transforms`) so that the
+response data is only walked once.
 """
 
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import Any, Callable, TYPE_CHECKING
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, TYPE_CHECKING
 from functools import partial
 from pipe import map, traverse
 import logging
+from threading import Lock
 
-from subgrounds.query import DataRequest, Document, Query, Selection
+from subgrounds.pagination.utils import DEFAULT_NUM_ENTITIES
+from subgrounds.query import Argument, DataRequest, Document, InputValue, Query, Selection
 from subgrounds.schema import TypeMeta, TypeRef
+from subgrounds.subgraph.expr import compile_exprs
 from subgrounds.utils import flatten, union
 
 if TYPE_CHECKING:
-  from subgrounds.subgraph import Subgraph
+  from subgrounds.subgraph import Subgraph, SyntheticField
 
 logger = logging.getLogger('subgrounds')
 
@@ -215,6 +223,9 @@ class LocalSyntheticField(DocumentTransform):
       exceptions (e.g.: division by zero)
     args (list[Selection]): The selections of the fields used as arguments to
       compute the synthetic field
+    sfield (Optional[SyntheticField]): The synthetic field definition (if any),
+      whose expression tree allows evaluating the field on whole DataFrame
+      columns (see :func:`subgrounds.dataframe_utils.synthetic_column`)
   """
   subgraph: Subgraph
   fmeta: TypeMeta.FieldMeta
@@ -222,6 +233,7 @@ class LocalSyntheticField(DocumentTransform):
   f: Callable
   default: Any
   args: list[Selection]
+  sfield: Optional[SyntheticField]
 
   def __init__(
     self,
@@ -230,7 +242,8 @@ class LocalSyntheticField(DocumentTransform):
     type_: TypeMeta.ObjectMeta | TypeMeta.InterfaceMeta,
     f: Callable,
     default: Any,
-    args: list[Selection]
+    args: list[Selection],
+    sfield: Optional[SyntheticField] = None
   ) -> None:
     self.subgraph = subgraph
     self.fmeta = fmeta
@@ -238,6 +251,7 @@ class LocalSyntheticField(DocumentTransform):
     self.f = f
     self.default = default
     self.args = args
+    self.sfield = sfield
 
   def transform_document(self, doc: Document) -> Document:
     def transform(select: Selection) -> Selection | list[Selection]:
@@ -350,6 +364,309 @@ class LocalSyntheticField(DocumentTransform):
     return data
 
 
+@dataclass(frozen=True)
+class SyntheticFieldsProgram:
+  """ Synthetic fields of an object compiled into a single function (see
+  :func:`compile_exprs`). The arguments shared by several synthetic fields are
+  only extracted once, and so are their common sub-expressions computed once.
+
+  Attributes:
+    keys (list[str]): Keys of the synthetic fields, in order of evaluation
+    args (list[Selection]): Selections of the (deduplicated) arguments
+    f (Callable[..., tuple]): Function computing the values of the synthetic
+      fields given the values of the arguments
+  """
+  keys: list[str]
+  args: list[Selection]
+  f: Callable[..., tuple]
+
+  @staticmethod
+  def of_synthetic_fields(synthetic: list[tuple[str, LocalSyntheticField]]) -> Optional[SyntheticFieldsProgram]:
+    """ Compiles the synthetic fields ``synthetic`` (keys and transforms, in
+    order of evaluation). Synthetic fields used as arguments of later synthetic
+    fields are passed to them directly. Returns ``None`` if a synthetic field
+    has no expression (i.e.: its transform was not created from a
+    :class:`SyntheticField`).
+    """
+    if any(transform.sfield is None for (_, transform) in synthetic):
+      return None
+
+    arg_indices: dict[str, int] = {}
+    args: list[Selection] = []
+    results: dict[str, int] = {}
+    refs: list[list[tuple[str, int]]] = []
+    for (key, transform) in synthetic:
+      sfield_refs = []
+      for (dep, arg) in zip(transform.sfield._deps, transform.args):
+        name = dep._name(use_aliases=True)
+        if len(dep._path) == 1 and name in results:
+          sfield_refs.append(('result', results[name]))
+        else:
+          if name not in arg_indices:
+            arg_indices[name] = len(args)
+            args.append(arg)
+          sfield_refs.append(('arg', arg_indices[name]))
+
+      refs.append(sfield_refs)
+      results[transform.fmeta.name] = len(results)
+
+    exprs = [
+      transform.sfield._expr.remap([idx if kind == 'arg' else len(args) + idx for (kind, idx) in sfield_refs])
+      for ((_, transform), sfield_refs) in zip(synthetic, refs)
+    ]
+
+    return SyntheticFieldsProgram(
+      keys=[key for (key, _) in synthetic],
+      args=args,
+      f=compile_exprs(exprs, len(args), [transform.default for (_, transform) in synthetic])
+    )
+
+  def run(self, data: dict[str, Any]) -> None:
+    arg_values = flatten(list(self.args | map(partial(select_data, data=data))))
+    for (key, value) in zip(self.keys, self.f(*arg_values)):
+      if key not in data:
+        data[key] = value
+
+
+@dataclass(frozen=True)
+class FusedNode:
+  """ Node of the visitor compiled by :class:`FusedTransform` for a document.
+
+  Attributes:
+    key (str): Key of the selection in the response data
+    convert (Optional[Callable[[Any], Any]]): Type conversion of the values of
+      scalar selections (if any)
+    children (list[FusedNode]): Nodes of the inner selections (if any)
+    synthetic (list[tuple[str, LocalSyntheticField]]): Synthetic fields (and their
+      keys) to compute on the selected objects, in order of evaluation
+    program (Optional[SyntheticFieldsProgram]): The compiled synthetic fields
+      (if they can be compiled)
+    fill (bool): Whether or not missing values are filled in (i.e.: missing
+      scalars are set to ``None`` and ``None`` objects are replaced by objects
+      whose fields are filled in), as done by :class:`LocalSyntheticField`
+  """
+  key: str
+  convert: Optional[Callable[[Any], Any]] = None
+  children: list[FusedNode] = field(default_factory=list)
+  synthetic: list[tuple[str, LocalSyntheticField]] = field(default_factory=list)
+  program: Optional[SyntheticFieldsProgram] = None
+  fill: bool = False
+
+  @property
+  def is_leaf(self) -> bool:
+    return self.children == [] and self.synthetic == []
+
+  def visit(self, data: dict[str, Any]) -> None:
+    if self.is_leaf:
+      if self.key not in data:
+        if self.fill:
+          data[self.key] = None
+      elif self.convert is not None:
+        match data[self.key]:
+          case list() as values:
+            data[self.key] = [self.convert(value) if value is not None else None for value in values]
+          case None:
+            pass
+          case value:
+            data[self.key] = self.convert(value)
+      return
+
+    match data.get(self.key):
+      case list() as elts:
+        for elt in elts:
+          self.visit_object(elt)
+      case dict() as elt:
+        self.visit_object(elt)
+      case None:
+        if self.fill:
+          data[self.key] = {}
+          self.visit_object(data[self.key])
+      case value:
+        raise Exception(f"FusedTransform: data for selection {self.key} is neither list or dict {value}")
+
+  def visit_object(self, data: dict[str, Any]) -> None:
+    for child in self.children:
+      child.visit(data)
+
+    if self.program is not None:
+      self.program.run(data)
+      return
+
+    for (key, sfield) in self.synthetic:
+      if key not in data:
+        arg_values = flatten(list(sfield.args | map(partial(select_data, data=data))))
+        try:
+          data[key] = sfield.f(*arg_values)
+        except Exception:
+          data[key] = sfield.default
+
+
+# Maximum number of visitors cached by each `FusedTransform`
+VISITOR_CACHE_SIZE = 256
+
+
+class FusedTransform(DocumentTransform):
+  """ Transform combining consecutive :class:`LocalSyntheticField` and
+  :class:`TypeTransform` transforms, such that the response data is walked
+  once instead of once per transform.
+
+  For each document, a visitor (see :class:`FusedNode`) is compiled (and cached,
+  least recently used visitors being evicted once :attr:`VISITOR_CACHE_SIZE`
+  visitors are cached) which, at each node of the response data, converts the scalar values and then
+  computes the synthetic fields of the node's object. The result is the same as
+  applying the transforms one after the other, which requires the synthetic
+  fields to come before the type transforms (as in subgraphs' transforms,
+  see :func:`fuse_transforms`).
+
+  Attributes:
+    synthetic_fields (list[LocalSyntheticField]): The synthetic field transforms
+    type_transforms (list[TypeTransform]): The type transforms
+  """
+  synthetic_fields: list[LocalSyntheticField]
+  type_transforms: list[TypeTransform]
+
+  def __init__(self, transforms: list[LocalSyntheticField | TypeTransform]) -> None:
+    self.synthetic_fields = []
+    self.type_transforms = []
+    for transform in transforms:
+      match transform:
+        case LocalSyntheticField() if self.type_transforms == []:
+          self.synthetic_fields.append(transform)
+        case TypeTransform():
+          self.type_transforms.append(transform)
+        case _:
+          raise ValueError(f'FusedTransform: cannot fuse transform {transform}')
+
+    # Type conversions by type name, composed in the order in which the
+    # (nested) transforms would apply them, i.e.: innermost first
+    self.converters: dict[str, Callable[[Any], Any]] = {}
+    for transform in reversed(self.type_transforms):
+      name = TypeRef.root_type_name(transform.type_)
+      match self.converters.get(name):
+        case None:
+          self.converters[name] = transform.f
+        case prev_f:
+          self.converters[name] = lambda value, f=transform.f, prev_f=prev_f: f(prev_f(value))
+
+    self._visitors: OrderedDict[tuple[str, str], list[FusedNode]] = OrderedDict()
+    self._visitors_lock = Lock()
+    super().__init__()
+
+  def transform_document(self, doc: Document) -> Document:
+    for transform in self.synthetic_fields:
+      doc = transform.transform_document(doc)
+    return doc
+
+  def compile(self, doc: Document) -> list[FusedNode]:
+    """ Returns the visitor (i.e.: the nodes of the toplevel selections) of the
+    response data of the document ``doc``.
+    """
+    sfields = [sfield for sfield in self.synthetic_fields if sfield.subgraph._url == doc.url]
+    sfields_by_name = {(sfield.type_.name, sfield.fmeta.name): sfield for sfield in sfields}
+    sfield_types = {sfield.type_.name for sfield in sfields}
+
+    def synthetic(type_name: str, leaves: list[Selection]) -> list[tuple[str, LocalSyntheticField]]:
+      keys = {
+        select.fmeta.name: select.key
+        for select in leaves
+        if (type_name, select.fmeta.name) in sfields_by_name
+      }
+
+      # Synthetic fields used as arguments of other synthetic fields are computed too
+      todo = list(keys)
+      while todo != []:
+        for arg in sfields_by_name[(type_name, todo.pop())].args:
+          if arg.selection == [] and (type_name, arg.fmeta.name) in sfields_by_name and arg.fmeta.name not in keys:
+            keys[arg.fmeta.name] = arg.key
+            todo.append(arg.fmeta.name)
+
+      # The innermost transforms (i.e.: the last ones) are evaluated first
+      return [
+        (keys[sfield.fmeta.name], sfield)
+        for sfield in reversed(sfields)
+        if sfield.type_.name == type_name and sfield.fmeta.name in keys
+      ]
+
+    def mk_node(select: Selection, initial_select: Optional[Selection], fill: bool) -> FusedNode:
+      type_name = TypeRef.root_type_name(select.fmeta.type_)
+      # Objects whose only selected fields are synthetic fields without arguments
+      # have no inner selections left in the transformed document
+      if select.selection == [] and (initial_select is None or initial_select.selection == []):
+        return FusedNode(key=select.key, convert=self.converters.get(type_name), fill=fill)
+
+      fill = fill or type_name in sfield_types
+      initial_inner = {inner.key: inner for inner in initial_select.selection} if initial_select is not None else {}
+      node_synthetic = synthetic(type_name, [inner for inner in initial_inner.values() if inner.selection == []])
+      return FusedNode(
+        key=select.key,
+        children=[mk_node(inner, initial_inner.get(inner.key), fill) for inner in select.selection],
+        synthetic=node_synthetic,
+        program=SyntheticFieldsProgram.of_synthetic_fields(node_synthetic) if node_synthetic != [] else None,
+        fill=fill
+      )
+
+    new_doc = self.transform_document(doc)
+    initial_toplevel = {select.key: select for select in doc.query.selection}
+    return [mk_node(select, initial_toplevel.get(select.key), False) for select in new_doc.query.selection]
+
+  def transform_response(self, doc: Document, data: dict[str, Any]) -> dict[str, Any]:
+    key = (doc.url, doc.graphql)
+    with self._visitors_lock:
+      visitor = self._visitors.get(key)
+      if visitor is not None:
+        self._visitors.move_to_end(key)
+
+    if visitor is None:
+      visitor = self.compile(doc)
+      with self._visitors_lock:
+        self._visitors[key] = visitor
+        while len(self._visitors) > VISITOR_CACHE_SIZE:
+          self._visitors.popitem(last=False)
+
+    for node in visitor:
+      node.visit(data)
+
+    return data
+
+
+def fuse_transforms(transforms: list[DocumentTransform]) -> list[DocumentTransform]:
+  """ Replaces the runs of consecutive synthetic field transforms followed by
+  type transforms in ``transforms`` by a single :class:`FusedTransform` each.
+  Other transforms are left as is.
+
+  Args:
+    transforms (list[DocumentTransform]): The document transforms (e.g.: a
+      subgraph's transforms)
+
+  Returns:
+    list[DocumentTransform]: The equivalent list of document transforms
+  """
+  fused: list[DocumentTransform] = []
+  run: list[LocalSyntheticField | TypeTransform] = []
+
+  def flush() -> None:
+    if len(run) > 1:
+      fused.append(FusedTransform(list(run)))
+    else:
+      fused.extend(run)
+    run.clear()
+
+  for transform in transforms:
+    if type(transform) is TypeTransform:
+      run.append(transform)
+    elif type(transform) is LocalSyntheticField:
+      # Synthetic fields following type transforms start a new run
+      if any(type(t) is TypeTransform for t in run):
+        flush()
+      run.append(transform)
+    else:
+      flush()
+      fused.append(transform)
+
+  flush()
+  return fused
+
+
 # TODO: Decide if necessary
 class SplitTransform(RequestTransform):
   def __init__(self, query: Query) -> None:
@@ -359,8 +676,8 @@ class SplitTransform(RequestTransform):
     def split(doc: Document) -> list[Document]:
       if Query.contains(doc.query, self.query):
         return [
-          Document(doc.url, Query.remove(doc.query, self.query), doc.fragments),
-          Document(doc.url, Query.select(doc.query, self.query), doc.fragments)
+          Document(doc.url, Query.remove(doc.query, self.query), doc.fragments, doc.variables),
+          Document(doc.url, Query.select(doc.query, self.query), doc.fragments, doc.variables)
         ]
       else:
         return [doc]
@@ -369,7 +686,6 @@ class SplitTransform(RequestTransform):
       documents=list(req.documents | map(split) | traverse)
     )
 
-  # TODO: Fix transform_response
   def transform_response(self, req: DataRequest, data: list[dict[str, Any]]) -> list[dict[str, Any]]:
 
     def merge_data(data1: dict | list | Any, data2: dict | list | Any) -> dict | list | Any:
@@ -398,6 +714,10 @@ class SplitTransform(RequestTransform):
         case ([doc, *docs_rest], [d1, d2, *data_rest]) if Query.contains(doc.query, self.query):
           return transform(docs_rest, data_rest, [*acc, merge_data(d1, d2)])
 
+        # Documents that do not contain the query were not split
+        case ([_, *docs_rest], [d, *data_rest]):
+          return transform(docs_rest, data_rest, [*acc, d])
+
         case ([], []):
           return acc
 
@@ -406,6 +726,161 @@ class SplitTransform(RequestTransform):
     return transform(req.documents, data, [])
 
 
+def selection_cost(select: Selection) -> int:
+  """ Returns a rough estimate of the cost of querying the selection :attr:`select`,
+  i.e.: the number of entities that will be returned. The number of entities
+  of list fields is the value of their ``first`` argument (or
+  :attr:`DEFAULT_NUM_ENTITIES` if it is not set).
+
+  Args:
+    select (Selection): The selection
+
+  Returns:
+    int: The estimated cost of the selection
+  """
+  if select.selection == []:
+    return 0
+
+  if select.fmeta.type_.is_list:
+    first_arg = select.find_args(lambda arg: arg.name == 'first', recurse=False)
+    match first_arg:
+      case Argument(value=InputValue.Int(value=first)):
+        num_entities = first
+      case _:
+        num_entities = DEFAULT_NUM_ENTITIES
+  else:
+    num_entities = 1
+
+  return num_entities * (1 + sum(select.selection | map(selection_cost)))
+
+
+class QueryPlanner(RequestTransform):
+  """ Request transform that splits the documents of a request into independent
+  documents along their toplevel fields, so that they can be executed (and
+  paginated) separately, and merges the responses back into the shape of the
+  original documents.
+
+  If :attr:`max_cost` is ``None``, each toplevel field is queried in its own
+  document. Otherwise, consecutive toplevel fields are grouped in the same
+  document as long as the total estimated cost of the group (see :attr:`cost`)
+  does not exceed :attr:`max_cost`.
+
+  Used with ``Subgrounds(max_workers=N)``, the resulting documents are executed
+  concurrently.
+
+  Args:
+    max_cost (Optional[int], optional): Maximum estimated cost of a document.
+      Defaults to None.
+    cost (Callable[[Selection], int], optional): Function estimating the cost of
+      a toplevel selection. Defaults to :func:`selection_cost`.
+  """
+  max_cost: Optional[int]
+  cost: Callable[[Selection], int]
+
+  def __init__(
+    self,
+    max_cost: Optional[int] = None,
+    cost: Callable[[Selection], int] = selection_cost
+  ) -> None:
+    self.max_cost = max_cost
+    self.cost = cost
+
+  def group_selections(self, selections: list[Selection]) -> list[list[Selection]]:
+    if self.max_cost is None:
+      return [[select] for select in selections]
+
+    groups: list[list[Selection]] = []
+    group_cost = 0
+    for select in selections:
+      select_cost = self.cost(select)
+      if groups == [] or group_cost + select_cost > self.max_cost:
+        groups.append([select])
+        group_cost = select_cost
+      else:
+        groups[-1].append(select)
+        group_cost = group_cost + select_cost
+
+    return groups
+
+  def split(self, doc: Document) -> list[Document]:
+    def mk_doc(selections: list[Selection]) -> Document:
+      # Only keep the definitions of the variables used in the sub-document
+      used_vars = set(
+        selections
+        | map(lambda select: list(select.iter_args()))
+        | traverse
+        | map(lambda arg: list(arg.iter_vars()))
+        | traverse
+        | map(lambda var: var.name)
+      )
+
+      return Document(
+        url=doc.url,
+        query=Query(
+          name=doc.query.name,
+          selection=selections,
+          variables=[vardef for vardef in doc.query.variables if vardef.name in used_vars]
+        ),
+        fragments=doc.fragments,
+        variables=doc.variables
+      )
+
+    groups = self.group_selections(doc.query.selection)
+    if len(groups) <= 1:
+      return [doc]
+    else:
+      return list(groups | map(mk_doc))
+
+  def transform_request(self, req: DataRequest) -> DataRequest:
+    return DataRequest(
+      documents=list(req.documents | map(self.split) | traverse)
+    )
+
+  def transform_response(self, req: DataRequest, data: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    # Sub-documents contain distinct toplevel selections of the original document,
+    # so their data can simply be merged in order
+    merged_data = []
+    data_iter = iter(data)
+    for doc in req.documents:
+      doc_data: dict[str, Any] = {}
+      for _ in self.split(doc):
+        doc_data = doc_data | next(data_iter)
+      merged_data.append(doc_data)
+
+    return merged_data
+
+
+class FragmentTransform(DocumentTransform):
+  """ Transform that factors the inner selections repeated in a document's
+  query into named GraphQL fragments (see :func:`Document.extract_fragments`),
+  reducing the size of wide queries. The response data is left unchanged.
+
+  This transform is optional and should be the last transform of a subgraph,
+  e.g.:
+
+  >>> univ3._transforms = [*univ3._transforms, FragmentTransform()]
+
+  Attributes:
+    min_occurrences (int): Minimum number of times an inner selection must be
+      repeated to be extracted
+    min_fields (int): Minimum number of (leaf) fields an inner selection must
+      select to be extracted
+  """
+  min_occurrences: int
+  min_fields: int
+
+  def __init__(self, min_occurrences: int = 2, min_fields: int = 2) -> None:
+    self.min_occurrences = min_occurrences
+    self.min_fields = min_fields
+    super().__init__()
+
+  def transform_document(self, doc: Document) -> Document:
+    return doc.extract_fragments(self.min_occurrences, self.min_fields)
+
+  def transform_response(self, doc: Document, data: dict[str, Any]) -> dict[str, Any]:
+    return data
+
+
 DEFAULT_GLOBAL_TRANSFORMS: list[RequestTransform] = []
 
 DEFAULT_SUBGRAPH_TRANSFORMS: list[DocumentTransform] = [
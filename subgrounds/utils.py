@@ -1,7 +1,10 @@
 """ Utility module for Subgrounds
 """
 
+from functools import lru_cache
 from itertools import filterfalse
+from queue import Full, Queue
+from threading import Event, Thread
 from typing import Any, Callable, Iterator, Optional, Tuple, TypeVar
 
 from pipe import map, Pipe
@@ -94,37 +97,197 @@ def repeat(value: T, n: int) -> list[T]:
   return [value for _ in range(n)]
 
 
+def prefetch(items: Iterator[T], depth: int) -> Iterator[T]:
+  """ Returns an iterator over the items of ``items`` which are produced ahead of
+  time on a background thread, i.e.: while the previous items are consumed. At
+  most ``depth`` items are buffered, after which the background thread waits for
+  items to be consumed. Exceptions raised by ``items`` are re-raised when the
+  corresponding item would have been returned.
+
+  Args:
+    items (Iterator[T]): The items
+    depth (int): Maximum number of items produced ahead of time
+
+  Returns:
+    Iterator[T]: An iterator over the items
+  """
+  done = object()
+  buffer: Queue = Queue(maxsize=depth)
+  stop = Event()
+
+  def put(item: Tuple[Any, Optional[BaseException]]) -> bool:
+    # Wait for space in the buffer unless the consumer stopped iterating
+    while not stop.is_set():
+      try:
+        buffer.put(item, timeout=0.1)
+        return True
+      except Full:
+        pass
+    return False
+
+  def produce() -> None:
+    try:
+      for item in items:
+        if not put((item, None)):
+          return
+      put((done, None))
+    except BaseException as exn:
+      put((None, exn))
+
+  Thread(target=produce, daemon=True).start()
+
+  try:
+    while True:
+      (item, exn) = buffer.get()
+      if exn is not None:
+        raise exn
+      if item is done:
+        return
+      yield item
+  finally:
+    stop.set()
+
+
 # ================================================================
 # Dictionary related utility functions
 # ================================================================
-def extract_data(keys: list[str], data: dict[str, Any] | list[dict[str, Any]]) -> list[Any] | Any:
-  def f(keys: list[str], data: dict | list | Any):
-    match keys:
-      case []:
-        return data
-      case [name, *rest]:
-        match data:
-          case dict():
-            return f(rest, data[name])
-          case list():
-            return list(data | map(lambda row: f(rest, row[name])))
-          case None:
-            return None
-          case _:
-            raise Exception(f"extract_data: unexpected state! path = {keys}, data = {data}")
+def _compile_extractor_node(
+  paths: list[Tuple[int, Tuple[str, ...]]],
+  depth: int = 0
+) -> Tuple[list[int], Callable[[Any], list[Any]]]:
+  """ Compiles the key paths in :attr:`paths` (which all share the same prefix
+  of length :attr:`depth`) into a single closure that walks the data once.
 
-  match data:
-    case dict():
-      return f(keys, data)
-    case list():
+  Args:
+    paths (list[Tuple[int, Tuple[str, ...]]]): Indexed key paths
+    depth (int, optional): Length of the shared prefix. Defaults to 0.
+
+  Returns:
+    Tuple[list[int], Callable[[Any], list[Any]]]: The indices of the paths in
+    the order in which the closure returns their values, and the closure itself.
+  """
+  order = [idx for idx, keys in paths if len(keys) == depth]
+  nterminals = len(order)
+
+  groups: dict[str, list[Tuple[int, Tuple[str, ...]]]] = {}
+  for idx, keys in paths:
+    if len(keys) > depth:
+      groups.setdefault(keys[depth], []).append((idx, keys))
+
+  children: list[Tuple[str, Callable[[Any], list[Any]], int]] = []
+  for name, group in groups.items():
+    child_order, child_f = _compile_extractor_node(group, depth + 1)
+    order.extend(child_order)
+    children.append((name, child_f, len(child_order)))
+
+  nchildren_values = len(order) - nterminals
+  prefix = paths[0][1][:depth]
+
+  def f(data: dict | list | Any) -> list[Any]:
+    values = [data] * nterminals
+    if children == []:
+      return values
+
+    match data:
+      case dict():
+        for name, child_f, _ in children:
+          values.extend(child_f(data[name]))
+      case list():
+        for name, child_f, n in children:
+          rows = [child_f(row[name]) for row in data]
+          if rows == []:
+            values.extend([] for _ in range(n))
+          else:
+            values.extend(list(col) for col in zip(*rows))
+      case None:
+        values.extend([None] * nchildren_values)
+      case _:
+        raise Exception(f"extract_data: unexpected state! path = {list(prefix)}, data = {data}")
+
+    return values
+
+  return order, f
+
+
+@lru_cache(maxsize=1024)
+def compile_extractor(
+  paths: Tuple[Tuple[str, ...], ...]
+) -> Callable[[dict[str, Any] | list[dict[str, Any]]], list[Any]]:
+  """ Compiles the key paths :attr:`paths` into a function which extracts
+  the data of all paths from a response in a single pass. For each path, the
+  returned value is the same as :func:`extract_data` would return.
+
+  Compiled extractors are cached, so repeatedly compiling the same paths is cheap.
+
+  Args:
+    paths (Tuple[Tuple[str, ...], ...]): The key paths to extract
+
+  Returns:
+    Callable[[dict[str, Any] | list[dict[str, Any]]], list[Any]]: Function
+    returning the data of each path in :attr:`paths` (in the same order)
+  """
+  groups: dict[Tuple[str, ...], list[Tuple[int, Tuple[str, ...]]]] = {}
+  for idx, keys in enumerate(paths):
+    groups.setdefault(keys[:1], []).append((idx, keys))
+
+  compiled = [
+    (group, *_compile_extractor_node(group))
+    for group in groups.values()
+  ]
+
+  def extract_group_from_docs(
+    group: list[Tuple[int, Tuple[str, ...]]],
+    order: list[int],
+    f: Callable[[Any], list[Any]],
+    data: list[dict[str, Any]]
+  ) -> Tuple[list[int], list[Any]]:
+    # All paths of a group share the same root key, so documents that do not
+    # contain it can be skipped for the whole group at once
+    root = group[0][1][:1]
+    for doc_data in data:
+      if type(doc_data) == dict and root != () and root[0] not in doc_data:
+        continue
+      try:
+        return order, f(doc_data)
+      except KeyError:
+        break
+
+    # Otherwise, look for each path individually
+    values = []
+    for idx, keys in group:
       for doc_data in data:
         try:
-          return f(keys, doc_data)
+          values.extend(_compile_extractor_node([(idx, keys)])[1](doc_data))
+          break
         except KeyError:
           continue
-      raise Exception(f'extract_data: not found! path = {keys}, data = {data}')
-    case _:
-      raise Exception('extract_data: data is not dict or list')
+      else:
+        raise Exception(f'extract_data: not found! path = {list(keys)}, data = {data}')
+
+    return [idx for idx, _ in group], values
+
+  def extract(data: dict[str, Any] | list[dict[str, Any]]) -> list[Any]:
+    values: list[Any] = [None] * len(paths)
+
+    match data:
+      case dict():
+        for _, order, f in compiled:
+          for idx, value in zip(order, f(data)):
+            values[idx] = value
+      case list():
+        for group, order, f in compiled:
+          for idx, value in zip(*extract_group_from_docs(group, order, f, data)):
+            values[idx] = value
+      case _:
+        raise Exception('extract_data: data is not dict or list')
+
+    return values
+
+  return extract
+
+
+def extract_data(keys: list[str], data: dict[str, Any] | list[dict[str, Any]]) -> list[Any] | Any:
+  return compile_extractor((tuple(keys),))(data)[0]
 
 
 def flatten_dict(data: dict[str, Any], keys: list[str] = []) -> dict:
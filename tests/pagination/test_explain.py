@@ -0,0 +1,113 @@
+from functools import partial
+
+import pytest
+
+from subgrounds.pagination.explain import ExplainWarning, explain
+from subgrounds.pagination.strategies import (FanOutStrategy, LegacyStrategy,
+                                              RangePartitionStrategy,
+                                              ShallowStrategy)
+from subgrounds.pagination.utils import AdaptivePageSize
+from subgrounds.subgrounds import Subgrounds
+
+
+def test_explain_legacy_flat(univ3_subgraph):
+  swaps = univ3_subgraph.Query.swaps(first=2000)
+  req = Subgrounds().mk_request([swaps.id, swaps.timestamp])
+
+  explanation = explain(univ3_subgraph._schema, req.documents[0], LegacyStrategy)
+
+  assert explanation.strategy == 'LegacyStrategy'
+  assert explanation.requests == 3
+  assert explanation.entities == 2000
+  assert explanation.bytes == 2000 * 2 * 40
+  assert explanation.warnings == []
+
+
+def test_explain_legacy_nested(univ3_subgraph):
+  pools = univ3_subgraph.Query.pools(first=10)
+  swaps = pools.swaps(first=1000)
+  req = Subgrounds().mk_request([pools.id, swaps.id])
+
+  with pytest.warns(ExplainWarning):
+    explanation = explain(univ3_subgraph._schema, req.documents[0], LegacyStrategy, warn_threshold=10)
+
+  # Pools are queried one at a time, and their swaps in 2 pages each
+  assert explanation.requests == 10 * 2
+  assert explanation.entities == 10 * (1 + 1000)
+  assert explanation.nodes[0].inner[0].requests == 2
+  assert len(explanation.warnings) == 1
+
+
+def test_explain_shallow_nested(univ3_subgraph):
+  pools = univ3_subgraph.Query.pools(first=10)
+  swaps = pools.swaps(first=1000)
+  req = Subgrounds().mk_request([pools.id, swaps.id])
+
+  with pytest.warns(ExplainWarning):
+    explanation = explain(univ3_subgraph._schema, req.documents[0], ShallowStrategy)
+
+  # Only the first page of swaps of each pool is queried
+  assert explanation.requests == 1
+  assert explanation.entities == 10 * (1 + 900)
+  assert len(explanation.warnings) == 1
+
+
+def test_explain_toplevel(univ3_subgraph, sg):
+  swaps = univ3_subgraph.Query.swaps(first=2000)
+  req = sg.mk_request([swaps.id])
+
+  [explanation] = sg.explain(req)
+  assert explanation.url == univ3_subgraph._url
+  assert explanation.requests == 3
+
+  [explanation] = sg.explain(req, pagination_strategy=None)
+  assert explanation.strategy is None
+  assert explanation.requests == 1
+
+
+def test_explain_partial_strategy(univ3_subgraph):
+  swaps = univ3_subgraph.Query.swaps(first=2000, orderBy='timestamp')
+  req = Subgrounds().mk_request([swaps.id, swaps.timestamp])
+  doc = req.documents[0]
+
+  # Pages contain the (initial) configured number of entities
+  strategy = partial(LegacyStrategy, page_size=AdaptivePageSize(min_size=1000))
+  explanation = explain(univ3_subgraph._schema, doc, strategy)
+  assert explanation.strategy == 'LegacyStrategy'
+  assert explanation.requests == 2
+
+  # The range is probed, then split into windows paginated concurrently
+  strategy = partial(RangePartitionStrategy, num_partitions=4, pin_block=True)
+  explanation = explain(univ3_subgraph._schema, doc, strategy)
+  assert explanation.strategy == 'RangePartitionStrategy'
+  assert explanation.requests == 1 + 4 * 1
+  assert explanation.documents == 4
+  assert explanation.entities == 2000
+
+  with pytest.raises(ValueError):
+    explain(univ3_subgraph._schema, doc, partial(LegacyStrategy, None))
+
+
+def test_explain_multiple_list_fields(univ3_subgraph):
+  mints = univ3_subgraph.Query.mints(first=1000)
+  swaps = univ3_subgraph.Query.swaps(first=2000)
+  req = Subgrounds().mk_request([mints.id, swaps.id])
+  doc = req.documents[0]
+
+  # The fields are paginated one after the other by default
+  explanation = explain(univ3_subgraph._schema, doc, LegacyStrategy)
+  assert explanation.requests == 2 + 3
+  assert explanation.documents == 1
+
+  # Or split into one document per field, paginated concurrently
+  explanation = explain(univ3_subgraph._schema, doc, partial(LegacyStrategy, concurrent_fields=True))
+  assert explanation.requests == 2 + 3
+  assert explanation.documents == 2
+
+
+def test_explain_fan_out(univ3_subgraph):
+  pools = univ3_subgraph.Query.pools(first=10)
+  req = Subgrounds().mk_request([pools.id, pools.swaps(first=1000).id])
+
+  with pytest.raises(ValueError, match='fanned out'):
+    explain(univ3_subgraph._schema, req.documents[0], FanOutStrategy)
@@ -1,8 +1,9 @@
 from typing import Any
 import pytest
-from subgrounds.pagination.preprocess import PaginationNode, generate_pagination_nodes, normalize, prune_doc
+from subgrounds.pagination.preprocess import PaginationNode, PaginationPlan, PrunedDocCache, generate_pagination_nodes, normalize, prune_doc
 from subgrounds.query import Argument, Document, InputValue, Query, Selection, VariableDefinition
 from subgrounds.schema import SchemaMeta, TypeMeta, TypeRef
+from subgrounds.subgrounds import Subgrounds
 
 
 import tests.queries as queries
@@ -982,4 +983,72 @@ def test_prune_doc(
   args: dict[str, Any],
   pruned: Document
 ):
-  assert prune_doc(document, args) == pruned
\ No newline at end of file
+  assert prune_doc(document, args) == pruned
+
+
+def test_normalize_doc_fragments(univ2_subgraph):
+  sg = Subgrounds(subgraphs={univ2_subgraph._url: univ2_subgraph})
+  pairs = univ2_subgraph.Query.pairs(first=10)
+
+  req = sg.mk_request([
+    pairs.token0.id,
+    pairs.token0.symbol,
+    pairs.token1.id,
+    pairs.token1.symbol,
+  ])
+  doc = req.documents[0].extract_fragments()
+  assert len(doc.fragments) == 1
+
+  plan = PaginationPlan.of_document(univ2_subgraph._schema, doc)
+  assert plan.normalized_doc.fragments == doc.fragments
+  assert plan.normalized_doc.used_fragments == doc.fragments
+
+  pruned = prune_doc(plan.normalized_doc, {'first0': 10, 'skip0': 0})
+  assert pruned.used_fragments == doc.fragments
+  assert pruned.graphql.count(f'...{doc.fragments[0].name}') == 2
+
+
+def test_pruned_doc_cache(univ3_subgraph, sg):
+  swaps = univ3_subgraph.Query.swaps(first=2000, orderBy='timestamp')
+  plan = PaginationPlan.of_document(univ3_subgraph._schema, sg.mk_request([swaps.id]).documents[0])
+  cache = PrunedDocCache(plan.normalized_doc)
+
+  first_page = cache.prune({'first0': 900, 'skip0': 0})
+  next_page = cache.prune({'first0': 900, 'skip0': 0, 'lastOrderingValue0': 10})
+  assert first_page == prune_doc(plan.normalized_doc, {'first0': 900, 'skip0': 0})
+  assert next_page == prune_doc(plan.normalized_doc, {'first0': 900, 'skip0': 0, 'lastOrderingValue0': 10})
+
+  # Documents are cached by argument names, regardless of the argument values
+  assert cache.prune({'first0': 100, 'skip0': 0, 'lastOrderingValue0': 20}) is next_page
+  assert len(cache.pruned) == 2
+
+
+def test_pagination_plan_cache(mocker, univ3_subgraph, sg):
+  PaginationPlan.cache_clear()
+  mocker.patch('subgrounds.pagination.preprocess.PLAN_CACHE_SIZE', 2)
+  generate_mock = mocker.patch(
+    'subgrounds.pagination.preprocess.generate_pagination_nodes',
+    wraps=generate_pagination_nodes
+  )
+  schema = univ3_subgraph._schema
+
+  swaps = univ3_subgraph.Query.swaps(first=2000)
+  doc = sg.mk_request([swaps.id]).documents[0]
+  plan = PaginationPlan.of_document(schema, doc)
+
+  # Documents which only differ by their variables share the same plan
+  assert PaginationPlan.of_document(schema, Document(doc.url, doc.query, variables={'foo': 1})) is plan
+  assert generate_mock.call_count == 1
+
+  # Plans are cached per schema
+  other_schema = schema.copy()
+  assert PaginationPlan.of_document(other_schema, doc) is not plan
+  assert generate_mock.call_count == 2
+
+  # Least recently used plans are evicted
+  mints = univ3_subgraph.Query.mints(first=2000)
+  PaginationPlan.of_document(schema, sg.mk_request([mints.id]).documents[0])
+  assert PaginationPlan.of_document(schema, doc) is not plan
+  assert generate_mock.call_count == 4
+
+  PaginationPlan.cache_clear()
@@ -1,11 +1,24 @@
+import json
 from pprint import pprint
 from random import randint
 from typing import Any, Optional, Tuple, Type
 import pytest
+from pipe import map
 
-from subgrounds.pagination.pagination import PaginationStrategy
+from subgrounds.pagination.pagination import (PaginationStrategy,
+                                              paginate_fan_out,
+                                              paginate_split)
 from subgrounds.pagination.preprocess import PaginationNode
-from subgrounds.pagination.strategies import ShallowStrategyArgGenerator, LegacyStrategyArgGenerator, StopPagination
+from subgrounds.pagination.strategies import (FAN_OUT_CHILDREN_KEY,
+                                              FanOutPagination,
+                                              FanOutStrategy,
+                                              LegacyStrategy,
+                                              LegacyStrategyArgGenerator,
+                                              RangePartitionStrategy,
+                                              ShallowStrategyArgGenerator,
+                                              SplitPagination, StopPagination)
+from subgrounds.pagination.utils import SERVER_MAX_FIRST, AdaptivePageSize
+from subgrounds.query import InputValue
 from subgrounds.schema import TypeRef
 
 
@@ -431,4 +444,390 @@ def test_greedy_strategy(
   expected: list[dict[str, Any]]
 ):
   strategy = ShallowStrategyArgGenerator(page_nodes)
-  __test_args(strategy, expected, data_and_exception)
\ No newline at end of file
+  __test_args(strategy, expected, data_and_exception)
+
+
+def test_range_partition_strategy(mocker, univ3_subgraph, sg):
+  swaps = univ3_subgraph.Query.swaps(
+    first=2500,
+    orderBy='timestamp',
+    orderDirection='desc',
+    where={'amountUSD_gt': 10}
+  )
+  doc = sg.mk_request([swaps.id, swaps.timestamp]).documents[0]
+  strategy = RangePartitionStrategy(univ3_subgraph._schema, doc, num_partitions=4)
+
+  # The first query fetches the range of ordering values
+  probe_doc, args = strategy.step()
+  assert args == {}
+  assert list(probe_doc.query.selection | map(lambda select: select.key)) == ['rangeMin', 'rangeMax']
+
+  with pytest.raises(SplitPagination) as exn_info:
+    strategy.step({'rangeMin': [{'timestamp': '1000'}], 'rangeMax': [{'timestamp': '2000'}]})
+
+  # Windows are in descending order and the outer windows are unbounded
+  split = exn_info.value
+  assert list(split.documents | map(lambda doc: doc.variables)) == [
+    {'rangeLow': '1750'},
+    {'rangeLow': '1500', 'rangeHigh': '1750'},
+    {'rangeLow': '1250', 'rangeHigh': '1500'},
+    {'rangeHigh': '1250'},
+  ]
+  assert (split.key, split.first) == (swaps._name(use_aliases=True), 2500)
+
+  # The windows' data is concatenated in order and truncated
+  firsts = []
+
+  def paginate_pages(schema, doc, pagination_strategy):
+    [select] = doc.query.selection
+    firsts.append(select.find_args(lambda arg: arg.name == 'first', recurse=False).value.value)
+    low = int(doc.variables.get('rangeLow', 1000))
+    yield ({split.key: [{'id': str(i)} for i in range(low + 999, low - 1, -1)]}, None)
+
+  mocker.patch('subgrounds.pagination.pagination.paginate_pages', side_effect=paginate_pages)
+  data = list(paginate_split(univ3_subgraph._schema, split))
+
+  assert len(data) == 3
+  assert list(data | map(lambda data: len(data[split.key]))) == [1000, 1000, 500]
+
+  # Windows only select the entities still missing when they are started, and
+  # no window is started once enough entities have been returned
+  firsts.clear()
+  split.max_workers = 1
+  data = list(paginate_split(univ3_subgraph._schema, split))
+
+  assert list(data | map(lambda data: len(data[split.key]))) == [1000, 1000, 500]
+  assert firsts == [2500, 1500, 500]
+
+
+def test_range_partition_strategy_id_bounds(univ3_subgraph, sg):
+  swaps = univ3_subgraph.Query.swaps(first=2500)
+  doc = sg.mk_request([swaps.id]).documents[0]
+  strategy = RangePartitionStrategy(univ3_subgraph._schema, doc, num_partitions=4)
+  strategy.step()
+
+  # The windows' bounds are interpolated between the smallest and largest ids
+  with pytest.raises(SplitPagination) as exn_info:
+    strategy.step({'rangeMin': [{'id': '0x20000000ab-1'}], 'rangeMax': [{'id': '0x60000000cd-2'}]})
+
+  assert list(exn_info.value.documents | map(lambda doc: doc.variables)) == [
+    {'rangeHigh': '0x30000000'},
+    {'rangeLow': '0x30000000', 'rangeHigh': '0x40000000'},
+    {'rangeLow': '0x40000000', 'rangeHigh': '0x50000000'},
+    {'rangeLow': '0x50000000'},
+  ]
+
+  # Ids which are not hexadecimal are not partitioned
+  with pytest.raises(SplitPagination) as exn_info:
+    strategy.step({'rangeMin': [{'id': 'a'}], 'rangeMax': [{'id': 'z'}]})
+
+  assert list(exn_info.value.documents | map(lambda doc: doc.variables)) == [{}]
+
+
+def test_range_partition_strategy_fallback(univ3_subgraph, sg):
+  # Not enough entities to split
+  swaps = univ3_subgraph.Query.swaps(first=100, orderBy='timestamp')
+  doc = sg.mk_request([swaps.id]).documents[0]
+  strategy = RangePartitionStrategy(univ3_subgraph._schema, doc)
+
+  assert strategy.page_node is None
+  assert strategy.step()[1] == {'first0': 100, 'skip0': 0}
+
+
+def test_legacy_strategy_adaptive_page_size(univ3_subgraph, sg):
+  swaps = univ3_subgraph.Query.swaps(first=10000, orderBy='timestamp')
+  doc = sg.mk_request([swaps.id, swaps.timestamp]).documents[0]
+  strategy = LegacyStrategy(univ3_subgraph._schema, doc, page_size=AdaptivePageSize())
+
+  try:
+    _, args = strategy.step()
+    assert args['first0'] == 900
+
+    # Failed queries are retried with a smaller page
+    _, args = strategy.recover(Exception('Timeout'))
+    assert args == {'first0': 450, 'skip0': 0}
+
+    # Errors about the server's maximum `first` value clamp the page size
+    strategy.observe(0.5, {})
+    assert strategy.arg_generator.active_leaf().page_size == 900
+    _, args = strategy.recover(Exception('The `first` argument must be between 0 and 500, but is 900'))
+    assert args == {'first0': 500, 'skip0': 0}
+    assert SERVER_MAX_FIRST[doc.url] == 500
+
+    # Fast queries increase the page size up to the server's maximum
+    strategy.observe(0.5, {})
+    _, args = strategy.step({swaps._name(use_aliases=True): [
+      {'id': str(i), 'timestamp': i} for i in range(500)
+    ]})
+    assert args['first0'] == 500
+  finally:
+    SERVER_MAX_FIRST.pop(doc.url, None)
+
+
+def test_legacy_strategy_no_adaptive_page_size(univ3_subgraph, sg):
+  swaps = univ3_subgraph.Query.swaps(first=10000, orderBy='timestamp')
+  doc = sg.mk_request([swaps.id]).documents[0]
+  strategy = LegacyStrategy(univ3_subgraph._schema, doc)
+
+  strategy.step()
+  with pytest.raises(Exception, match='Timeout'):
+    strategy.recover(Exception('Timeout'))
+
+
+def __checkpoint_nodes(nested: bool) -> list[PaginationNode]:
+  swaps_node = PaginationNode(
+    node_idx=1 if nested else 0,
+    filter_field='timestamp',
+    first_value=2000,
+    skip_value=0,
+    filter_value=0,
+    filter_value_type=TypeRef.Named(name="BigInt", kind="SCALAR"),
+    key_path=['pairs', 'swaps'] if nested else ['swaps'],
+    inner=[]
+  )
+  if not nested:
+    return [swaps_node]
+
+  return [PaginationNode(
+    node_idx=0,
+    filter_field='id',
+    first_value=5,
+    skip_value=0,
+    filter_value=None,
+    filter_value_type=TypeRef.Named(name="String", kind="SCALAR"),
+    key_path=['pairs'],
+    inner=[swaps_node]
+  )]
+
+
+@pytest.mark.parametrize(['generator', 'page_nodes', 'pages'], [
+  (
+    LegacyStrategyArgGenerator,
+    __checkpoint_nodes(nested=True),
+    [
+      {'pairs': [{'id': 'pair0', 'swaps': list(generate_swaps('a', 900))}]},
+      {'pairs': [{'id': 'pair0', 'swaps': list(generate_swaps('b', 900))}]},
+    ]
+  ),
+  (
+    ShallowStrategyArgGenerator,
+    __checkpoint_nodes(nested=False),
+    [
+      {'swaps': list(generate_swaps('a', 900))},
+      {'swaps': list(generate_swaps('b', 900))},
+    ]
+  ),
+])
+def test_arg_generator_checkpoint(
+  generator: Type,
+  page_nodes: list[PaginationNode],
+  pages: list[dict[str, Any]]
+):
+  strategy = generator(page_nodes)
+  strategy.step()
+  strategy.step(pages[0])
+
+  # The state survives a JSON round trip and is restored in a new generator
+  state = json.loads(json.dumps(strategy.checkpoint()))
+  restored = generator(page_nodes)
+  restored.restore(state)
+
+  assert restored.step() == strategy.step()
+  assert restored.step(pages[1]) == strategy.step(pages[1])
+
+
+def test_fan_out_strategy(mocker, univ3_subgraph, sg):
+  pools = univ3_subgraph.Query.pools(first=3)
+  swaps = pools.swaps(first=2, orderBy='timestamp')
+  doc = sg.mk_request([pools.id, swaps.id]).documents[0]
+  strategy = FanOutStrategy(univ3_subgraph._schema, doc, batch_size=2)
+
+  with pytest.raises(FanOutPagination) as exn_info:
+    strategy.step()
+
+  fan_out = exn_info.value
+  [field] = fan_out.fields
+  assert (field.collection.name, field.link.name, field.first) == ('swaps', 'pool', 2)
+  assert list(fan_out.parent_doc.query.selection[0].selection | map(lambda select: select.key)) == ['id']
+
+  # Swaps of each pool, in order: p0 has 5 swaps, p1 has 1 swap and p2 has none
+  all_swaps = [
+    {'id': 'p0s0', 'pool': 'p0'},
+    {'id': 'p1s0', 'pool': 'p1'},
+    {'id': 'p0s1', 'pool': 'p0'},
+    {'id': 'p0s2', 'pool': 'p0'},
+    {'id': 'p0s3', 'pool': 'p0'},
+    {'id': 'p0s4', 'pool': 'p0'},
+  ]
+
+  def paginate(schema, doc, pagination_strategy):
+    select = doc.query.selection[0]
+    if select.alias != FAN_OUT_CHILDREN_KEY:
+      return {fan_out.key: [{'id': 'p0'}, {'id': 'p1'}, {'id': 'p2'}]}
+
+    args = {arg.name: arg.value for arg in select.arguments}
+    pool_ids = list(args['where'].value['pool_in'].value | map(lambda value: value.value))
+    return {FAN_OUT_CHILDREN_KEY: [
+      {'id': swap['id'], 'fanOutParent': {'id': swap['pool']}}
+      for swap in all_swaps
+      if swap['pool'] in pool_ids
+    ][:args['first'].value]}
+
+  paginate_mock = mocker.patch('subgrounds.pagination.pagination.paginate', side_effect=paginate)
+  data = list(paginate_fan_out(univ3_subgraph._schema, fan_out))
+
+  # p1's swaps are queried again since the first query reached its limit
+  assert paginate_mock.call_count == 4
+  assert data == [
+    {fan_out.key: [
+      {'id': 'p0', field.key: [{'id': 'p0s0'}, {'id': 'p0s1'}]},
+      {'id': 'p1', field.key: [{'id': 'p1s0'}]},
+    ]},
+    {fan_out.key: [
+      {'id': 'p2', field.key: []},
+    ]},
+  ]
+
+
+def test_fan_out_strategy_fallback(univ3_subgraph, sg):
+  # No nested list field
+  pools = univ3_subgraph.Query.pools(first=3)
+  doc = sg.mk_request([pools.id]).documents[0]
+  strategy = FanOutStrategy(univ3_subgraph._schema, doc)
+
+  assert strategy.fan_out is None
+  assert strategy.step()[1] == {'first0': 3, 'skip0': 0}
+
+
+def test_legacy_strategy_pin_block(mocker, univ3_subgraph, sg):
+  pools = univ3_subgraph.Query.pools(first=2000)
+  doc = sg.mk_request([pools.id, pools.swaps.id]).documents[0]
+  query_mock = mocker.patch('subgrounds.client.query', return_value={'_meta': {'block': {'number': 123}}})
+
+  strategy = LegacyStrategy(univ3_subgraph._schema, doc, pin_block=True)
+  assert strategy.block_number == 123
+  assert query_mock.call_count == 1
+
+  # Only toplevel fields accept a `block` argument
+  [pools_select] = strategy.normalized_doc.query.selection
+  assert pools_select.find_args(lambda arg: arg.name == 'block', recurse=False).value == InputValue.Object({
+    'number': InputValue.Int(123)
+  })
+  assert not any(pools_select.selection | map(lambda select: select.exists_args(lambda arg: arg.name == 'block')))
+
+  # Block numbers can be given directly
+  strategy = LegacyStrategy(univ3_subgraph._schema, doc, pin_block=456)
+  assert strategy.block_number == 456
+  assert query_mock.call_count == 1
+
+
+def test_range_partition_strategy_pin_block(univ3_subgraph, sg):
+  swaps = univ3_subgraph.Query.swaps(first=2500, orderBy='timestamp')
+  doc = sg.mk_request([swaps.id]).documents[0]
+  strategy = RangePartitionStrategy(univ3_subgraph._schema, doc, num_partitions=2, pin_block=123)
+
+  probe_doc, _ = strategy.step()
+  with pytest.raises(SplitPagination) as exn_info:
+    strategy.step({'rangeMin': [{'timestamp': '1000'}], 'rangeMax': [{'timestamp': '2000'}]})
+
+  for doc in [probe_doc, *exn_info.value.documents]:
+    assert all(doc.query.selection | map(lambda select: select.exists_args(lambda arg: arg.name == 'block')))
+
+  assert exn_info.value.pagination_strategy.keywords == {'pin_block': 123}
+
+
+def test_legacy_strategy_ties(univ3_subgraph, sg):
+  swaps = univ3_subgraph.Query.swaps(first=10000, orderBy='timestamp')
+  doc = sg.mk_request([swaps.id, swaps.timestamp]).documents[0]
+  strategy = LegacyStrategy(univ3_subgraph._schema, doc)
+  key = swaps._name(use_aliases=True)
+
+  [select] = strategy.normalized_doc.query.selection
+  where = select.find_args(lambda arg: arg.name == 'where', recurse=False).value.value
+  assert where['timestamp_gte'] == InputValue.Variable('tieOrderingValue0')
+
+  _, args = strategy.step()
+  assert args == {'first0': 900, 'skip0': 0}
+
+  # The last 3 swaps of the page share the same timestamp: the next page
+  # includes that timestamp and skips these swaps
+  page = [{'id': f'swap{i}', 'timestamp': min(i, 897)} for i in range(900)]
+  _, args = strategy.step({key: page})
+  assert args == {'first0': 900, 'skip0': 3, 'tieOrderingValue0': 897}
+
+  # Ties spanning whole pages accumulate
+  page = [{'id': f'swap{i}', 'timestamp': 897} for i in range(900, 1800)]
+  _, args = strategy.step({key: page})
+  assert args == {'first0': 900, 'skip0': 903, 'tieOrderingValue0': 897}
+
+  # Following swaps may share the last swap's timestamp even without ties in the page
+  page = [{'id': f'swap{i}', 'timestamp': i} for i in range(1800, 2700)]
+  _, args = strategy.step({key: page})
+  assert args == {'first0': 900, 'skip0': 1, 'tieOrderingValue0': 2699}
+
+
+def test_legacy_strategy_ties_lower_bound(univ3_subgraph, sg):
+  swaps = univ3_subgraph.Query.swaps(first=10000, orderBy='timestamp', where={'timestamp_gte': 100})
+  doc = sg.mk_request([swaps.id, swaps.timestamp]).documents[0]
+  strategy = LegacyStrategy(univ3_subgraph._schema, doc)
+
+  # The lower bound given by the user is kept for the first page
+  _, args = strategy.step()
+  assert args == {'first0': 900, 'skip0': 0, 'tieOrderingValue0': '100'}
+
+
+def test_legacy_strategy_concurrent_fields(mocker, univ3_subgraph, sg):
+  mints = univ3_subgraph.Query.mints(first=2000)
+  swaps = univ3_subgraph.Query.swaps(first=2000)
+  doc = sg.mk_request([mints.id, swaps.id]).documents[0]
+  strategy = LegacyStrategy(univ3_subgraph._schema, doc, pin_block=123, concurrent_fields=True)
+
+  # Each toplevel list field is paginated independently
+  with pytest.raises(SplitPagination) as exn_info:
+    strategy.step()
+
+  split = exn_info.value
+  assert list(split.documents | map(lambda doc: list(doc.query.selection | map(lambda select: select.key)))) == [
+    [mints._name(use_aliases=True)],
+    [swaps._name(use_aliases=True)],
+  ]
+  assert split.key is None
+  assert split.pagination_strategy.keywords == {'page_size': None, 'pin_block': 123, 'concurrent_fields': False}
+  assert strategy.checkpoint() is None
+
+  def paginate_pages(schema, doc, pagination_strategy):
+    [select] = doc.query.selection
+    yield ({select.key: [{'id': f'{select.key}{i}'} for i in range(3)]}, None)
+
+  mocker.patch('subgrounds.pagination.pagination.paginate_pages', side_effect=paginate_pages)
+  data = list(paginate_split(univ3_subgraph._schema, split))
+
+  assert data == [
+    {mints._name(use_aliases=True): [{'id': f'{mints._name(use_aliases=True)}{i}'} for i in range(3)]},
+    {swaps._name(use_aliases=True): [{'id': f'{swaps._name(use_aliases=True)}{i}'} for i in range(3)]},
+  ]
+
+  # By default, the fields are paginated one after the other
+  strategy = LegacyStrategy(univ3_subgraph._schema, doc)
+  _, args = strategy.step()
+  assert args == {'first0': 900, 'skip0': 0}
+
+
+def test_range_partition_strategy_shard_size(univ3_subgraph, sg):
+  swaps = univ3_subgraph.Query.swaps(first=100000, orderBy='timestamp')
+  doc = sg.mk_request([swaps.id]).documents[0]
+  strategy = RangePartitionStrategy(univ3_subgraph._schema, doc, num_partitions=8, shard_size=1000)
+
+  # The probe samples the first entities to estimate the number of entities
+  probe_doc, _ = strategy.step()
+  [range_min, _] = probe_doc.query.selection
+  assert range_min.find_args(lambda arg: arg.name == 'first', recurse=False).value == InputValue.Int(100)
+
+  # 1 entity per second between 1000 and 4000, i.e.: about 3000 entities
+  with pytest.raises(SplitPagination) as exn_info:
+    strategy.step({
+      'rangeMin': [{'timestamp': str(1000 + i)} for i in range(100)],
+      'rangeMax': [{'timestamp': '4000'}]
+    })
+
+  assert len(exn_info.value.documents) == 4
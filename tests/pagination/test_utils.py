@@ -1,7 +1,14 @@
+from copy import deepcopy
+from datetime import datetime
+from decimal import Decimal
 from typing import Any
 import pytest
+from pipe import map
 
-from subgrounds.pagination.utils import merge
+from subgrounds.pagination.utils import (AdaptivePageSize, PageAccumulator,
+                                         PageSpill, estimate_num_entities,
+                                         max_first_of_error, merge,
+                                         ordering_number)
 
 
 @pytest.mark.parametrize(['data1', 'data2', 'expected'], [
@@ -520,4 +527,140 @@ def test_merge(
   data2: dict[str, Any],
   expected: dict[str, Any]
 ):
-  assert merge(data1, data2) == expected
\ No newline at end of file
+  assert merge(data1, data2) == expected
+
+
+def test_page_accumulator():
+  # Pages as produced by the legacy strategy: the parent entity is repeated
+  # on each page while its nested entities are paginated
+  pages = [
+    {'pairs': [{'id': 'b', 'token': {'id': 't1'}, 'swaps': [{'id': 'S1'}, {'id': 'S2'}]}]},
+    {'pairs': [{'id': 'b', 'token': {'id': 't1'}, 'swaps': [{'id': 'S3'}], 'mints': []}]},
+    {'pairs': [{'id': 'a', 'swaps': []}, {'id': 'c', 'swaps': [{'id': 'S4'}]}], 'total': 1},
+    {'pairs': [{'id': 'c', 'swaps': [{'id': 'S5'}, {'id': 'S4'}]}, {'id': 'b', 'swaps': [{'id': 'S0'}]}]},
+    {'pairs': [{'id': 'd', 'swaps': [{'id': 'S6'}]}], 'total': 2},
+  ]
+
+  expected = {}
+  for page in deepcopy(pages):
+    expected = merge(expected, page)
+
+  acc = PageAccumulator()
+  for page in deepcopy(pages):
+    acc.add(page)
+
+  assert acc.data == expected
+  assert list(acc.data['pairs'] | map(lambda pair: pair['id'])) == ['a', 'b', 'c', 'd']
+
+  with pytest.raises(TypeError):
+    acc.add({'pairs': {'id': 'a'}})
+
+
+def test_adaptive_page_size():
+  page_size = AdaptivePageSize(min_size=100, max_size=5000, target_latency=2.0)
+
+  # Fast queries increase the page size by at most `max_factor`
+  assert page_size.next_size(900, 0.5) == 1800
+  assert page_size.next_size(900, 0.0) == 1800
+  assert page_size.next_size(900, 1.0) == 1800
+  # Slow queries decrease it
+  assert page_size.next_size(900, 3.0) == 600
+  assert page_size.next_size(900, 30.0) == 450
+  # Page sizes stay within bounds
+  assert page_size.next_size(4000, 0.5) == 5000
+  assert page_size.next_size(4000, 0.5, max_first=1000) == 1000
+  assert page_size.shrink(150) == 100
+  assert page_size.shrink(900, max_first=300) == 300
+
+
+def test_max_first_of_error():
+  exn = Exception('The `first` argument must be between 0 and 1000, but is 5000')
+  assert max_first_of_error(exn) == 1000
+  assert max_first_of_error(Exception('Timeout')) is None
+
+
+@pytest.mark.parametrize(['value', 'expected'], [
+  (10, 10),
+  (1.5, 1.5),
+  ('1650000000', 1650000000),
+  ('0x0a', 10),
+  ('abc', None),
+  (True, None),
+  (None, None),
+])
+def test_ordering_number(value: Any, expected: Any):
+  assert ordering_number(value) == expected
+
+
+def test_estimate_num_entities():
+  # Complete samples are exact
+  assert estimate_num_entities(['1', '2', '3'], '3', first=1000, sample_size=10) == (3, True)
+  assert estimate_num_entities(['1', '2', '3'], '3', first=1000, skip=1, sample_size=10) == (2, True)
+
+  # Otherwise, the sample's density is extrapolated (2 entities per unit here)
+  sample = [str(i / 2) for i in range(10)]
+  assert estimate_num_entities(sample, '99', first=1000, sample_size=10) == (199, False)
+  assert estimate_num_entities(sample, '99', first=100, sample_size=10) == (100, False)
+
+  # Non-numeric or constant ordering values cannot be extrapolated
+  assert estimate_num_entities(['a'] * 10, 'z', first=1000, sample_size=10) == (1000, False)
+  assert estimate_num_entities(['1'] * 10, '5', first=1000, sample_size=10) == (1000, False)
+
+
+def test_page_spill(tmp_path):
+  pages = [{'swaps': [{'id': f'{i}{j}'} for j in range(10)]} for i in range(5)]
+
+  with PageSpill(memory_budget=300, directory=str(tmp_path)) as spill:
+    for page in pages:
+      spill.add(page)
+
+    # Pages beyond the budget are written to a single spill file
+    assert (len(spill.pages), spill.spilled) == (2, 3)
+    assert len(list(tmp_path.iterdir())) == 1
+    assert list(spill.iter_pages()) == pages
+
+  assert list(tmp_path.iterdir()) == []
+
+
+def test_page_spill_merged(tmp_path):
+  def mk_pages() -> list[dict[str, Any]]:
+    return [
+      {'pairs': [
+        {'id': 'a', 'createdAt': datetime(2022, 1, 1), 'swaps': [{'id': 's1', 'amount': Decimal('1.5')}]},
+        {'id': 'b', 'createdAt': datetime(2022, 1, 2), 'swaps': []},
+      ]},
+      {'pairs': [{'id': 'a', 'swaps': [{'id': 's2', 'amount': Decimal('2.5')}]}]},
+      {'pairs': [{'id': 'c', 'createdAt': datetime(2022, 1, 3), 'swaps': []}], 'pair': {'id': 'd'}},
+      {'pairs': [{'id': 'c', 'swaps': [{'id': 's3', 'amount': Decimal('3.5')}]}], 'tokens': [{'id': 't'}]},
+    ]
+
+  expected = PageAccumulator()
+  for page in mk_pages():
+    expected.add(page)
+
+  with PageSpill(memory_budget=0, directory=str(tmp_path)) as spill:
+    for page in mk_pages():
+      spill.add(page)
+
+    # Values which cannot be serialized as JSON are read back unchanged
+    assert spill.spilled == 4
+    assert list(spill.iter_pages()) == mk_pages()
+
+    # Entities are returned once merged with their data from all pages, and
+    # every chunk contains all toplevel list fields
+    chunks = list(spill.iter_merged())
+    assert chunks == [
+      {'pairs': [{'id': 'b', 'createdAt': datetime(2022, 1, 2), 'swaps': []}], 'tokens': []},
+      {'pairs': [{
+        'id': 'a',
+        'createdAt': datetime(2022, 1, 1),
+        'swaps': [{'id': 's1', 'amount': Decimal('1.5')}, {'id': 's2', 'amount': Decimal('2.5')}]
+      }], 'tokens': []},
+      {
+        'pairs': [{'id': 'c', 'createdAt': datetime(2022, 1, 3), 'swaps': [{'id': 's3', 'amount': Decimal('3.5')}]}],
+        'tokens': [{'id': 't'}]
+      },
+      {'pairs': [], 'tokens': [], 'pair': {'id': 'd'}},
+    ]
+    assert [pair for chunk in chunks for pair in chunk['pairs']] == expected.data['pairs']
+    assert [token for chunk in chunks for token in chunk['tokens']] == expected.data['tokens']
@@ -197,4 +197,17 @@ def test_fieldpath_building_3(subgraph):
   assert query == expected
 
 
-
+def test_fieldpath_memoization(subgraph):
+  pairs = subgraph.Query.pairs
+
+  assert pairs._name_path(use_aliases=True) == ['pairs']
+  assert pairs._name(use_aliases=True) == 'pairs'
+  assert pairs._selection().alias is None
+  assert pairs._selection() is pairs._selection()
+
+  # Setting arguments invalidates the memoized values
+  pairs(first=10)
+  assert pairs._name_path(use_aliases=True) == ['x7ecb1bc5fd9e0dcf']
+  assert pairs._name(use_aliases=True) == 'x7ecb1bc5fd9e0dcf'
+  assert pairs._selection().alias == 'x7ecb1bc5fd9e0dcf'
+  assert pairs._name_path() == ['pairs']
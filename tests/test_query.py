@@ -1,7 +1,10 @@
+from functools import reduce
+
 import pytest
+from pipe import map
 
-from subgrounds.query import (Argument, InputValue, Query, Selection,
-                              VariableDefinition)
+from subgrounds.query import (Argument, Document, InputValue, Query,
+                              QueryBuilder, Selection, VariableDefinition)
 from subgrounds.schema import TypeMeta, TypeRef
 
 # ================================================================
@@ -464,6 +467,32 @@ def test_query_add(query, other, expected):
   assert Query.add(query, other) == expected
 
 
+def test_query_builder():
+  def fmeta(name, type_):
+    return TypeMeta.FieldMeta(name=name, description="", args=[], type=type_)
+
+  swaps = fmeta('swaps', TypeRef.non_null_list("Swap", kind="OBJECT"))
+  pair = fmeta('pair', TypeRef.Named(name="Pair", kind="OBJECT"))
+  amount = fmeta('amount0In', TypeRef.Named(name="Float", kind="SCALAR"))
+  timestamp = fmeta('timestamp', TypeRef.Named(name="Int", kind="SCALAR"))
+  id_ = fmeta('id', TypeRef.Named(name="String", kind="SCALAR"))
+  first = [Argument('first', InputValue.Int(10))]
+
+  selections = [
+    Selection(swaps, None, [], [Selection(amount, None, [], [])]),
+    Selection(swaps, 'x1', first, [Selection(timestamp, None, [], [])]),
+    Selection(swaps, None, [], [Selection(pair, None, [], [Selection(id_, None, [], [])])]),
+    Selection(pair, None, [], [Selection(id_, None, [], [])]),
+    Selection(swaps, 'x1', first, [Selection(amount, None, [], [])]),
+    Selection(swaps, None, [], [Selection(timestamp, None, [], []), Selection(amount, None, [], [])]),
+  ]
+
+  expected = reduce(Query.add, selections, Query())
+
+  assert QueryBuilder().add(selections).build() == expected
+  assert reduce(QueryBuilder.add, selections, QueryBuilder()).build() == expected
+
+
 @pytest.mark.parametrize("query, other, expected", [
   (
     Query(
@@ -658,3 +687,70 @@ def test_query_select(query, other, expected):
 ])
 def test_query_contains(query, other, expected):
   assert Query.contains(query, other) == expected
+
+
+def test_document_extract_fragments():
+  def fmeta(name, type_):
+    return TypeMeta.FieldMeta(name=name, description="", args=[], type=type_)
+
+  def scalar(name):
+    return Selection(fmeta(name, TypeRef.Named(name="String", kind="SCALAR")))
+
+  def token(name):
+    return Selection(fmeta(name, TypeRef.Named(name="Token", kind="OBJECT")), None, [], [
+      scalar('id'),
+      scalar('symbol'),
+    ])
+
+  def pair(alias, tokens=['token0', 'token1']):
+    return Selection(fmeta('pair', TypeRef.Named(name="Pair", kind="OBJECT")), alias, [], [
+      *list(tokens | map(token)),
+      scalar('id'),
+    ])
+
+  # Token sub-selections are repeated within each pair
+  doc = Document('www.abc.xyz/graphql', Query(None, [
+    token('token'),
+    pair('x0'),
+    pair('x1'),
+  ])).extract_fragments()
+
+  assert list(doc.fragments | map(lambda frag: frag.name)) == ['Token_6ccb9348', 'Pair_9ecc3603']
+  assert doc.graphql == '''query {
+  token {
+    ...Token_6ccb9348
+  }
+  x0: pair {
+    ...Pair_9ecc3603
+  }
+  x1: pair {
+    ...Pair_9ecc3603
+  }
+}
+fragment Token_6ccb9348 on Token {
+  id
+  symbol
+}
+fragment Pair_9ecc3603 on Pair {
+  token0 {
+    ...Token_6ccb9348
+  }
+  token1 {
+    ...Token_6ccb9348
+  }
+  id
+}'''
+
+  # Token sub-selections are only repeated within the repeated pair sub-selection
+  doc = Document('www.abc.xyz/graphql', Query(None, [
+    pair('x0', tokens=['token0']),
+    pair('x1', tokens=['token0']),
+  ])).extract_fragments()
+
+  assert len(doc.fragments) == 1
+  assert doc.fragments[0].type_ == TypeRef.Named(name="Pair", kind="OBJECT")
+
+  # Unused fragments are not rendered
+  doc = Document('www.abc.xyz/graphql', Query(None, [token('token')]), fragments=doc.fragments)
+  assert doc.used_fragments == []
+  assert doc.graphql == doc.query.graphql
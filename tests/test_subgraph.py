@@ -4,6 +4,7 @@ import pytest
 
 from subgrounds.schema import SchemaMeta, TypeMeta, TypeRef
 from subgrounds.subgraph import FieldPath, Filter, Object, Subgraph, SyntheticField
+from subgrounds.subgraph.expr import Expr, compile_exprs
 from subgrounds.query import Argument, DataRequest, InputValue, Query, Selection
 from subgrounds.subgrounds import Subgrounds
 from subgrounds.utils import identity
@@ -900,3 +901,63 @@ def test_synthetic_field_6(subgraph: Subgraph):
 
   assert sfield._f(100, 2) == 1
   assert sfield._deps == expected_deps
+
+
+def test_synthetic_field_expr(subgraph: Subgraph):
+  Swap = subgraph.Swap
+
+  sfield: SyntheticField = abs(Swap.amount0In - Swap.amount0Out) / (1 + Swap.amount1In)
+
+  assert sfield._expr == Expr.Op('truediv', (
+    Expr.Op('abs', (Expr.Op('sub', (Expr.Dep(0), Expr.Dep(1))),)),
+    Expr.Op('add', (Expr.Const(1), Expr.Dep(2))),
+  ))
+  assert sfield._expr.is_vectorizable
+  assert sfield._expr.evaluate([10, 4, 2]) == sfield._f(10, 4, 2) == 2
+
+  sfield = SyntheticField.datetime_of_timestamp(Swap.timestamp)
+  assert not sfield._expr.is_vectorizable
+
+
+def test_synthetic_field_compile(subgraph: Subgraph):
+  Swap = subgraph.Swap
+
+  # Repeated dependencies are only selected once
+  sfield: SyntheticField = (Swap.amount0In - Swap.amount0Out) / Swap.amount0In
+  assert len(sfield._deps) == 2
+  assert sfield._f(10, 4) == 0.6
+
+  # Nested synthetic fields are inlined
+  diff = abs(Swap.amount0In - Swap.amount0Out)
+  sfield = diff / (diff + 1)
+  assert len(sfield._deps) == 2
+  assert sfield._f(10, 4) == 6 / 7
+
+  # Shared sub-expressions and results of previous expressions
+  diff = Expr.Op('abs', (Expr.Op('sub', (Expr.Dep(0), Expr.Dep(1))),))
+  f = compile_exprs([
+    Expr.Op('truediv', (diff, Expr.Dep(1))),
+    Expr.Op('mul', (diff, Expr.Const(2))),
+    Expr.Op('add', (Expr.Dep(3), Expr.Dep(2))),
+  ], num_deps=2, defaults=[0.0, 0.0, 0.0])
+  assert f(10, 4) == (1.5, 12, 13.5)
+  assert f(10, 0) == (0.0, 20, 20)
+
+  # A failing expression does not affect the expressions it shares sub-expressions with
+  triple = Expr.Op('mul', (Expr.Dep(2), Expr.Const(3)))
+  f = compile_exprs([
+    Expr.Op('add', (Expr.Op('truediv', (Expr.Dep(0), Expr.Dep(1))), triple)),
+    triple,
+  ], num_deps=3, defaults=[None, 'DEFAULT'])
+  assert f(1, 0, 2) == (None, 6)
+  assert f(1, 2, 2) == (6.5, 6)
+
+  # Expressions sharing a failed sub-expression fall back to their defaults
+  ratio = Expr.Op('truediv', (Expr.Dep(0), Expr.Dep(1)))
+  f = compile_exprs([
+    Expr.Op('add', (ratio, Expr.Const(1))),
+    Expr.Op('mul', (ratio, Expr.Const(2))),
+    Expr.Dep(0),
+  ], num_deps=2, defaults=[0.0, 0.0, 0.0])
+  assert f(1, 0) == (0.0, 0.0, 1)
+  assert f(4, 2) == (3.0, 4.0, 4)
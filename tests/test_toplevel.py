@@ -1,13 +1,20 @@
 # import unittest
 from datetime import datetime
+from functools import partial
+import re
+import warnings
 
 import pandas as pd
+import pytest
 from pandas.testing import assert_frame_equal
 
+from subgrounds.dataframe_utils import df_of_json, vectorized_fpaths
+from subgrounds.pagination import LegacyStrategy, PaginationPlan, ResumeWarning
+from subgrounds.pagination.utils import PageSpill
 from subgrounds.query import (Argument, DataRequest, Document, InputValue,
-                              Query, Selection)
+                              Query, Selection, VariableDefinition)
 from subgrounds.schema import TypeMeta, TypeRef
-from subgrounds.subgraph import FieldPath, Subgraph
+from subgrounds.subgraph import FieldPath, Subgraph, SyntheticField
 from subgrounds.subgrounds import Subgrounds
 # from tests.conftest import *
 
@@ -113,3 +120,342 @@ def test_mk_request_2(subgraph, subgraph_diff_url):
     ])
 
     assert req == expected
+
+
+def test_mk_request_variables(subgraph):
+    pairs = subgraph.Query.pairs(
+      first=10,
+      where=[subgraph.Pair.token0 == InputValue.Variable('token')]
+    )
+
+    app = Subgrounds()
+    req = app.mk_request([pairs.id])
+
+    assert req.documents[0].query.variables == [
+      VariableDefinition('token', TypeRef.Named(name='String', kind="SCALAR"))
+    ]
+    assert req.documents[0].query.selection[0].arguments == [
+      Argument("first", InputValue.Int(10)),
+      Argument("where", InputValue.Object({'token0': InputValue.Variable('token')})),
+    ]
+
+
+def test_prepared_query(mocker, subgraph):
+    pairs = subgraph.Query.pairs(
+      first=10,
+      where=[subgraph.Pair.token0 == InputValue.Variable('token')]
+    )
+
+    app = Subgrounds(subgraphs={subgraph._url: subgraph})
+    prepared = app.prepare([pairs.id, pairs.reserveUSD])
+
+    key = prepared.request.documents[0].query.selection[0].key
+    query = mocker.patch("subgrounds.client.query", return_value={
+      key: [{'id': 'a', 'reserveUSD': '1.5'}]
+    })
+    of_document = mocker.spy(PaginationPlan, 'of_document')
+
+    expected = pd.DataFrame(data={
+      'pairs_id': ['a'],
+      'pairs_reserveUSD': [1.5],
+    })
+
+    assert_frame_equal(prepared.run_df({'token': 'abc'}), expected)
+    assert query.call_args.kwargs['variables']['token'] == 'abc'
+    assert '$token: String' in query.call_args.kwargs['query_str']
+    assert 'token0: $token' in query.call_args.kwargs['query_str']
+
+    assert_frame_equal(prepared.run_df({'token': 'def'}), expected)
+    assert query.call_args.kwargs['variables']['token'] == 'def'
+
+    assert query.call_count == 2
+    assert of_document.call_count == 0
+
+
+def test_query_json_iter_prefetch(mocker, subgraph):
+  pairs = subgraph.Query.pairs(first=1000)
+  app = Subgrounds(subgraphs={subgraph._url: subgraph}, prefetch_depth=2)
+  key = pairs._name(use_aliases=True)
+
+  def query(url, query_str, variables):
+    return {key: [{'id': f'{i:04}'} for i in range(variables['first0'])]}
+
+  mocker.patch("subgrounds.client.query", side_effect=query)
+
+  pages = list(app.query_json_iter([pairs.id]))
+
+  assert list(len(page[key]) for page in pages) == [900, 100]
+
+
+def test_query_json_iter_checkpoint(mocker, subgraph, tmp_path):
+  pairs = subgraph.Query.pairs(first=3000, orderBy='id')
+  app = Subgrounds(subgraphs={subgraph._url: subgraph}, checkpoint_dir=str(tmp_path), checkpoint_every=1)
+  key = pairs._name(use_aliases=True)
+
+  def query(url, query_str, variables):
+    start = int(variables.get('lastOrderingValue0', '-1')) + 1
+    return {key: [{'id': f'{i:04}'} for i in range(start, start + variables['first0'])]}
+
+  query_mock = mocker.patch("subgrounds.client.query", side_effect=query)
+
+  # Interrupt the iteration after two pages (before consuming the second page)
+  pages = app.query_json_iter([pairs.id])
+  next(pages)
+  next(pages)
+  pages.close()
+  assert len(list(tmp_path.iterdir())) == 1
+
+  # Resuming re-queries the unconsumed page and skips the consumed ones
+  query_mock.reset_mock()
+  with pytest.warns(ResumeWarning):
+    resumed = list(app.query_json_iter([pairs.id]))
+
+  assert [page[key][0]['id'] for page in resumed] == ['0900', '1800', '2700']
+  assert query_mock.call_count == 3
+  assert list(tmp_path.iterdir()) == []
+
+
+def test_query_json_iter_clear_checkpoints(mocker, subgraph, tmp_path):
+  pairs = subgraph.Query.pairs(first=3000, orderBy='id')
+  app = Subgrounds(subgraphs={subgraph._url: subgraph}, checkpoint_dir=str(tmp_path), checkpoint_every=1)
+  key = pairs._name(use_aliases=True)
+
+  def query(url, query_str, variables):
+    start = int(variables.get('lastOrderingValue0', '-1')) + 1
+    return {key: [{'id': f'{i:04}'} for i in range(start, start + variables['first0'])]}
+
+  query_mock = mocker.patch("subgrounds.client.query", side_effect=query)
+
+  # Stop the iteration early
+  for page in app.query_json_iter([pairs.id]):
+    if page[key][0]['id'] == '0900':
+      break
+  assert len(list(tmp_path.iterdir())) == 1
+
+  # Once the checkpoints are cleared, the query starts over from the first page
+  app.clear_checkpoints()
+  assert list(tmp_path.iterdir()) == []
+
+  query_mock.reset_mock()
+  with warnings.catch_warnings():
+    warnings.simplefilter('error', ResumeWarning)
+    pages = list(app.query_json_iter([pairs.id]))
+
+  assert [page[key][0]['id'] for page in pages] == ['0000', '0900', '1800', '2700']
+  assert query_mock.call_count == 4
+  assert list(tmp_path.iterdir()) == []
+
+
+def test_query_json_iter_progress(mocker, subgraph):
+  pairs = subgraph.Query.pairs(first=2000, orderBy='id')
+  reports = []
+  app = Subgrounds(subgraphs={subgraph._url: subgraph}, progress=reports.append, probe_progress=True)
+  key = pairs._name(use_aliases=True)
+  entities = [{'id': f'0x{i:04x}'} for i in range(1500)]
+
+  def query(url, query_str, variables):
+    if 'probeHead0' in query_str:
+      return {'probeHead0': entities[:100], 'probeTail0': entities[-1:]}
+
+    last = variables.get('lastOrderingValue0')
+    return {key: [entity for entity in entities if last is None or entity['id'] > last][:variables['first0']]}
+
+  mocker.patch("subgrounds.client.query", side_effect=query)
+  pages = list(app.query_json_iter([pairs.id]))
+
+  assert len(pages) == 2
+  assert [(report.entities, report.pages, report.estimated_entities) for report in reports] == [
+    (900, 1, 1500),
+    (1500, 2, 1500),
+  ]
+  assert reports[0].remaining == 600
+  assert reports[-1].remaining == 0 and reports[-1].eta == 0
+
+
+def test_query_json_iter_multiple_list_fields(mocker, subgraph):
+  pairs = subgraph.Query.pairs(first=1000)
+  swaps = subgraph.Query.swaps(first=1000)
+  app = Subgrounds(subgraphs={subgraph._url: subgraph})
+  pairs_key, swaps_key = pairs._name(use_aliases=True), swaps._name(use_aliases=True)
+
+  def query(url, query_str, variables):
+    data = {}
+    for (key, idx) in re.findall(r'(\w+): \w+\(first: \$first(\d+)', query_str):
+      start = int(variables.get(f'lastOrderingValue{idx}', '-1')) + 1
+      data[key] = [{'id': f'{i:04}'} for i in range(start, min(start + variables[f'first{idx}'], 1000))]
+    return data
+
+  mocker.patch("subgrounds.client.query", side_effect=query)
+
+  # Pages are returned as they are queried, whether or not fields are paginated concurrently
+  for strategy in [LegacyStrategy, partial(LegacyStrategy, concurrent_fields=True)]:
+    pages = list(app.query_json_iter([pairs.id, swaps.id], pagination_strategy=strategy))
+
+    assert [(key, len(page[key])) for page in pages for key in page] == [
+      (pairs_key, 900),
+      (pairs_key, 100),
+      (swaps_key, 900),
+      (swaps_key, 100),
+    ]
+
+
+def test_query_df_memory_budget(mocker, subgraph, tmp_path):
+  pairs = subgraph.Query.pairs(first=2000, orderBy='id')
+  app = Subgrounds(subgraphs={subgraph._url: subgraph}, spill_dir=str(tmp_path))
+  key = pairs._name(use_aliases=True)
+
+  def query(url, query_str, variables):
+    start = int(variables.get('lastOrderingValue0', '-1')) + 1
+    return {key: [{'id': f'{i:04}'} for i in range(start, min(start + variables['first0'], 2000))]}
+
+  mocker.patch("subgrounds.client.query", side_effect=query)
+  spill_mock = mocker.spy(PageSpill, 'add')
+
+  df = app.query_df([pairs.id], memory_budget=10000)
+  assert spill_mock.call_count == 3
+  assert list(df['pairs_id']) == [f'{i:04}' for i in range(2000)]
+  assert_frame_equal(df, app.query_df([pairs.id]))
+  assert list(tmp_path.iterdir()) == []
+
+
+def test_query_df_memory_budget_parity(mocker, subgraph, tmp_path):
+  subgraph.Swap.datetime = SyntheticField(datetime.fromtimestamp, SyntheticField.STRING, subgraph.Swap.timestamp)
+  subgraph.Swap.total = subgraph.Swap.amount0In + subgraph.Swap.amount1In
+  swaps = subgraph.Query.swaps(first=2000)
+  app = Subgrounds(subgraphs={subgraph._url: subgraph}, spill_dir=str(tmp_path))
+  key = swaps._name(use_aliases=True)
+
+  def query(url, query_str, variables):
+    start = int(variables.get('lastOrderingValue0', '-1')) + 1
+    return {key: [
+      {
+        'id': f'{i:04}',
+        'timestamp': str(1_600_000_000 + i),
+        'amount0In': f'{i}.25',
+        'amount1In': None if i % 7 == 0 else '0.5',
+      }
+      for i in range(start, min(start + variables['first0'], 2000))
+    ]}
+
+  mocker.patch("subgrounds.client.query", side_effect=query)
+  fpaths = [swaps.id, swaps.datetime, swaps.amount0In, swaps.total]
+
+  # Spilled pages (holding datetime and float values) yield the same DataFrame
+  df = app.query_df(fpaths, memory_budget=0)
+  assert len(df) == 2000
+  assert_frame_equal(df, app.query_df(fpaths))
+  assert list(tmp_path.iterdir()) == []
+
+
+def test_query_df_memory_budget_parity_multiple_list_fields(mocker, subgraph, tmp_path):
+  pairs = subgraph.Query.pairs(first=1500)
+  swaps = subgraph.Query.swaps(first=1200)
+  app = Subgrounds(subgraphs={subgraph._url: subgraph}, spill_dir=str(tmp_path))
+  sizes = {pairs._name(use_aliases=True): 1500, swaps._name(use_aliases=True): 1200}
+
+  def query(url, query_str, variables):
+    data = {}
+    for (key, idx) in re.findall(r'(\w+): \w+\(first: \$first(\d+)', query_str):
+      start = int(variables.get(f'lastOrderingValue{idx}', '-1')) + 1
+      end = min(start + variables[f'first{idx}'], sizes[key])
+      data[key] = [{'id': f'{i:04}', 'reserveUSD': f'{i}.5', 'timestamp': str(i)} for i in range(start, end)]
+    return data
+
+  mocker.patch("subgrounds.client.query", side_effect=query)
+  fpaths = [pairs.id, pairs.reserveUSD, swaps.id, swaps.timestamp]
+
+  expected = app.query_df(fpaths)
+  assert [len(df) for df in expected] == [1500, 1200]
+
+  # Each toplevel list field yields its own DataFrame, whether or not pages are spilled
+  for memory_budget in [0, 10**9]:
+    dfs = app.query_df(fpaths, memory_budget=memory_budget)
+    assert len(dfs) == 2
+    for (df, expected_df) in zip(dfs, expected):
+      assert_frame_equal(df, expected_df)
+  assert list(tmp_path.iterdir()) == []
+
+
+def test_query_df_vectorized_synthetic_field(mocker, subgraph):
+  subgraph.Swap.price = abs(subgraph.Swap.amount0In - subgraph.Swap.amount0Out) / abs(subgraph.Swap.amount1In - subgraph.Swap.amount1Out)
+  subgraph.Swap.price2 = subgraph.Swap.price * 2
+  subgraph.Swap.label = SyntheticField.constant('SWAP')
+  swaps = subgraph.Query.swaps(first=4)
+  app = Subgrounds(subgraphs={subgraph._url: subgraph})
+  key = swaps._name(use_aliases=True)
+
+  def query(url, query_str, variables):
+    return {key: [
+      {'id': 'a', 'amount0In': '10', 'amount0Out': '0', 'amount1In': '0', 'amount1Out': '4'},
+      {'id': 'b', 'amount0In': '1', 'amount0Out': '0', 'amount1In': '2', 'amount1Out': '2'},
+      {'id': 'c', 'amount0In': None, 'amount0Out': '0', 'amount1In': '0', 'amount1Out': '1'},
+      {'id': 'd', 'amount0In': '3', 'amount0Out': '0', 'amount1In': '0', 'amount1Out': '2'},
+    ]}
+
+  query_mock = mocker.patch("subgrounds.client.query", side_effect=query)
+  fpaths = [swaps.id, swaps.price, swaps.price2, swaps.label]
+  assert [fpath._name() for fpath in vectorized_fpaths(fpaths)] == [
+    'swaps_id',
+    'swaps_amount0In',
+    'swaps_amount0Out',
+    'swaps_amount1In',
+    'swaps_amount1Out',
+    'swaps_label',
+  ]
+
+  df = app.query_df(fpaths, pagination_strategy=None)
+  assert list(df.columns) == ['swaps_id', 'swaps_price', 'swaps_price2', 'swaps_label']
+  assert list(df['swaps_price']) == [2.5, 0.0, 0.0, 1.5]
+  assert list(df['swaps_price2']) == [5.0, 0.0, 0.0, 3.0]
+  assert list(df['swaps_label']) == ['SWAP'] * 4
+
+  # Same DataFrame as when synthetic fields are computed row by row
+  assert_frame_equal(df, df_of_json(app.query_json(fpaths, pagination_strategy=None), fpaths))
+  assert query_mock.call_count == 2
+
+
+def test_sync(mocker, subgraph, tmp_path):
+  pairs = subgraph.Query.pairs(first=1000, orderBy='createdAtTimestamp')
+  app = Subgrounds(subgraphs={subgraph._url: subgraph})
+  key = pairs._name(use_aliases=True)
+  path = tmp_path / 'pairs.csv'
+  entities = [{'id': f'{i:04}', 'createdAtTimestamp': str(100 + i)} for i in range(5)]
+
+  def query(url, query_str, variables):
+    last = variables.get('lastOrderingValue0')
+    return {key: [
+      entity for entity in entities
+      if last is None or int(entity['createdAtTimestamp']) > int(last)
+    ][:variables['first0']]}
+
+  query_mock = mocker.patch("subgrounds.client.query", side_effect=query)
+
+  df = app.sync([pairs.id, pairs.createdAtTimestamp], str(path))
+  assert len(df) == 5
+  assert 'lastOrderingValue0' not in query_mock.call_args.kwargs['variables']
+
+  # The second sync only queries (and appends) the new entities
+  entities.extend({'id': f'{i:04}', 'createdAtTimestamp': str(100 + i)} for i in range(5, 7))
+  df = app.sync([pairs.id, pairs.createdAtTimestamp], str(path))
+
+  assert list(df['pairs_id']) == ['0005', '0006']
+  assert query_mock.call_args.kwargs['variables']['lastOrderingValue0'] == '104'
+  assert list(pd.read_csv(path, dtype=str)['pairs_id']) == [f'{i:04}' for i in range(7)]
+
+  # Nothing new
+  df = app.sync([pairs.id, pairs.createdAtTimestamp], str(path))
+  assert len(df) == 0
+  assert query_mock.call_args.kwargs['variables']['lastOrderingValue0'] == '106'
+
+
+def test_sync_bigdecimal_ordering(mocker, subgraph, tmp_path):
+  pairs = subgraph.Query.pairs(first=1000, orderBy='reserveUSD')
+  app = Subgrounds(subgraphs={subgraph._url: subgraph})
+  query_mock = mocker.patch("subgrounds.client.query")
+
+  # BigDecimal watermarks would be read back as inexact floats
+  with pytest.raises(ValueError, match='BigDecimal'):
+    app.sync([pairs.id, pairs.reserveUSD], str(tmp_path / 'pairs.csv'))
+
+  assert query_mock.call_count == 0
+  assert list(tmp_path.iterdir()) == []
@@ -2,14 +2,16 @@ import unittest
 from typing import Any, Callable
 
 import pytest
+from pipe import map
 
 from subgrounds.query import DataRequest, Document, Query, Selection
 from subgrounds.schema import TypeMeta, TypeRef
 from subgrounds.subgraph import Subgraph, Object
 from subgrounds.subgraph.fieldpath import FieldPath, SyntheticField
 from subgrounds.subgrounds import Subgrounds
-from subgrounds.transform import (DocumentTransform, LocalSyntheticField,
-                                  TypeTransform)
+from subgrounds.transform import (DocumentTransform, FusedTransform,
+                                  LocalSyntheticField, QueryPlanner,
+                                  TypeTransform, fuse_transforms)
 
 
 @pytest.fixture
@@ -239,4 +241,146 @@ def test_localsyntheticfield_toplevel_roundtrip(
 
   data = sg.execute(req)
 
-  assert data == expected
\ No newline at end of file
+  assert data == expected
+
+
+def test_fused_transform(subgraph: Subgraph):
+  subgraph.Pair.reserveCAD = subgraph.Pair.reserveUSD * 1.3
+  subgraph.Pair.reserveCAD2 = subgraph.Pair.reserveCAD * 2
+  subgraph.Pair.token0Name = subgraph.Pair.token0.symbol + '/' + subgraph.Pair.token0.name
+  subgraph.Token.label = SyntheticField.constant('TOKEN')
+
+  transforms = fuse_transforms(subgraph._transforms)
+  assert len(transforms) == 1
+  assert type(transforms[0]) == FusedTransform
+
+  app = Subgrounds(global_transforms=[], subgraphs={subgraph._url: subgraph})
+  pairs = subgraph.Query.pairs(first=3)
+  doc = app.mk_request([
+    pairs.id,
+    pairs.reserveCAD2,
+    pairs.token0Name,
+    pairs.token1.label,
+  ]).documents[0]
+  key = doc.query.selection[0].key
+
+  def mk_data() -> dict[str, Any]:
+    return {key: [
+      {'id': 'a', 'reserveUSD': '10.0', 'token0': {'symbol': 'A', 'name': 'Token A'}, 'token1': {}},
+      {'id': 'b', 'reserveUSD': None, 'token0': None, 'token1': None},
+      {'id': 'c', 'reserveUSD': '0.5', 'token0': {'symbol': 'C', 'name': 'Token C'}, 'token1': {}},
+    ]}
+
+  def sequential(transforms: list[DocumentTransform], doc: Document, data: dict[str, Any]) -> dict[str, Any]:
+    match transforms:
+      case []:
+        return data
+      case [transform, *rest]:
+        return transform.transform_response(doc, sequential(rest, transform.transform_document(doc), data))
+
+  new_doc = doc
+  for transform in subgraph._transforms:
+    new_doc = transform.transform_document(new_doc)
+  assert transforms[0].transform_document(doc).graphql == new_doc.graphql
+
+  expected = sequential(subgraph._transforms, doc, mk_data())
+  assert transforms[0].transform_response(doc, mk_data()) == expected
+  assert expected[key][0]['reserveCAD2'] == 26.0
+  assert expected[key][0]['token0Name'] == 'A/Token A'
+  assert expected[key][1]['token1'] == {'label': 'TOKEN'}
+
+  # The visitor is compiled once per document
+  assert transforms[0].transform_response(doc, mk_data()) == expected
+  assert len(transforms[0]._visitors) == 1
+
+
+def test_fused_transform_reused(mocker, subgraph: Subgraph):
+  subgraph.Swap.triple = subgraph.Swap.amount1In * 3
+
+  app = Subgrounds(global_transforms=[], subgraphs={subgraph._url: subgraph})
+  swaps = subgraph.Query.swaps(first=1)
+  req = app.mk_request([swaps.triple])
+  key = req.documents[0].query.selection[0].key
+
+  mocker.patch("subgrounds.client.query", side_effect=lambda *args, **kwargs: {key: [{'amount1In': '2.0'}]})
+
+  # The fused transforms and their visitors are reused across requests
+  [fused] = subgraph._fused_transforms()
+  mocker.spy(fused, 'compile')
+  assert app.execute(req, pagination_strategy=None) == [{key: [{'amount1In': 2.0, 'triple': 6.0}]}]
+  assert app.execute(req, pagination_strategy=None) == [{key: [{'amount1In': 2.0, 'triple': 6.0}]}]
+  assert subgraph._fused_transforms() == [fused]
+  assert fused.compile.call_count == 1
+
+  # Adding a synthetic field invalidates the fused transforms
+  subgraph.Swap.double = subgraph.Swap.amount1In * 2
+  assert subgraph._fused_transforms() != [fused]
+
+
+def test_fused_transform_shared_subexpression_failure(mocker, subgraph: Subgraph):
+  subgraph.Swap.ratio = subgraph.Swap.amount0In / subgraph.Swap.amount0Out + subgraph.Swap.amount1In * 3
+  subgraph.Swap.triple = subgraph.Swap.amount1In * 3
+
+  app = Subgrounds(global_transforms=[], subgraphs={subgraph._url: subgraph})
+  swaps = subgraph.Query.swaps(first=1)
+  req = app.mk_request([swaps.ratio, swaps.triple])
+  key = req.documents[0].query.selection[0].key
+
+  mocker.patch("subgrounds.client.query", return_value={
+    key: [{'amount0In': '1.0', 'amount0Out': '0.0', 'amount1In': '2.0'}]
+  })
+
+  # The division by zero only affects `ratio`
+  [data] = app.execute(req, pagination_strategy=None)
+  assert data[key][0]['ratio'] == 0.0
+  assert data[key][0]['triple'] == 6.0
+
+
+def test_query_planner_split(subgraph: Subgraph):
+  app = Subgrounds(global_transforms=[], subgraphs={subgraph._url: subgraph})
+
+  pairs = subgraph.Query.pairs(first=10)
+  swaps = subgraph.Query.swaps(first=1000)
+  pair = subgraph.Query.pair(id='abc')
+  req = app.mk_request([pairs.id, swaps.id, pair.id])
+
+  docs = QueryPlanner().transform_request(req).documents
+  assert list(docs | map(lambda doc: [select.key for select in doc.query.selection])) == [
+    [req.documents[0].query.selection[0].key],
+    [req.documents[0].query.selection[1].key],
+    [req.documents[0].query.selection[2].key],
+  ]
+
+  # Cost of pairs is 10, cost of swaps is 1000 and cost of pair is 1
+  docs = QueryPlanner(max_cost=100).transform_request(req).documents
+  assert list(docs | map(lambda doc: len(doc.query.selection))) == [1, 1, 1]
+
+  req = app.mk_request([pairs.id, pair.id, swaps.id])
+  docs = QueryPlanner(max_cost=100).transform_request(req).documents
+  assert list(docs | map(lambda doc: len(doc.query.selection))) == [2, 1]
+
+
+def test_query_planner_roundtrip(mocker, subgraph: Subgraph):
+  app = Subgrounds(
+    global_transforms=[QueryPlanner()],
+    subgraphs={subgraph._url: subgraph},
+    max_workers=2
+  )
+
+  pairs = subgraph.Query.pairs(first=10)
+  swaps = subgraph.Query.swaps(first=10)
+  req = app.mk_request([pairs.id, swaps.id, swaps.timestamp])
+  pairs_key, swaps_key = [select.key for select in req.documents[0].query.selection]
+
+  def query(url, query_str, variables):
+    if 'swaps' in query_str:
+      return {swaps_key: [{'id': 'b', 'timestamp': 1}]}
+    else:
+      return {pairs_key: [{'id': 'a'}]}
+
+  mocker.patch("subgrounds.client.query", side_effect=query)
+
+  assert app.execute(req, pagination_strategy=None) == [{
+    pairs_key: [{'id': 'a'}],
+    swaps_key: [{'id': 'b', 'timestamp': 1}],
+  }]
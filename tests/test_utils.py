@@ -1,10 +1,11 @@
 import operator as op
+import time
 from dataclasses import dataclass
 
 import pytest
 
-from subgrounds.utils import (extract_data, flatten_dict, intersection,
-                              rel_complement, union)
+from subgrounds.utils import (compile_extractor, extract_data, flatten_dict,
+                              intersection, prefetch, rel_complement, union)
 from tests.conftest import identity
 
 
@@ -90,6 +91,45 @@ def test_extract_data(test_input, path, expected):
     assert extract_data(path, test_input) == expected
 
 
+@pytest.mark.parametrize(
+    "test_input, paths, expected",
+    [
+        (
+            {
+                "a": [
+                    {"b": {"c": 1, "d": [{"e": 1}, {"e": 2}]}, "f": "x"},
+                    {"b": {"c": 2, "d": []}, "f": "y"},
+                    {"b": None, "f": "z"},
+                ],
+                "g": 10,
+            },
+            [["a", "b", "c"], ["g"], ["a", "f"], ["a", "b", "d", "e"]],
+            [[1, 2, None], 10, ["x", "y", "z"], [[1, 2], [], None]],
+        ),
+        ({"a": []}, [["a", "b", "c"], ["a", "d"]], [[], []]),
+        (
+            [
+                {"a": [{"b": 1}, {"b": 2}]},
+                {"c": {"d": "hello"}},
+            ],
+            [["c", "d"], ["a", "b"]],
+            ["hello", [1, 2]],
+        ),
+        (
+            [
+                {"a": {"b": 1}},
+                {"a": {"b": 2, "c": 3}},
+            ],
+            [["a", "b"], ["a", "c"]],
+            [1, 3],
+        ),
+    ],
+)
+def test_compile_extractor(test_input, paths, expected):
+    extractor = compile_extractor(tuple(tuple(path) for path in paths))
+    assert extractor(test_input) == expected
+
+
 @pytest.mark.parametrize(
     "test_input, expected",
     [
@@ -106,3 +146,29 @@ def test_extract_data(test_input, path, expected):
 )
 def tests_flatten_dict(test_input, expected):
     assert flatten_dict(test_input) == expected
+
+
+def test_prefetch():
+    produced = []
+
+    def items():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    # Items are produced ahead of time, at most `depth` (+1 being put) items ahead
+    it = prefetch(items(), depth=2)
+    assert next(it) == 0
+    time.sleep(0.2)
+    assert len(produced) <= 4
+    assert list(it) == list(range(1, 10))
+
+    # Exceptions are re-raised in order
+    def failing():
+        yield 1
+        raise ValueError("boom")
+
+    it = prefetch(failing(), depth=2)
+    assert next(it) == 1
+    with pytest.raises(ValueError):
+        next(it)